@@ -0,0 +1,75 @@
+"""
+ADMISSION.PY - Ограничение одновременной отправки фото результатов
+
+После рекламного поста опрос завершают сотни людей одновременно, и каждый
+итог — это серия send_photo. Без ограничения все серии идут разом: держат
+соединения aiohttp и упираются в лимиты Telegram. AdmissionController
+пропускает не больше max_active отправок сразу, ещё max_waiting ждут
+очереди, а сверх этого отправка сразу отклоняется (Overloaded) — бот
+отвечает коротким сообщением, а фото можно запросить кнопкой позже.
+
+Счётчики (stats) отдаются в /status бота и HTTP /status health-сервера.
+Контроллер свой у каждого процесса (в многопроцессном режиме — у воркера).
+"""
+
+import asyncio
+import contextlib
+from typing import Any, AsyncIterator, Dict
+
+import config
+
+
+class Overloaded(Exception):
+    """Очередь отправки заполнена — запрос отклонён без ожидания"""
+
+
+class AdmissionController:
+    """Семафор на max_active отправок + ограниченная очередь ожидания"""
+
+    def __init__(self, max_active: int, max_waiting: int):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.Semaphore(max_active)
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """async with controller.slot(): ... — Overloaded, если очередь полна"""
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                self.shed += 1
+                raise Overloaded()
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "peak_waiting": self.peak_waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+# Отправка фото рекомендаций (main.send_recommended_photos)
+photo_delivery = AdmissionController(config.DELIVERY_MAX_ACTIVE, config.DELIVERY_MAX_WAITING)
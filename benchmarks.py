@@ -0,0 +1,370 @@
+"""
+BENCHMARKS.PY - Микробенчмарки горячих путей бота (рекомендации, клавиатуры, фото-мап)
+
+Каждый бенчмарк замеряется через timeit (лучший из нескольких повторов,
+время на один вызов) и сравнивается с сохранённым базовым значением
+из benchmark_baseline.json. Замедление больше допуска считается регрессией.
+
+Запуск:
+    python benchmarks.py                  # сравнить с базовыми значениями
+    python benchmarks.py --save           # перезаписать базовые значения
+    python benchmarks.py -k keyboard      # только бенчмарки с "keyboard" в имени
+    python benchmarks.py --tolerance 0.5  # допуск замедления 50%
+
+Код выхода 1, если есть регрессии. Базовые значения зависят от машины:
+после смены окружения их нужно пересохранить (--save).
+"""
+
+import argparse
+import asyncio
+import atexit
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25
+REPEAT = 5
+# Минимальная длительность одного повтора, сек (как в timeit.autorange)
+MIN_RUN_TIME = 0.2
+
+# Имя бенчмарка -> (функция одной итерации, сколько вызовов в одной итерации)
+Benchmark = Tuple[Callable[[], object], int]
+
+
+# ==================== ПРОСТРАНСТВО ОТВЕТОВ ====================
+
+def hair_answer_space(config) -> List[Tuple[str, list, str, str, str]]:
+    """Все комбинации ответов опроса по волосам (проблемы — все подмножества)"""
+    problem_sets = [
+        list(combo)
+        for size in range(len(config.HAIR_PROBLEMS) + 1)
+        for combo in itertools.combinations(config.HAIR_PROBLEMS, size)
+    ]
+    answers = []
+    for hair_type in config.HAIR_TYPES:
+        colors = config.get_hair_colors(hair_type) or [""]
+        for problems, scalp_type, hair_volume, hair_color in itertools.product(
+            problem_sets, config.SCALP_TYPES, config.HAIR_VOLUME, colors
+        ):
+            answers.append((hair_type, problems, scalp_type, hair_volume, hair_color))
+    return answers
+
+
+# ==================== НАБОР БЕНЧМАРКОВ ====================
+
+def build_benchmarks() -> Dict[str, Benchmark]:
+    # Токен нужен только для валидации формата при создании Bot в main
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+    os.environ["WORKERS"] = "1"
+    import main
+    import bot_session
+    import callbacks
+    import config
+    import keyboards
+    import catalog
+    import catalog_mmap
+    import delivery
+    import photo_map
+    import quiz
+    import rules
+    import search
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Первое обращение инициализирует хранилище (и печатает об этом)
+    photo_map.get_photo_stats()
+
+    answers = hair_answer_space(config)
+    loop = asyncio.new_event_loop()
+
+    # Горячий набор ответов, целиком помещающийся в кэш планов
+    hot_answers = answers[:delivery.PLAN_CACHE_SIZE // 2]
+
+    async def hot_hair_recommendations():
+        for answer in hot_answers:
+            await main.get_hair_recommendations_with_photos(*answer)
+
+    def hair_rules():
+        for answer in answers:
+            catalog.hair_recommendations(*answer)
+
+    def uncached_hair_plans():
+        delivery.plan_cache.clear()
+        for answer in answers:
+            delivery.hair_plan(*answer)
+
+    with open(config.CATALOG_FILE, "r", encoding="utf-8") as f:
+        rules_data = json.load(f)["rule_sets"]
+    # Бинарный каталог из того же catalog.json (catalog_mmap.py)
+    binary_catalog = os.path.join(tempfile.mkdtemp(prefix="bench-catalog-"), "catalog.bin")
+    with open(config.CATALOG_FILE, "r", encoding="utf-8") as f:
+        catalog_mmap.write_catalog(binary_catalog, json.load(f))
+
+    def load_binary_catalog_and_use():
+        loaded = catalog.load_catalog(binary_catalog)
+        for name in loaded.rule_sets:
+            loaded.rule_sets[name]
+        loaded.prices.get("men_shampoo")
+
+    search_queries = ["", "шамп", "маска блонд", "ломкость", "сухая кожа", "xyz"]
+
+    # callback_data всех типов кнопок админки
+    callback_datas = [
+        callbacks.PHOTOS_LIST.pack("missing", 2),
+        callbacks.BULK_SUBCATEGORY.pack("волосы", 3),
+        callbacks.BULK_SKIP.pack("men_shampoo"),
+        callbacks.BULK_CATEGORY.pack("тело"),
+        callbacks.BULK_STOP.pack(),
+        callbacks.NO_ACTION.pack(),
+    ]
+
+    # Маршрутизация входящих сообщений: проверка фильтров обработчиков
+    # dp.message по порядку, как в TelegramEventObserver.trigger (без вызова)
+    from aiogram.types import Message
+    from states import AdminState, UserState
+
+    def routing_case(text: str, fsm_state) -> Tuple[Message, dict]:
+        message = Message.model_validate({
+            "message_id": 1, "date": 0, "text": text,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Bench"},
+        }, context={"bot": main.bot})
+        context = main.dp.fsm.get_context(main.bot, 42, 42)
+        return message, {"state_value": fsm_state.state if fsm_state else None, "context": context}
+
+    routing_cases = [
+        routing_case("❓ Помощь", None),
+        routing_case("🏠 В главное меню", UserState.HAIR_CHOOSING_SCALP),
+        routing_case("Нет", UserState.HAIR_CHOOSING_SCALP),
+        routing_case("📋 Показать прогресс", AdminState.ADMIN_BULK_UPLOAD),
+        routing_case("↩️ Назад в админку", AdminState.ADMIN_PHOTOS_MENU),
+        routing_case("какой шампунь посоветуете?", UserState.CHOOSING_CATEGORY),
+    ]
+
+    async def route_messages():
+        for message, case in routing_cases:
+            context = case["context"]
+            await context.set_state(case["state_value"])
+            data = {
+                "bot": main.bot, "state": context, "raw_state": case["state_value"],
+                "event_from_user": message.from_user, "event_chat": message.chat,
+                "album": [message],
+            }
+            for handler in main.dp.message.handlers:
+                matched, _ = await handler.check(message, **data)
+                if matched:
+                    break
+
+    # Повтор последнего подбора: сигнатура из хранилища -> план из кэша
+    import user_storage
+    replay_users = range(len(hot_answers))
+    for user_id, answer in zip(replay_users, hot_answers):
+        user_storage.save_last_result(user_id, delivery.hair_plan(*answer).signature)
+
+    def replay_last_results():
+        for user_id in replay_users:
+            delivery.plan_for_signature(user_storage.get_last_result(user_id))
+
+    # Пачка отправок через HTTP-сессию: фейковый Bot API с задержкой 50 мс
+    # в том же цикле событий; сессия aiogram по умолчанию и bot_session
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from fake_bot_api import FakeBotAPI
+
+    fake_api = FakeBotAPI(latency=0.05)
+    fake_api_url = loop.run_until_complete(fake_api.start())
+    session_bots = {
+        "default": Bot("123456:BENCHMARK", session=AiohttpSession(api=TelegramAPIServer.from_base(fake_api_url))),
+        "tuned": Bot("123456:BENCHMARK", session=bot_session.create_session(fake_api_url)),
+    }
+    session_burst = 200
+    burst_keyboard = keyboards.hair_problems_keyboard([])
+
+    async def close_session_benchmark():
+        for bot in session_bots.values():
+            await bot.session.close()
+        await fake_api.stop()
+
+    atexit.register(lambda: loop.run_until_complete(close_session_benchmark()))
+
+    async def send_burst(bot):
+        await asyncio.gather(*(
+            bot.send_message(100 + i, "Рекомендация " * 20, reply_markup=burst_keyboard)
+            for i in range(session_burst)
+        ))
+
+    quiz_answers = quiz.CODECS["hair"].encode({"hair_type": "Окрашенные", "selected_problems": ["Ломкость"]})
+
+    photos = photo_map.get_missing_photos()
+    pages = (len(photos) + config.ADMIN_PHOTOS_PER_PAGE - 1) // config.ADMIN_PHOTOS_PER_PAGE
+
+    def photo_list_all_pages():
+        for filter_type in ("all", "missing", "loaded"):
+            for page in range(pages):
+                main.format_photo_list(page, filter_type)
+
+    benchmarks: Dict[str, Benchmark] = {
+        "main.hair_recommendations_with_photos[hot answers]": (
+            lambda: loop.run_until_complete(hot_hair_recommendations()), len(hot_answers)
+        ),
+        "catalog.hair_recommendations[all answers]": (hair_rules, len(answers)),
+        "catalog.body_recommendations": (
+            lambda: [catalog.body_recommendations(goal) for goal in config.BODY_GOALS],
+            len(config.BODY_GOALS),
+        ),
+        "delivery.hair_plan[uncached, all answers]": (uncached_hair_plans, len(answers)),
+        "delivery.plan_for_signature[last result replay]": (replay_last_results, len(hot_answers)),
+        "bot_session.send_message[default session, fake API burst]": (
+            lambda: loop.run_until_complete(send_burst(session_bots["default"])), session_burst
+        ),
+        "bot_session.send_message[tuned session, fake API burst]": (
+            lambda: loop.run_until_complete(send_burst(session_bots["tuned"])), session_burst
+        ),
+        "rules.compile_rules": (lambda: rules.compile_rules(rules_data), 1),
+        "catalog.load_catalog": (catalog.load_catalog, 1),
+        "catalog.load_catalog[mmap]": (lambda: catalog.load_catalog(binary_catalog), 1),
+        "catalog.load_catalog[mmap, first use]": (load_binary_catalog_and_use, 1),
+        "search.search[queries]": (
+            lambda: [search.search(query) for query in search_queries], len(search_queries)
+        ),
+        "search.inline_results[uncached, queries]": (
+            lambda: [search._cached_results.__wrapped__(query, 0, 0) for query in search_queries],
+            len(search_queries),
+        ),
+        "search.build_index": (lambda: search.build_index(catalog.get()), 1),
+        "main.dp.message routing[buttons, free text]": (
+            lambda: loop.run_until_complete(route_messages()), len(routing_cases)
+        ),
+        "quiz.inline_step[hair problems]": (
+            lambda: quiz.inline_step("hair", 1, quiz.CODECS["hair"].decode(quiz_answers)), 1
+        ),
+        "callbacks.resolve[admin buttons]": (
+            lambda: [main.callback_router.resolve(data) for data in callback_datas], len(callback_datas)
+        ),
+        "callbacks.pack[photos list]": (lambda: callbacks.PHOTOS_LIST.pack("missing", 2), 1),
+        "photo_map.get_missing_photos": (photo_map.get_missing_photos, 1),
+        "photo_map.get_missing_photos[uncached]": (photo_map.get_missing_photos.__wrapped__, 1),
+        "photo_map.get_photo_stats": (photo_map.get_photo_stats, 1),
+        "main.format_photo_stats": (main.format_photo_stats, 1),
+        "main.format_photo_list[all pages x filters]": (photo_list_all_pages, pages * 3),
+        "main.format_photo_list[uncached]": (lambda: main.format_photo_list.__wrapped__(1, "all"), 1),
+    }
+
+    # Все построители клавиатур из keyboards.py
+    keyboard_args = {
+        "hair_problems_keyboard": (config.HAIR_PROBLEMS[:3],),
+        "hair_color_keyboard": ("Окрашенные",),
+        "admin_subcategory_bulk_keyboard": ("волосы",),
+        "admin_photos_list_keyboard": (1, "all"),
+        "admin_bulk_step_keyboard": ("men_shampoo",),
+        "carousel_keyboard": (tuple(list(photo_map.ALL_PHOTO_KEYS)[:12]), 3),
+        "result_photos_keyboard": (tuple(list(photo_map.ALL_PHOTO_KEYS)[:12]),),
+        "inline_quiz_keyboard": ([(goal, callbacks.QUIZ_MENU.pack()) for goal in config.BODY_GOALS], 1,
+                                 callbacks.QUIZ_MENU.pack()),
+    }
+    for name in sorted(dir(keyboards)):
+        builder = getattr(keyboards, name)
+        if name.endswith("_keyboard") and callable(builder):
+            args = keyboard_args.get(name, ())
+            benchmarks[f"keyboards.{name}"] = ((lambda builder=builder, args=args: builder(*args)), 1)
+
+    return benchmarks
+
+
+# ==================== ЗАМЕРЫ ====================
+
+def measure(func: Callable[[], object], calls_per_run: int) -> float:
+    """Лучшее время одного вызова в микросекундах"""
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < MIN_RUN_TIME:
+        number *= 2
+    best = min(timer.repeat(repeat=REPEAT, number=number))
+    return best / (number * calls_per_run) * 1_000_000
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("results", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path: str, results: Dict[str, float]):
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "saved_at": int(time.time()),
+        "unit": "us_per_call",
+        "results": {name: round(value, 3) for name, value in sorted(results.items())},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def run(pattern: Optional[str] = None) -> Dict[str, float]:
+    results = {}
+    for name, (func, calls_per_run) in build_benchmarks().items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure(func, calls_per_run)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> Tuple[str, int]:
+    """Отчёт сравнения и число регрессий"""
+    width = max((len(name) for name in results), default=0)
+    lines = [f"{'бенчмарк':<{width}} | {'мкс/вызов':>10} | {'база':>10} | изменение"]
+    regressions = 0
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            lines.append(f"{name:<{width}} | {value:10.2f} | {'—':>10} | нет базы")
+            continue
+        change = value / base - 1 if base else 0.0
+        mark = ""
+        if change > tolerance:
+            regressions += 1
+            mark = "  ❌ РЕГРЕССИЯ"
+        lines.append(f"{name:<{width}} | {value:10.2f} | {base:10.2f} | {change:+8.1%}{mark}")
+    return "\n".join(lines), regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Микробенчмарки горячих путей бота")
+    parser.add_argument("-k", dest="pattern", help="запускать только бенчмарки с этой подстрокой")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты как базовые")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="файл базовых значений")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="допустимое замедление (0.25 = 25%%)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args.pattern)
+
+    if args.save:
+        # При запуске с -k обновляем только выбранные бенчмарки
+        merged = load_baseline(args.baseline) if args.pattern else {}
+        merged.update(results)
+        save_baseline(args.baseline, merged)
+        print(f"💾 Базовые значения сохранены в {args.baseline} ({len(results)} бенчмарков)")
+        sys.exit(0)
+
+    report, regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    print(report)
+    if regressions:
+        print(f"\n❌ Регрессий: {regressions} (допуск {args.tolerance:.0%})")
+        sys.exit(1)
+    print(f"\n✅ Регрессий нет (допуск {args.tolerance:.0%})")
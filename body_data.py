@@ -1,39 +0,0 @@
-BODY_DATA = {
-    "Общий уход и увлажнение": {
-        "title": "🧴 <b>Рекомендация для общего ухода и увлажнения:</b>",
-        "products": [
-            "Молочко для тела",
-            "Гидрофильное масло",
-            "Крем-суфле",
-            "Скраб кофе/кокос",
-            "Гель для душа (вишня/манго/лимон)"
-        ],
-        "note": "+ Гиалуроновая кислота для лица"
-    },
-    "Сухая кожа": {
-        "title": "🌵 <b>Рекомендация для сухой кожи:</b>",
-        "products": [
-            "Гидрофильное масло",
-            "Баттер для тела"
-        ],
-        "note": "+ Гиалуроновая кислота для лица"
-    },
-    "Чувствительная и склонная к раздражениям": {
-        "title": "😌 <b>Рекомендация для чувствительной кожи:</b>",
-        "products": [
-            "Гель для душа (вишня/манго/лимон)",
-            "Молочко для тела",
-            "Гидрофильное масло"
-        ],
-        "note": "+ Гиалуроновая кислота для лица"
-    },
-    "Борьба с целлюлитом и тонизирование": {
-        "title": "🍑 <b>Рекомендация для борьбы с целлюлитом:</b>",
-        "products": [
-            "Гель для душа (вишня/манго/лимон)",
-            "Антицеллюлитный скраб (мята)",
-            "Молочко для тела"  # ← УБРАН "Скраб кофе/кокос"
-        ],
-        "note": "+ Гиалуроновая кислота для лица"
-    }
-}
@@ -0,0 +1,77 @@
+"""
+BOT_SESSION.PY - HTTP-сессия aiogram для Bot API с настройками из config
+
+Сессия по умолчанию (AiohttpSession) держит до 100 соединений,
+закрывает простаивающие через 15 сек (keep-alive aiohttp), ждёт любой
+ответ до 60 сек и разбирает JSON стандартным модулем json. Здесь всё это
+задаётся в config.py:
+  - размер пула соединений и keep-alive (соединения к api.telegram.org
+    переиспользуются между пачками отправки, без новых TCP/TLS-рукопожатий);
+  - время жизни DNS-кэша;
+  - таймауты по видам запросов: обычные (отправка, правка, ответы на кнопки)
+    короткие, чтобы повторы resilience.py начинались быстро, загрузка файлов
+    (UPLOAD_METHODS) — длинная; getUpdates задаёт свой таймаут сам (lifecycle.py);
+  - orjson для тел запросов и ответов, если пакет установлен (иначе json).
+
+Соединения создаются лениво, при первом запросе, поэтому сессию можно
+создать до fork воркеров (workers.py).
+"""
+
+import json
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.methods import TelegramMethod
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import config
+
+# Методы, загружающие файлы на сервер Telegram (config.BOT_API_UPLOAD_TIMEOUT)
+UPLOAD_METHODS = frozenset({"sendDocument", "sendMediaGroup", "sendVideo", "sendAudio", "sendAnimation"})
+
+
+def _orjson_dumps(value: Any) -> str:
+    return orjson.dumps(value).decode("utf-8")
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """AiohttpSession с настраиваемым пулом соединений и таймаутом загрузок"""
+
+    def __init__(self, api: TelegramAPIServer = PRODUCTION, pool_size: int = 100,
+                 keepalive_timeout: float = 15, dns_cache_ttl: int = 3600,
+                 timeout: float = 60, upload_timeout: float = 60, use_orjson: bool = True):
+        codec = {"json_loads": orjson.loads, "json_dumps": _orjson_dumps} if use_orjson and orjson else {
+            "json_loads": json.loads, "json_dumps": json.dumps,
+        }
+        super().__init__(api=api, limit=pool_size, timeout=timeout, **codec)
+        self._connector_init.update(
+            limit_per_host=pool_size,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_cache_ttl,
+        )
+        self.upload_timeout = upload_timeout
+        self.json_codec = "orjson" if codec["json_loads"] is not json.loads else "json"
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None):
+        if timeout is None and method.__api_method__ in UPLOAD_METHODS:
+            timeout = self.upload_timeout
+        return await super().make_request(bot, method, timeout)
+
+
+def create_session(api_url: str = "") -> TunedAiohttpSession:
+    """Сессия для Bot(...): api_url — свой сервер Bot API (пусто — api.telegram.org)"""
+    return TunedAiohttpSession(
+        api=TelegramAPIServer.from_base(api_url) if api_url else PRODUCTION,
+        pool_size=config.BOT_API_POOL_SIZE,
+        keepalive_timeout=config.BOT_API_KEEPALIVE,
+        dns_cache_ttl=config.BOT_API_DNS_CACHE_TTL,
+        timeout=config.BOT_API_TIMEOUT,
+        upload_timeout=config.BOT_API_UPLOAD_TIMEOUT,
+        use_orjson=config.BOT_API_ORJSON,
+    )
@@ -0,0 +1,249 @@
+"""
+BULK_INGEST.PY - Массовая загрузка фото одним альбомом или ZIP-архивом
+
+Админ присылает за один раз:
+  • альбом фото, где подпись каждого фото — ключ продукта (blonde_mask);
+  • альбом изображений-файлов (документов), имена файлов — ключи
+    продуктов (blonde_mask.jpg);
+  • ZIP-архив с изображениями, имена файлов — ключи продуктов.
+
+Части альбома собирает в одну пачку middlewares.MediaGroupMiddleware.
+Все присланное разбирается за один проход. Скачивание файлов идёт
+параллельно, распаковка ZIP — в пуле потоков. Изображения из файлов
+загружаются в Telegram альбомами по 10 штук (sendMediaGroup), так Telegram
+выдаёт file_id сразу пачкой. Сопоставления сохраняются в фото-мап одной
+записью (одна новая версия), а ответ — одно итоговое сообщение.
+"""
+
+import asyncio
+import html
+import io
+import os
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile, InputMediaPhoto, Message
+
+import photo_map
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+# Ограничения Bot API: скачать можно файл до 20 МБ, фото — до 10 МБ
+MAX_DOWNLOAD_SIZE = 20 * 1024 * 1024
+MAX_PHOTO_SIZE = 10 * 1024 * 1024
+# Архив распаковывается в память: ограничиваем число файлов и их общий размер
+MAX_ZIP_ENTRIES = 200
+MAX_ZIP_TOTAL_SIZE = 60 * 1024 * 1024
+# Длина одной строки (имени, текста ошибки) в итоговом сообщении
+SUMMARY_ITEM_LENGTH = 120
+MEDIA_GROUP_SIZE = 10
+DOWNLOAD_CONCURRENCY = 4
+UPLOAD_CONCURRENCY = 2
+
+
+# ==================== СОПОСТАВЛЕНИЕ С КЛЮЧАМИ ====================
+
+def match_key(name: str) -> Optional[str]:
+    """Ключ продукта по имени файла или подписи (регистр, пробелы и дефисы не важны)"""
+    if not name:
+        return None
+    base = os.path.basename(name.strip().replace("\\", "/"))
+    stem, extension = os.path.splitext(base)
+    if extension.lower() not in IMAGE_EXTENSIONS:
+        stem = base
+    key = stem.strip().lower().replace("-", "_").replace(" ", "_")
+    return key if key in photo_map.ALL_PHOTO_KEYS else None
+
+
+def is_image_name(name: str) -> bool:
+    return os.path.splitext(name or "")[1].lower() in IMAGE_EXTENSIONS
+
+
+class IngestResult:
+    """Итог разбора: что сохранено, что не распознано, какие были ошибки"""
+
+    def __init__(self):
+        self.saved: Dict[str, str] = {}
+        self.unmatched: List[str] = []
+        self.errors: List[str] = []
+        self.duplicates: List[str] = []
+
+    def assign(self, key: str, file_id: str):
+        if key in self.saved:
+            self.duplicates.append(key)
+        self.saved[key] = file_id
+
+
+# ==================== РАЗБОР СООБЩЕНИЙ ====================
+
+def _read_zip(data: bytes) -> Tuple[List[Tuple[str, str, bytes]], List[str], List[str]]:
+    """
+    Распаковка (в пуле потоков): ([(ключ, имя, байты)], [нераспознанные], [ошибки])
+    """
+    images, unmatched, errors = [], [], []
+    total_size = 0
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            entries = archive.infolist()
+            if len(entries) > MAX_ZIP_ENTRIES:
+                errors.append(f"в архиве {len(entries)} файлов, можно не больше {MAX_ZIP_ENTRIES}")
+                return images, unmatched, errors
+            for info in entries:
+                if info.is_dir() or os.path.basename(info.filename).startswith("."):
+                    continue
+                name = info.filename
+                key = match_key(name)
+                if not is_image_name(name) or key is None:
+                    unmatched.append(name)
+                    continue
+                if info.file_size > MAX_PHOTO_SIZE:
+                    errors.append(f"{name}: больше 10 МБ")
+                    continue
+                # file_size из архива — предел и для чтения: ZipFile не отдаст больше
+                total_size += info.file_size
+                if total_size > MAX_ZIP_TOTAL_SIZE:
+                    errors.append(f"изображения в архиве больше {MAX_ZIP_TOTAL_SIZE // (1024 * 1024)} МБ, "
+                                  f"остальные файлы пропущены (начиная с {name})")
+                    break
+                images.append((key, os.path.basename(name), archive.read(info)))
+    except zipfile.BadZipFile:
+        errors.append("архив повреждён или это не ZIP")
+    return images, unmatched, errors
+
+
+async def _download(bot: Bot, file_id: str, semaphore: asyncio.Semaphore) -> bytes:
+    async with semaphore:
+        buffer = io.BytesIO()
+        await bot.download(file_id, destination=buffer)
+        return buffer.getvalue()
+
+
+async def _upload_photos(bot: Bot, chat_id: int,
+                         images: List[Tuple[str, str, bytes]], result: IngestResult):
+    """Загрузить изображения альбомами по 2-10 (одно — отдельным фото) и забрать выданные file_id"""
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def upload_chunk(chunk: List[Tuple[str, str, bytes]]):
+        media = [
+            InputMediaPhoto(media=BufferedInputFile(data, filename=filename), caption=key)
+            for key, filename, data in chunk
+        ]
+        async with semaphore:
+            try:
+                if len(media) == 1:
+                    sent = [await bot.send_photo(chat_id, media[0].media, caption=media[0].caption)]
+                else:
+                    sent = await bot.send_media_group(chat_id, media)
+            except Exception as e:
+                result.errors.extend(f"{key}: не удалось загрузить ({e})" for key, _, _ in chunk)
+                return
+        for (key, _, _), sent_message in zip(chunk, sent):
+            if sent_message.photo:
+                result.assign(key, sent_message.photo[-1].file_id)
+
+    await asyncio.gather(*(upload_chunk(chunk) for chunk in _media_group_chunks(images)))
+
+
+def _media_group_chunks(images: List[Tuple[str, str, bytes]]) -> List[List[Tuple[str, str, bytes]]]:
+    """
+    Пачки для send_media_group: Telegram принимает альбомы из 2-10 элементов,
+    поэтому хвост из одного изображения забирает одно из предыдущей пачки
+    (11 → 9 + 2). Одно изображение всего — пачка из одного, send_photo.
+    """
+    chunks = [images[i:i + MEDIA_GROUP_SIZE] for i in range(0, len(images), MEDIA_GROUP_SIZE)]
+    if len(chunks) > 1 and len(chunks[-1]) == 1:
+        chunks[-1].insert(0, chunks[-2].pop())
+    return chunks
+
+
+async def ingest_messages(bot: Bot, chat_id: int, messages: List[Message]) -> IngestResult:
+    """Разобрать присланные фото/файлы/архивы и сохранить найденные ключи одной записью"""
+    result = IngestResult()
+    download_semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    downloads = []  # (описание, file_id, имя файла | None для ZIP)
+
+    for message in messages:
+        if message.photo:
+            # Сжатое фото: file_id готов, ключ — в подписи
+            key = match_key(message.caption or "")
+            if key:
+                result.assign(key, message.photo[-1].file_id)
+            else:
+                result.unmatched.append(f"фото с подписью «{message.caption or ''}»")
+            continue
+
+        document = message.document
+        if document is None:
+            continue
+        name = document.file_name or ""
+        if (document.file_size or 0) > MAX_DOWNLOAD_SIZE:
+            result.errors.append(f"{name}: больше 20 МБ, бот не может его скачать")
+        elif name.lower().endswith(".zip"):
+            downloads.append((name, document.file_id, None))
+        elif is_image_name(name) and match_key(name):
+            downloads.append((name, document.file_id, name))
+        else:
+            result.unmatched.append(name or "файл без имени")
+
+    contents = await asyncio.gather(
+        *(_download(bot, file_id, download_semaphore) for _, file_id, _ in downloads),
+        return_exceptions=True,
+    )
+
+    loop = asyncio.get_running_loop()
+    images: List[Tuple[str, str, bytes]] = []
+    for (name, _, image_name), content in zip(downloads, contents):
+        if isinstance(content, BaseException):
+            result.errors.append(f"{name}: не удалось скачать ({content})")
+        elif image_name is None:
+            zip_images, unmatched, errors = await loop.run_in_executor(None, _read_zip, content)
+            images.extend(zip_images)
+            result.unmatched.extend(f"{name}/{member}" for member in unmatched)
+            result.errors.extend(f"{name}: {error}" for error in errors)
+        elif len(content) > MAX_PHOTO_SIZE:
+            result.errors.append(f"{name}: больше 10 МБ")
+        else:
+            images.append((match_key(image_name), image_name, content))
+
+    if images:
+        await _upload_photos(bot, chat_id, images, result)
+
+    if result.saved:
+        data = dict(photo_map.get_all_photos())
+        data.update(result.saved)
+        if not photo_map.save_photo_map(data):
+            result.errors.append("не удалось сохранить фото-мап")
+            result.saved.clear()
+    return result
+
+
+def _summary_item(text: str) -> str:
+    """Имя файла, подпись или текст ошибки для HTML-сообщения: экранировано и обрезано"""
+    if len(text) > SUMMARY_ITEM_LENGTH:
+        text = text[:SUMMARY_ITEM_LENGTH - 1] + "…"
+    return html.escape(text)
+
+
+def format_summary(result: IngestResult) -> str:
+    stats = photo_map.get_photo_stats()
+    text = (
+        f"📦 <b>Пакетная загрузка завершена</b>\n\n"
+        f"✅ <b>Сохранено:</b> {len(result.saved)}\n"
+    )
+    for key in sorted(result.saved):
+        text += f"• {photo_map.ALL_PHOTO_KEYS[key]} (<code>{key}</code>)\n"
+    if result.duplicates:
+        text += f"\n♻️ <b>Повторы (взято последнее):</b> {', '.join(sorted(set(result.duplicates)))}\n"
+    if result.unmatched:
+        text += f"\n❓ <b>Не распознано:</b> {len(result.unmatched)}\n"
+        for name in result.unmatched[:10]:
+            text += f"• {_summary_item(name)}\n"
+        if len(result.unmatched) > 10:
+            text += f"... и еще {len(result.unmatched) - 10}\n"
+    if result.errors:
+        text += f"\n❌ <b>Ошибки:</b> {len(result.errors)}\n"
+        for error in result.errors[:10]:
+            text += f"• {_summary_item(error)}\n"
+    text += f"\n📈 <b>Итого:</b> {stats['loaded']}/{stats['total']} ({stats['percentage']}%)"
+    return text
+
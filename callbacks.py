@@ -0,0 +1,249 @@
+"""
+CALLBACKS.PY - Типизированные callback_data inline-кнопок и их маршрутизация
+
+Каждый тип кнопки — CallbackType: короткий префикс (ровно 2 символа) и
+список полей. Все поля — небольшие целые числа: номер страницы, номер
+варианта из фиксированного списка (Choice) или номер продукта (Product,
+порядковый номер в ALL_PHOTO_KEYS); последним полем может быть список
+продуктов (ProductList). Значения упаковываются в varint-байты и
+кодируются base64url без выравнивания, например:
+
+    PHOTOS_LIST.pack("missing", 3)  ->  "plAgM"
+
+Длина упакованных данных проверяется при объявлении типа, поэтому
+любая кнопка гарантированно укладывается в лимит Telegram (64 байта).
+
+CallbackRouter выбирает обработчик по префиксу одним поиском в словаре
+(вместо цепочки фильтров F.data.startswith) и передаёт ему уже
+разобранные поля.
+
+Номера продуктов — позиции в ALL_PHOTO_KEYS: новые ключи добавляются в
+конец словаря, иначе кнопки в уже отправленных сообщениях поменяют смысл.
+"""
+
+import base64
+from collections import namedtuple
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple
+
+import photo_map
+
+PREFIX_LENGTH = 2
+MAX_CALLBACK_DATA = 64  # лимит Telegram, байт
+_MAX_VARINT_BYTES = 5   # значения до 2**32
+
+
+class CallbackDataError(ValueError):
+    """Неизвестные или повреждённые callback_data"""
+
+
+# ==================== ПОЛЯ ====================
+
+def _varint_size(number: int) -> int:
+    return max(1, (number.bit_length() + 6) // 7)
+
+
+class Int:
+    """Неотрицательное целое"""
+
+    def __init__(self, name: str):
+        self.name = name
+        # Наибольший размер в упакованном виде, байт
+        self.max_bytes = _MAX_VARINT_BYTES
+
+    def encode(self, value: int) -> int:
+        if not isinstance(value, int) or value < 0:
+            raise CallbackDataError(f"{self.name}: ожидается неотрицательное целое, получено {value!r}")
+        return value
+
+    def decode(self, number: int):
+        return number
+
+
+class Choice(Int):
+    """Вариант из фиксированного списка (хранится его номер)"""
+
+    def __init__(self, name: str, options: Sequence[str]):
+        super().__init__(name)
+        self.options = tuple(options)
+        self._numbers = {option: number for number, option in enumerate(self.options)}
+        self.max_bytes = _varint_size(max(len(self.options) - 1, 0))
+
+    def encode(self, value: str) -> int:
+        try:
+            return self._numbers[value]
+        except KeyError:
+            raise CallbackDataError(f"{self.name}: недопустимое значение {value!r}")
+
+    def decode(self, number: int) -> str:
+        if number >= len(self.options):
+            raise CallbackDataError(f"{self.name}: нет варианта №{number}")
+        return self.options[number]
+
+
+class Product(Choice):
+    """Ключ продукта (хранится его номер в ALL_PHOTO_KEYS)"""
+
+    def __init__(self, name: str):
+        super().__init__(name, list(photo_map.ALL_PHOTO_KEYS))
+
+
+class ProductList(Product):
+    """Список ключей продуктов (до max_items); только последним полем"""
+
+    def __init__(self, name: str, max_items: int):
+        super().__init__(name)
+        self.max_items = max_items
+        self.max_bytes *= max_items
+
+    def encode_list(self, keys: Sequence[str]) -> List[int]:
+        if len(keys) > self.max_items:
+            raise CallbackDataError(f"{self.name}: больше {self.max_items} продуктов")
+        return [self.encode(key) for key in keys]
+
+    def decode_list(self, numbers: List[int]) -> Tuple[str, ...]:
+        return tuple(self.decode(number) for number in numbers)
+
+
+# ==================== ТИПЫ CALLBACK_DATA ====================
+
+def _pack_varints(numbers: List[int]) -> bytes:
+    data = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            data.append((number & 0x7F) | 0x80)
+            number >>= 7
+        data.append(number)
+    return bytes(data)
+
+
+def _unpack_varints(data: bytes) -> List[int]:
+    numbers, number, shift = [], 0, 0
+    for byte in data:
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        numbers.append(number)
+        number, shift = 0, 0
+    if shift:
+        raise CallbackDataError("повреждённые поля")
+    return numbers
+
+
+_registry: Dict[str, "CallbackType"] = {}
+
+
+class CallbackType:
+    """Тип кнопки: префикс + поля; pack() -> строка, unpack() -> namedtuple полей"""
+
+    def __init__(self, prefix: str, *fields: Int):
+        if len(prefix) != PREFIX_LENGTH or not prefix.isascii():
+            raise ValueError(f"Префикс должен состоять из {PREFIX_LENGTH} ASCII-символов: {prefix!r}")
+        if prefix in _registry:
+            raise ValueError(f"Префикс {prefix!r} уже занят")
+        if any(isinstance(field, ProductList) for field in fields[:-1]):
+            raise ValueError(f"{prefix}: список продуктов может быть только последним полем")
+        longest = PREFIX_LENGTH + len(base64.urlsafe_b64encode(b"\xff" * sum(field.max_bytes for field in fields)))
+        if longest > MAX_CALLBACK_DATA:
+            raise ValueError(f"{prefix}: слишком много полей для {MAX_CALLBACK_DATA} байт")
+        self.prefix = prefix
+        self.fields = fields
+        self._list_field = fields[-1] if fields and isinstance(fields[-1], ProductList) else None
+        self._scalar_fields = fields[:-1] if self._list_field else fields
+        self.args = namedtuple(f"Callback_{prefix}", [field.name for field in fields])
+        _registry[prefix] = self
+
+    def pack(self, *values) -> str:
+        if len(values) != len(self.fields):
+            raise CallbackDataError(f"{self.prefix}: ожидается полей {len(self.fields)}, получено {len(values)}")
+        if not values:
+            return self.prefix
+        numbers = [field.encode(value) for field, value in zip(self._scalar_fields, values)]
+        if self._list_field:
+            numbers.extend(self._list_field.encode_list(values[-1]))
+        data = _pack_varints(numbers)
+        return self.prefix + base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+    def unpack(self, payload: str):
+        """Поля из части callback_data после префикса"""
+        if not self.fields:
+            if payload:
+                raise CallbackDataError(f"{self.prefix}: лишние данные")
+            return self.args()
+        try:
+            data = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        except (ValueError, TypeError):
+            raise CallbackDataError(f"{self.prefix}: повреждённые данные")
+        numbers = _unpack_varints(data)
+        scalar_count = len(self._scalar_fields)
+        if len(numbers) < scalar_count or (len(numbers) > scalar_count and not self._list_field):
+            raise CallbackDataError(f"{self.prefix}: неверное число полей")
+        values = [field.decode(number) for field, number in zip(self._scalar_fields, numbers)]
+        if self._list_field:
+            values.append(self._list_field.decode_list(numbers[scalar_count:]))
+        return self.args(*values)
+
+
+def decode(data: str) -> Tuple[CallbackType, tuple]:
+    """Тип и поля по callback_data (CallbackDataError, если не разобрать)"""
+    callback_type = _registry.get(data[:PREFIX_LENGTH])
+    if callback_type is None:
+        raise CallbackDataError(f"неизвестный префикс: {data!r}")
+    return callback_type, callback_type.unpack(data[PREFIX_LENGTH:])
+
+
+# Категории массовой загрузки (ключи для config.PHOTO_STRUCTURE_ADMIN)
+BULK_CATEGORIES = ("волосы", "тело")
+PHOTO_FILTERS = ("all", "loaded", "missing")
+
+BULK_CATEGORY = CallbackType("bc", Choice("category", BULK_CATEGORIES))
+BULK_BACK_TO_CATEGORIES = CallbackType("bb")
+BULK_SUBCATEGORY = CallbackType("bs", Choice("category", BULK_CATEGORIES), Int("index"))
+BULK_SKIP = CallbackType("sk", Product("product"))
+BULK_STOP = CallbackType("st")
+BULK_UPLOAD_START = CallbackType("bu")
+PHOTOS_LIST = CallbackType("pl", Choice("filter", PHOTO_FILTERS), Int("page"))
+ADMIN_BACK_TO_MAIN = CallbackType("ab")
+RESET_CONFIRM = CallbackType("rc")
+RESET_CANCEL = CallbackType("rx")
+NO_ACTION = CallbackType("na")
+
+# Опрос без состояния на сервере (quiz.py): номер шага и все ответы — в кнопке
+QUIZ_FLOWS = ("hair", "body")
+QUIZ_STEP = CallbackType("qz", Choice("flow", QUIZ_FLOWS), Int("step"), Int("answers"))
+QUIZ_MENU = CallbackType("qm")
+
+# Карусель фото в результатах: позиция и продукты карусели по порядку
+CAROUSEL_MAX_ITEMS = 40
+CAROUSEL = CallbackType("cr", Int("position"), ProductList("products", CAROUSEL_MAX_ITEMS))
+
+# Фото результата, не отправленные из-за перегрузки (admission.py)
+RESULT_PHOTOS = CallbackType("rp", ProductList("products", CAROUSEL_MAX_ITEMS))
+
+
+# ==================== МАРШРУТИЗАЦИЯ ====================
+
+Handler = Callable[..., Awaitable[None]]
+
+
+class CallbackRouter:
+    """Обработчики по префиксу: выбор обработчика — один поиск в словаре"""
+
+    def __init__(self):
+        self._handlers: Dict[str, Handler] = {}
+
+    def handler(self, callback_type: CallbackType):
+        """Декоратор: обработчик (callback, state, args) для типа кнопки"""
+        def decorator(func: Handler) -> Handler:
+            if callback_type.prefix in self._handlers:
+                raise ValueError(f"Обработчик для {callback_type.prefix!r} уже задан")
+            self._handlers[callback_type.prefix] = func
+            return func
+        return decorator
+
+    def resolve(self, data: str) -> Tuple[Handler, tuple]:
+        """Обработчик и разобранные поля (CallbackDataError, если кнопка неизвестна)"""
+        handler = self._handlers.get(data[:PREFIX_LENGTH])
+        if handler is None:
+            raise CallbackDataError(f"нет обработчика: {data!r}")
+        return handler, _registry[data[:PREFIX_LENGTH]].unpack(data[PREFIX_LENGTH:])
@@ -0,0 +1,259 @@
+"""
+CATALOG.PY - Каталог продукции (цены + правила рекомендаций) из catalog.json
+
+Каталог — неизменяемый снимок: цены и скомпилированные правила (rules.py).
+Файл отслеживается дешёвым опросом mtime/размера (CatalogWatcher). При
+изменении он читается, проверяется и компилируется в пуле потоков, вне
+event loop, а готовый снимок подменяется одной операцией присваивания:
+читатели ничего не блокируют и никогда не видят наполовину обновлённый
+каталог. Если новый файл не прошёл проверку, работает прежний снимок.
+
+Вместо catalog.json можно указать бинарный каталог (catalog_mmap.py):
+он отображается в память, и процессы-воркеры делят его страницы через
+page cache. Проверяется он так же полно, как catalog.json, поэтому
+загружается не быстрее (см. catalog_mmap.py).
+
+Кэши, построенные по каталогу, сбрасываются подписчиками на подмену
+(add_swap_listener) или сверяют Catalog.version.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import catalog_mmap
+import config
+import photo_map
+import rules
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogError(ValueError):
+    """Ошибка в файле каталога"""
+
+
+class Catalog:
+    """Снимок каталога; после создания не изменяется"""
+
+    __slots__ = ("version", "prices", "rule_sets", "source")
+
+    def __init__(self, version: int, prices: Mapping[str, str],
+                 rule_sets: Mapping[str, rules.RuleSet], source: Tuple[float, int]):
+        self.version = version
+        self.prices = prices
+        self.rule_sets = rule_sets
+        # (mtime, размер) файла, из которого собран снимок
+        self.source = source
+
+
+# ==================== ЗАГРУЗКА И ПРОВЕРКА ====================
+
+def _file_signature(path: str) -> Tuple[float, int]:
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def _validate_prices(prices: Any) -> Dict[str, str]:
+    if not isinstance(prices, dict):
+        raise CatalogError("prices должен быть объектом")
+    for key, price in prices.items():
+        if key not in photo_map.ALL_PHOTO_KEYS:
+            raise CatalogError(f"Цена для неизвестного продукта '{key}'")
+        if not isinstance(price, str):
+            raise CatalogError(f"Цена '{key}' должна быть строкой")
+    return dict(prices)
+
+
+def load_catalog(path: Optional[str] = None, version: int = 1) -> Catalog:
+    """
+    Прочитать, проверить и скомпилировать каталог (CatalogError при ошибке).
+    Работает без общего состояния, поэтому безопасна в пуле потоков.
+    Бинарный каталог (catalog_mmap.py) отображается в память и проверяется целиком.
+    """
+    path = path or config.CATALOG_FILE
+    if catalog_mmap.is_binary_catalog(path):
+        return _load_binary(path, version)
+    try:
+        source = _file_signature(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise CatalogError(f"Не удалось прочитать {path}: {e}")
+    if not isinstance(data, dict):
+        raise CatalogError("Каталог должен быть объектом")
+
+    prices = _validate_prices(data.get("prices", {}))
+    try:
+        rule_sets = rules.compile_rules(data.get("rule_sets"))
+    except rules.RuleError as e:
+        raise CatalogError(str(e))
+    return Catalog(version, MappingProxyType(prices), MappingProxyType(rule_sets), source)
+
+
+def _load_binary(path: str, version: int) -> Catalog:
+    # Проверяется так же, как catalog.json: битый файл не должен подменить
+    # рабочий каталог и проявиться только на первом опросе
+    try:
+        source = _file_signature(path)
+        prices, rule_sets = catalog_mmap.open_catalog(path)
+        _validate_prices(dict(prices))
+        rule_sets.compile_all()
+    except CatalogError:
+        raise
+    except (rules.RuleError, catalog_mmap.CatalogFormatError) as e:
+        raise CatalogError(str(e))
+    except (OSError, ValueError) as e:
+        raise CatalogError(f"Не удалось прочитать {path}: {e}")
+    return Catalog(version, prices, rule_sets, source)
+
+
+def _read_source(path: str) -> Dict[str, Any]:
+    if catalog_mmap.is_binary_catalog(path):
+        return catalog_mmap.read_source(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_source(path: str, data: Dict[str, Any]):
+    if catalog_mmap.is_binary_catalog(path):
+        catalog_mmap.write_catalog(path, data)
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(data, ensure_ascii=False, indent=2) + "\n")
+    os.replace(temp_path, path)
+
+
+# ==================== ТЕКУЩИЙ СНИМОК ====================
+
+_current: Optional[Catalog] = None
+_swap_listeners: List[Callable[[Catalog], None]] = []
+
+
+def get() -> Catalog:
+    """Текущий снимок каталога (при первом обращении читается синхронно)"""
+    if _current is None:
+        _swap(load_catalog())
+    return _current
+
+
+def add_swap_listener(listener: Callable[[Catalog], None]):
+    """Подписаться на подмену каталога (сброс производных кэшей)"""
+    _swap_listeners.append(listener)
+
+
+def _swap(new_catalog: Catalog):
+    global _current
+    _current = new_catalog
+    for listener in _swap_listeners:
+        try:
+            listener(new_catalog)
+        except Exception as e:
+            logger.error(f"⚠️ Ошибка подписчика catalog: {e}", exc_info=True)
+    logger.info(f"📦 Каталог v{new_catalog.version}: {len(new_catalog.prices)} цен, "
+                f"правила: {', '.join(new_catalog.rule_sets)}")
+
+
+def save_prices(prices: Dict[str, str], path: Optional[str] = None) -> Catalog:
+    """
+    Записать новые цены в файл каталога (JSON или бинарный; атомарно,
+    через временный файл) и сразу подменить снимок. Остальные процессы
+    подхватят файл через CatalogWatcher. При ошибке файл не меняется
+    (CatalogError).
+    """
+    path = path or config.CATALOG_FILE
+    prices = _validate_prices(prices)
+    try:
+        data = _read_source(path)
+    except (OSError, ValueError) as e:
+        raise CatalogError(f"Не удалось прочитать {path}: {e}")
+    data["prices"] = prices
+    try:
+        _write_source(path, data)
+    except (OSError, ValueError) as e:
+        raise CatalogError(f"Не удалось записать {path}: {e}")
+
+    new_catalog = load_catalog(path, get().version + 1)
+    _swap(new_catalog)
+    return new_catalog
+
+
+# ==================== ОТСЛЕЖИВАНИЕ ФАЙЛА ====================
+
+class CatalogWatcher:
+    """Фоновая задача: опрос mtime/размера файла и подмена каталога"""
+
+    def __init__(self, path: Optional[str] = None, interval: float = config.CATALOG_POLL_INTERVAL):
+        self.path = path or config.CATALOG_FILE
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        # Сигнатура последнего отклонённого файла: не перечитываем его повторно
+        self._rejected: Optional[Tuple[float, int]] = None
+
+    def start(self) -> asyncio.Task:
+        get()
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def check(self) -> bool:
+        """Перечитать файл, если он изменился; True, если каталог подменён"""
+        try:
+            signature = _file_signature(self.path)
+        except OSError:
+            return False
+        current = get()
+        if signature == current.source or signature == self._rejected:
+            return False
+
+        loop = asyncio.get_running_loop()
+        try:
+            new_catalog = await loop.run_in_executor(
+                None, load_catalog, self.path, current.version + 1
+            )
+        except CatalogError as e:
+            logger.error(f"❌ Каталог не обновлён, работает v{current.version}: {e}")
+            self._rejected = signature
+            return False
+
+        _swap(new_catalog)
+        self._rejected = None
+        return True
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"⚠️ Ошибка отслеживания каталога: {e}", exc_info=True)
+
+
+# ==================== ДОСТУП К ДАННЫМ ====================
+
+def get_price(product_key: str) -> str:
+    return get().prices.get(product_key, "")
+
+
+def hair_recommendations(hair_type: str, problems: list, scalp_type: str,
+                         hair_volume: str, hair_color: str = "") -> rules.Recommendation:
+    """Рекомендации по волосам; блоки проблем — в порядке выбора"""
+    return get().rule_sets["hair"].evaluate({
+        "hair_type": hair_type,
+        "problems": problems,
+        "scalp_type": scalp_type,
+        "hair_volume": hair_volume,
+        "hair_color": hair_color,
+    })
+
+
+def body_recommendations(goal: str) -> rules.Recommendation:
+    """Рекомендации по уходу за телом"""
+    return get().rule_sets["body"].evaluate({"goal": goal})
@@ -0,0 +1,310 @@
+"""
+CATALOG_MMAP.PY - Бинарный каталог, читаемый через mmap
+
+Тот же каталог, что и catalog.json (цены + правила рекомендаций), но
+файл отображается в память (mmap), а данные читаются из него по
+смещениям. Процессы, открывшие один файл, делят его страницы через page
+cache ОС.
+
+Формат (little-endian):
+  заголовок   HEADER: магия, версия, размеры и смещения секций
+  строки      UTF-8 строки, разделённые нулевым байтом; каждая
+              уникальная строка хранится один раз, ссылки — её номер
+  продукты    PRODUCT × число продуктов: номера строк ключа, названия
+              и цены (отсортированы по ключу)
+  правила     RULE_SET × число наборов: номер строки имени, смещение и
+              длина компактного JSON набора правил
+
+При открытии читается только заголовок. Таблица строк декодируется
+целиком (один вызов) при первом обращении к ценам; JSON набора правил
+разбирается и компилируется при первом обращении к этому набору.
+Смещения секций и ссылки на строки проверяются (CatalogFormatError).
+
+Компромисс: catalog.load_catalog обращается ко всему сразу (compile_all) —
+файл могли подменить на диске в обход build, и битый каталог должен
+отклоняться при перечитывании, а не падать на первом опросе. Поэтому
+загрузка бинарного каталога по времени не быстрее catalog.json
+(benchmarks.py: catalog.load_catalog[mmap]): правила хранятся как JSON и
+компилируются в таблицы решений при каждой загрузке. Выигрыш формата —
+общие страницы файла у воркеров и ленивый доступ через open_catalog.
+
+Сборка:   python catalog_mmap.py build [catalog.json] [catalog.bin]
+Просмотр: python catalog_mmap.py dump catalog.bin
+Подключение: CATALOG_FILE=catalog.bin
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import photo_map
+import rules
+
+MAGIC = b"LRMSCAT\x00"
+FORMAT_VERSION = 1
+# магия, версия, резерв, строк, смещение строк, продуктов, смещение
+# продуктов, наборов правил, смещение наборов правил
+HEADER = struct.Struct("<8sHHIIIIII")
+PRODUCT = struct.Struct("<III")
+RULE_SET = struct.Struct("<III")
+NO_STRING = 0xFFFFFFFF
+
+
+class CatalogFormatError(ValueError):
+    """Файл не является корректным бинарным каталогом"""
+
+
+def is_binary_catalog(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+# ==================== ЗАПИСЬ ====================
+
+class _StringTable:
+    def __init__(self):
+        self.strings: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        if "\0" in value:
+            raise CatalogFormatError("Нулевой символ в строке каталога")
+        if value not in self.index:
+            self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return self.index[value]
+
+    def encode(self) -> bytes:
+        return "\0".join(self.strings).encode("utf-8")
+
+
+def encode_catalog(data: Dict[str, Any]) -> bytes:
+    """Собрать бинарный каталог из данных формата catalog.json (без проверки)"""
+    prices = data.get("prices", {})
+    rule_sets = data.get("rule_sets", {})
+    strings = _StringTable()
+
+    keys = sorted(photo_map.ALL_PHOTO_KEYS)
+    product_records = b"".join(
+        PRODUCT.pack(
+            strings.add(key),
+            strings.add(photo_map.ALL_PHOTO_KEYS[key]),
+            strings.add(prices[key]) if key in prices else NO_STRING,
+        )
+        for key in keys
+    )
+    rule_names = [strings.add(name) for name in rule_sets]
+    rule_blobs = [
+        json.dumps(spec, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for spec in rule_sets.values()
+    ]
+    string_table = strings.encode()
+
+    products_offset = HEADER.size + len(string_table)
+    rule_sets_offset = products_offset + len(product_records)
+    position = rule_sets_offset + RULE_SET.size * len(rule_blobs)
+    directory = []
+    for name, blob in zip(rule_names, rule_blobs):
+        directory.append(RULE_SET.pack(name, position, len(blob)))
+        position += len(blob)
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, len(strings.strings), HEADER.size,
+        len(keys), products_offset, len(rule_blobs), rule_sets_offset,
+    )
+    return header + string_table + product_records + b"".join(directory) + b"".join(rule_blobs)
+
+
+def write_catalog(path: str, data: Dict[str, Any]):
+    """Записать каталог атомарно: уже открытые отображения старого файла остаются целыми"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(encode_catalog(data))
+    os.replace(temp_path, path)
+
+
+# ==================== ЧТЕНИЕ ====================
+
+class MmapCatalogFile:
+    """Открытый бинарный каталог; секции читаются из mmap по запросу"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise CatalogFormatError(f"{path}: пустой файл")
+        if len(self._buffer) < HEADER.size:
+            raise CatalogFormatError(f"{path}: обрезанный заголовок")
+        (magic, version, _, self.string_count, self._strings_offset, self.product_count,
+         self._products_offset, self.rule_set_count, self._rule_sets_offset) = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise CatalogFormatError(f"{path}: не бинарный каталог")
+        if version != FORMAT_VERSION:
+            raise CatalogFormatError(f"{path}: неподдерживаемая версия формата {version}")
+        # Секции идут подряд: строки, продукты, каталог наборов правил
+        if not (HEADER.size <= self._strings_offset <= self._products_offset
+                and self._products_offset + PRODUCT.size * self.product_count <= self._rule_sets_offset
+                and self._rule_sets_offset + RULE_SET.size * self.rule_set_count <= len(self._buffer)):
+            raise CatalogFormatError(f"{path}: файл обрезан или смещения секций повреждены")
+        self._strings: Optional[List[str]] = None
+
+    def string(self, index: int) -> str:
+        if self._strings is None:
+            data = self._buffer[self._strings_offset:self._products_offset]
+            strings = data.decode("utf-8").split("\0")
+            if len(strings) != self.string_count:
+                raise CatalogFormatError(f"{self.path}: повреждена таблица строк")
+            self._strings = strings
+        if not 0 <= index < self.string_count:
+            raise CatalogFormatError(f"{self.path}: ссылка на несуществующую строку {index}")
+        return self._strings[index]
+
+    def product(self, index: int) -> Tuple[str, str, Optional[str]]:
+        """(ключ, название, цена | None) продукта по номеру"""
+        key, name, price = PRODUCT.unpack_from(self._buffer, self._products_offset + PRODUCT.size * index)
+        return self.string(key), self.string(name), self.string(price) if price != NO_STRING else None
+
+    def rule_set_entries(self) -> List[Tuple[int, int, int]]:
+        """(номер строки имени, смещение, длина) каждого набора правил"""
+        return [
+            RULE_SET.unpack_from(self._buffer, self._rule_sets_offset + RULE_SET.size * index)
+            for index in range(self.rule_set_count)
+        ]
+
+    def rule_spec(self, offset: int, length: int) -> Dict[str, Any]:
+        rules_start = self._rule_sets_offset + RULE_SET.size * self.rule_set_count
+        if offset < rules_start or offset + length > len(self._buffer):
+            raise CatalogFormatError(f"{self.path}: набор правил за пределами файла")
+        return json.loads(self._buffer[offset:offset + length])
+
+    def rule_specs(self) -> Dict[str, Any]:
+        return {self.string(name): self.rule_spec(offset, length)
+                for name, offset, length in self.rule_set_entries()}
+
+
+class MmapPrices(Mapping):
+    """Цены из mmap: ключ → цена (только продукты с ценой), читаются при первом обращении"""
+
+    def __init__(self, catalog_file: MmapCatalogFile):
+        self._file = catalog_file
+        self._prices: Optional[Dict[str, str]] = None
+
+    def _load(self) -> Dict[str, str]:
+        if self._prices is None:
+            prices = {}
+            for index in range(self._file.product_count):
+                key, _, price = self._file.product(index)
+                if price is not None:
+                    prices[key] = price
+            self._prices = prices
+        return self._prices
+
+    def __getitem__(self, key: str) -> str:
+        return self._load()[key]
+
+    def get(self, key: str, default=None):
+        return self._load().get(key, default)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+
+class LazyRuleSets(Mapping):
+    """Наборы правил, разбираемые и компилируемые при первом обращении к каждому"""
+
+    def __init__(self, catalog_file: MmapCatalogFile):
+        self._file = catalog_file
+        self._entries: Optional[Dict[str, Tuple[int, int]]] = None
+        self._compiled: Dict[str, rules.RuleSet] = {}
+
+    def _directory(self) -> Dict[str, Tuple[int, int]]:
+        if self._entries is None:
+            self._entries = {
+                self._file.string(name): (offset, length)
+                for name, offset, length in self._file.rule_set_entries()
+            }
+        return self._entries
+
+    def compile_all(self):
+        """Разобрать и скомпилировать все наборы сразу (RuleError, CatalogFormatError)"""
+        self._compiled = rules.compile_rules(self._file.rule_specs())
+
+    def __getitem__(self, name: str) -> rules.RuleSet:
+        rule_set = self._compiled.get(name)
+        if rule_set is None:
+            offset, length = self._directory()[name]
+            rule_set = self._compiled[name] = rules.RuleSet(name, self._file.rule_spec(offset, length))
+        return rule_set
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._directory())
+
+    def __len__(self) -> int:
+        return self._file.rule_set_count
+
+
+def open_catalog(path: str):
+    """(цены, наборы правил) из бинарного каталога"""
+    catalog_file = MmapCatalogFile(path)
+    return MmapPrices(catalog_file), LazyRuleSets(catalog_file)
+
+
+def read_source(path: str) -> Dict[str, Any]:
+    """Данные в формате catalog.json (для пересборки, например с новыми ценами)"""
+    catalog_file = MmapCatalogFile(path)
+    return {"prices": dict(MmapPrices(catalog_file)), "rule_sets": catalog_file.rule_specs()}
+
+
+# ==================== КОМАНДНАЯ СТРОКА ====================
+
+def build(source: str, output: str):
+    """Проверить catalog.json и записать бинарный каталог"""
+    import catalog
+
+    catalog.load_catalog(source)
+    with open(source, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    write_catalog(output, data)
+    prices, rule_sets = open_catalog(output)
+    print(f"✅ {output}: {os.path.getsize(output)} байт, {len(prices)} цен, правила: {', '.join(rule_sets)}")
+
+
+def dump(path: str):
+    catalog_file = MmapCatalogFile(path)
+    print(f"📦 {path}: строк {catalog_file.string_count}, продуктов {catalog_file.product_count}")
+    for index in range(catalog_file.product_count):
+        key, name, price = catalog_file.product(index)
+        print(f"  {key:<25} {name:<40} {price or '—'}")
+    for name, spec in catalog_file.rule_specs().items():
+        sections = spec.get("sections", [])
+        print(f"  правила {name}: секций {len(sections)}, правил {sum(len(s.get('rules', [])) for s in sections)}")
+
+
+def main(argv=None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    if args[:1] == ["build"] and len(args) <= 3:
+        here = os.path.dirname(os.path.abspath(__file__))
+        source = args[1] if len(args) > 1 else os.path.join(here, "catalog.json")
+        output = args[2] if len(args) > 2 else os.path.splitext(source)[0] + ".bin"
+        build(source, output)
+        return 0
+    if args[:1] == ["dump"] and len(args) == 2:
+        dump(args[1])
+        return 0
+    print(__doc__.strip().split("\n\n")[-1])
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,12 +9,74 @@ from typing import List
 # ==================== БАЗОВЫЕ НАСТРОЙКИ ====================
 
 BOT_TOKEN = os.environ.get("BOT_TOKEN", "").strip()
-if not BOT_TOKEN:
-    print("⚠️ ВНИМАНИЕ: BOT_TOKEN не найден в переменных окружения!")
+# Альтернативный Bot API сервер (локальный Bot API или fake_bot_api.py для нагрузочных тестов)
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "").strip()
 
 ADMIN_PASSWORD = "admin2026"
 ADMIN_PHOTOS_PER_PAGE = 5
 
+# ==================== HTTP-СЕССИЯ BOT API ====================
+# Пул соединений к Bot API, keep-alive простаивающих соединений (сек),
+# время жизни DNS-кэша (сек), таймауты обычных запросов и загрузки файлов
+# (сек); orjson для JSON, если установлен (BOT_API_ORJSON=0 — всегда json)
+
+BOT_API_POOL_SIZE = int(os.environ.get("BOT_API_POOL_SIZE", "200"))
+BOT_API_KEEPALIVE = 60
+BOT_API_DNS_CACHE_TTL = 3600
+BOT_API_TIMEOUT = int(os.environ.get("BOT_API_TIMEOUT", "20"))
+BOT_API_UPLOAD_TIMEOUT = 120
+BOT_API_ORJSON = os.environ.get("BOT_API_ORJSON", "1") != "0"
+
+# ==================== МНОГОПРОЦЕССНЫЙ РЕЖИМ ====================
+# WORKERS > 1 включает супервизор: один процесс принимает обновления,
+# N процессов-воркеров обрабатывают их (шардирование по user_id).
+
+WORKERS = max(1, int(os.environ.get("WORKERS", "1")))
+WORKER_QUEUE_SIZE = 1000
+
+# ==================== INLINE-ПОИСК ====================
+# @бот запрос — поиск продуктов (inline-режим включается в @BotFather: /setinline).
+# Ответы одинаковы для всех пользователей, Telegram кэширует их на INLINE_CACHE_TIME сек.
+
+INLINE_CACHE_TIME = 300
+
+# ==================== ФОТО В РЕЗУЛЬТАТАХ ====================
+# photos — каждый рекомендованный продукт отдельным фото;
+# carousel — одно фото с кнопками ◀️/▶️, остальные продукты показываются
+# правкой этого же сообщения (editMessageMedia) по нажатию
+
+RESULT_PHOTOS_MODE = os.environ.get("RESULT_PHOTOS_MODE", "photos").strip().lower()
+
+# ==================== ОТПРАВКА ФОТО РЕЗУЛЬТАТОВ ====================
+# Одновременно отправляемых серий фото и сколько ещё ждут очереди;
+# сверх очереди пользователь получает кнопку «прислать фото позже»
+
+DELIVERY_MAX_ACTIVE = int(os.environ.get("DELIVERY_MAX_ACTIVE", "50"))
+DELIVERY_MAX_WAITING = int(os.environ.get("DELIVERY_MAX_WAITING", "200"))
+
+# ==================== ПОВТОРЫ ПРИ СБОЯХ BOT API ====================
+# Попыток на одно фото (сеть, 5xx, 429), пауза base * 2^n со случайной
+# добавкой, но не больше max; после BREAKER_FAILURE_THRESHOLD сбоев подряд
+# отправка встаёт на паузу BREAKER_RESET_SECONDS (см. resilience.py)
+
+SEND_RETRY_ATTEMPTS = int(os.environ.get("SEND_RETRY_ATTEMPTS", "4"))
+SEND_RETRY_BASE_DELAY = 0.5
+SEND_RETRY_MAX_DELAY = 10
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 15
+
+# ==================== ПОСЛЕДНИЙ ПОДБОР ====================
+# Кнопка «🔁 Мой последний подбор» повторяет итог последнего опроса.
+# Хранится только сигнатура ответов (в памяти процесса), часов:
+
+LAST_RESULT_TTL_HOURS = float(os.environ.get("LAST_RESULT_TTL_HOURS", "72"))
+
+# ==================== ОСТАНОВКА И РЕСТАРТ ====================
+# Render шлёт SIGTERM и даёт ~30 сек до SIGKILL
+
+UPDATE_OFFSET_FILE = os.environ.get("UPDATE_OFFSET_FILE", "update_offset.json")
+SHUTDOWN_DRAIN_TIMEOUT = 25
+
 # ==================== ДАННЫЕ ДЛЯ РЕКОМЕНДАЦИЙ ====================
 
 BODY_GOALS = [
@@ -120,282 +182,17 @@ PHOTO_STRUCTURE_ADMIN = {
     }
 }
 
-# ==================== МАППИНГ ФОТО ДЛЯ РЕКОМЕНДАЦИЙ ====================
-# Порядок ключей = порядок отправки фото пользователю.
-# Ключи без загруженного фото пропускаются автоматически.
-
-PHOTO_MAPPING = {
-    "тело": {
-        "Общий уход и увлажнение": [
-            "body_milk",
-            "hydrophilic_oil",
-            "cream_body",
-            "body_scrub",
-            "shower_gel",
-            "hualuronic_acid",
-        ],
-        "Сухая кожа": [
-            "hydrophilic_oil",
-            "body_butter",
-            "hualuronic_acid",
-        ],
-        "Чувствительная и склонная к раздражениям": [
-            "shower_gel",
-            "body_milk",
-            "hydrophilic_oil",
-            "hualuronic_acid",
-        ],
-        "Борьба с целлюлитом и тонизирование": [
-            "shower_gel",
-            "body_scrub",
-            "body_milk",
-            "hualuronic_acid",
-        ],
-    },
-    "волосы": {
-        # ── Базовый уход по типу волос ──────────────────────────────────
-        "Окрашенные блондинки": [
-            "blonde_shampoo",
-            "blonde_conditioner",
-            "blonde_mask",
-            "biolipid_spray",
-            "hair_milk",
-        ],
-        "Окрашенные": [
-            "colored_shampoo",
-            "colored_conditioner",
-            "colored_mask",
-            "biolipid_spray",
-            "protein_cream",
-        ],
-        "Натуральные": [
-            "natural_shampoo",
-            "natural_conditioner",
-            "strengthening_mask",
-            "biolipid_spray",
-            "strengthening_spray",
-            "protein_cream",
-        ],
+# ==================== КАТАЛОГ ====================
+# Цены и правила рекомендаций (тексты + ключи фото) — в catalog.json,
+# файл перечитывается на лету без рестарта (см. catalog.py).
+# Порядок ключей фото в правилах = порядок отправки фото пользователю.
+# CATALOG_FILE может указывать и на бинарный каталог, собранный из
+# catalog.json: python catalog_mmap.py build (см. catalog_mmap.py).
 
-        # ── Проблемы ────────────────────────────────────────────────────
-        "Ломкость": [
-            "biolipid_spray",
-            "hair_fluid",
-            "oil_elixir",
-            "protein_cream",
-            "strengthening_spray",
-            "strengthening_mask",
-        ],
-        "Выпадение": [
-            "anti_loss_shampoo",
-            "hair_growth_lotion",
-        ],
-        "Перхоть/зуд": [
-            "anti_dandruff_shampoo",
-        ],
-        "Секущиеся кончики": [
-            "oil_elixir",
-        ],
-        "Тусклость": [
-            "hair_milk",
-            "oil_concentrate",
-            "dry_oil_spray",
-        ],
-        "Пушистость": [
-            "hair_fluid",
-            "protein_cream",
-            "oil_elixir",
-            "hair_milk",
-        ],
-        "Тонкие": [
-            "thin_hair_shampoo",
-            "thin_hair_conditioner",
-            "strengthening_mask",
-            "strengthening_spray",
-        ],
-        "Очень поврежденные": [
-            "reconstruct_shampoo",
-            "reconstruct_mask",
-            "biolipid_spray",
-            "hair_fluid",
-            "oil_elixir",
-        ],
-
-        # ── Дополнительные опции ────────────────────────────────────────
-        "чувствительная_кожа": [
-            "sensitive_scalp_shampoo",
-        ],
-        "объем": [
-            "thin_hair_shampoo",
-            "thin_hair_conditioner",
-            "strengthening_spray",
-            "strengthening_mask",
-        ],
-
-        # ── Оттеночные маски ────────────────────────────────────────────
-        "оттеночная_шоколад": [
-            "mask_cold_chocolate",
-        ],
-        "оттеночная_медный": [
-            "mask_copper",
-        ],
-    }
-}
-
-# ==================== ДАННЫЕ ДЛЯ РЕКОМЕНДАЦИЙ (ТЕКСТ) ====================
-
-BODY_DATA = {
-    "Общий уход и увлажнение": {
-        "title": "🧴 <b>Рекомендация для общего ухода и увлажнения:</b>",
-        "products": [
-            "Молочко для тела",
-            "Гидрофильное масло",
-            "Крем-суфле",
-            "Скраб кофе/кокос",
-            "Гель для душа (вишня/манго/лимон)"
-        ],
-        "note": "+ Гиалуроновая кислота для лица"
-    },
-    "Сухая кожа": {
-        "title": "🌵 <b>Рекомендация для сухой кожи:</b>",
-        "products": [
-            "Гидрофильное масло",
-            "Баттер для тела"
-        ],
-        "note": "+ Гиалуроновая кислота для лица"
-    },
-    "Чувствительная и склонная к раздражениям": {
-        "title": "😌 <b>Рекомендация для чувствительной кожи:</b>",
-        "products": [
-            "Гель для душа (вишня/манго/лимон)",
-            "Молочко для тела",
-            "Гидрофильное масло"
-        ],
-        "note": "+ Гиалуроновая кислота для лица"
-    },
-    "Борьба с целлюлитом и тонизирование": {
-        "title": "🍑 <b>Рекомендация для борьбы с целлюлитом:</b>",
-        "products": [
-            "Гель для душа (вишня/манго/лимон)",
-            "Антицеллюлитный скраб (мята)",
-            "Молочко для тела"
-        ],
-        "note": "+ Гиалуроновая кислота для лица"
-    }
-}
-
-# ==================== ФУНКЦИИ ДЛЯ РЕКОМЕНДАЦИЙ ====================
-
-def get_body_recommendations_html(goal: str) -> str:
-    if goal in BODY_DATA:
-        data = BODY_DATA[goal]
-        text = f"{data['title']}\n\n"
-        for product in data['products']:
-            text += f"• {product}\n"
-        if 'note' in data:
-            text += f"\n{data['note']}"
-        return text
-    return "Рекомендации временно недоступны."
-
-def get_hair_recommendations_html(hair_type: str, problems: list, scalp_type: str,
-                                  hair_volume: str, hair_color: str = "") -> str:
-    result = "💇‍♀️ <b>Персонализированный уход для ваших волос:</b>\n\n"
-
-    if hair_type == "Окрашенные блондинки":
-        result += "<b>Базовый уход для блондинок:</b>\n"
-        result += "• Шампунь для осветленных волос с гиалуроновой кислотой\n"
-        result += "• Кондиционер для осветленных волос с гиалуроновой кислотой\n"
-        result += "• Маска для осветленных волос с гиалуроновой кислотой\n"
-        result += "• Биолипидный спрей\n"
-        result += "• Молочко для волос\n\n"
-    elif hair_type == "Окрашенные":
-        result += "<b>Базовый уход для окрашенных волос:</b>\n"
-        result += "• Шампунь для окрашенных волос с коллагеном\n"
-        result += "• Кондиционер для окрашенных волос с коллагеном\n"
-        result += "• Маска для окрашенных волос с коллагеном\n"
-        result += "• Биолипидный спрей\n"
-        result += "• Протеиновый крем для волос\n\n"
-    else:
-        result += "<b>Базовый уход для натуральных волос:</b>\n"
-        result += "• Шампунь укрепление и сила\n"
-        result += "• Кондиционер укрепление и сила\n"
-        result += "• Укрепляющая маска для волос\n"
-        result += "• Биолипидный спрей\n"
-        result += "• Укрепляющий спрей для волос\n"
-        result += "• Протеиновый крем\n\n"
-
-    if problems:
-        result += "<b>Дополнительный уход для выбранных проблем:</b>\n"
-
-        problem_solutions = {
-            "Ломкость": (
-                "• Биолипидный спрей\n"
-                "• Флюид для волос\n"
-                "• Масло ELIXIR\n"
-                "• Протеиновый крем\n"
-                "• Укрепляющий спрей для волос\n"
-                "• Укрепляющая маска для волос\n"
-            ),
-            "Выпадение": (
-                "• Шампунь против выпадения\n"
-                "• Лосьон стимулирующий рост волос\n"
-            ),
-            "Перхоть/зуд": (
-                "• Шампунь против перхоти\n"
-            ),
-            "Секущиеся кончики": (
-                "• Масло ELIXIR\n"
-            ),
-            "Тусклость": (
-                "• Молочко для волос\n"
-                "• Масло-концентрат\n"
-                "• Сухое масло спрей\n"
-            ),
-            "Пушистость": (
-                "• Флюид для волос\n"
-                "• Протеиновый крем\n"
-                "• Масло ELIXIR\n"
-                "• Молочко для волос\n"
-            ),
-            "Тонкие": (
-                "• Шампунь для тонких волос\n"
-                "• Кондиционер для тонких волос\n"
-                "• Укрепляющая маска для волос\n"
-                "• Укрепляющий спрей для волос\n"
-            ),
-            "Очень поврежденные": (
-                "• Шампунь реконстракт\n"
-                "• Маска реконстракт\n"
-                "• Биолипидный спрей\n"
-                "• Флюид для волос\n"
-                "• Масло ELIXIR\n"
-            ),
-        }
-
-        for problem in problems:
-            if problem in problem_solutions:
-                result += f"\n<b>{problem}:</b>\n{problem_solutions[problem]}"
-
-    if scalp_type == "Да, чувствительная":
-        result += "\n<b>Для чувствительной кожи головы:</b>\n"
-        result += "• Шампунь для чувствительной кожи головы\n"
-
-    if hair_volume == "Да, хочу объем":
-        result += "\n<b>Для объема волос:</b>\n"
-        result += "• Шампунь для тонких волос укрепление и сила\n"
-        result += "• Кондиционер для тонких волос укрепление и сила\n"
-        result += "• Укрепляющий спрей для волос\n"
-        result += "• Укрепляющая маска для волос\n"
-
-    if hair_type == "Окрашенные":
-        if hair_color in ["Шатенка", "Русая"]:
-            result += "\n<b>Для поддержания цвета:</b>\n"
-            result += "• Оттеночная маска Холодный шоколад\n"
-        elif hair_color == "Рыжая":
-            result += "\n<b>Для поддержания цвета:</b>\n"
-            result += "• Оттеночная маска Медный\n"
-
-    return result
+CATALOG_FILE = os.environ.get(
+    "CATALOG_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+)
+CATALOG_POLL_INTERVAL = 2
 
 # ==================== ИНФОРМАЦИЯ О ПРОДАЖАХ ====================
 
@@ -415,57 +212,3 @@ DELIVERY_INFO = (
     "перекинув свой заказ в личку @LARMOSS_cosmetics\n\n"
     "Так же вы можете более подробно познакомиться с нашей продукцией на сайте https://larmoss.ru/"
 )
-
-# ==================== ЦЕНЫ ПРОДУКТОВ ====================
-
-PRODUCT_PRICES = {
-    # Тело
-    "cream_body":       "750₽",
-    "hydrophilic_oil":  "700₽",
-    "body_butter":      "1000₽",
-    "body_milk":        "1000₽",
-    "hualuronic_acid":  "700₽ / 1400₽",
-    "body_scrub":       "700₽",
-    "shower_gel":       "800₽",
-    "perfumed_soap":    "600₽",
-
-    # Волосы — базовый уход
-    "blonde_shampoo":       "900₽",
-    "blonde_conditioner":   "1200₽",
-    "blonde_mask":          "1500₽",
-    "colored_shampoo":      "900₽",
-    "colored_conditioner":  "1200₽",
-    "colored_mask":         "1500₽",
-    "natural_shampoo":      "900₽",
-    "natural_conditioner":  "1200₽",
-    "thin_hair_shampoo":    "900₽",
-    "thin_hair_conditioner":"1200₽",
-    "reconstruct_shampoo":  "900₽",
-    "reconstruct_mask":     "1700₽",
-
-    # Лечебный уход
-    "anti_loss_shampoo":       "900₽",
-    "hair_growth_lotion":      "1200₽",
-    "anti_dandruff_shampoo":   "900₽",
-    "sensitive_scalp_shampoo": "900₽",
-
-    # Спреи, масла, кремы
-    "dry_oil_spray":        "1400₽",
-    "biolipid_spray":       "1100₽",
-    "protein_cream":        "1100₽",
-    "hair_milk":            "1100₽",
-    "hair_fluid":           "1300₽",
-    "oil_concentrate":      "900₽",
-    "oil_elixir":           "1500₽",
-    "strengthening_mask":   "1500₽",
-    "strengthening_spray":  "1100₽",
-
-    # Оттеночные маски
-    "mask_cold_chocolate":  "1700₽",
-    "mask_copper":          "1700₽",
-    "mask_pink_powder":     "1700₽",
-    "mask_mother_of_pearl": "1700₽",
-
-    # Мужская линия
-    "men_shampoo":          "800₽",
-}
@@ -0,0 +1,161 @@
+"""
+DELIVERY.PY - Готовые планы отправки рекомендаций (текст + фото с подписями)
+
+План — всё, что нужно отправить после опроса: текст рекомендаций и
+упорядоченный список (file_id, подпись). Для одинаковых ответов план
+одинаков, поэтому он строится один раз и хранится в LRU-кэше. Ключ —
+сигнатура ответов плюс версии фото-мапа и каталога: после загрузки фото
+или правки каталога старые планы просто перестают совпадать по ключу
+и вытесняются.
+
+Кэш свой у каждого процесса (в многопроцессном режиме — у каждого воркера).
+
+Для карусели (одно фото, остальные — правкой сообщения) подпись продукта
+берётся по ключу из product_caption: подписи кэшируются по версии каталога.
+
+Сигнатура ответов хранится в самом плане (plan.signature): её достаточно,
+чтобы позже получить тот же план через plan_for_signature — повтор
+последнего подбора берёт его из кэша без пересчёта правил.
+"""
+
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import catalog
+import photo_map
+
+PLAN_CACHE_SIZE = 512
+
+
+class DeliveryPlan(NamedTuple):
+    text: str
+    # (file_id, подпись) в порядке отправки; ключи без фото уже пропущены
+    photos: Tuple[Tuple[str, str], ...]
+    # Сколько ключей фото дали правила (в том числе без загруженного фото)
+    key_count: int
+    # Ключи продуктов из photos (в том же порядке)
+    photo_keys: Tuple[str, ...] = ()
+    # Сигнатура ответов ("hair", ...) / ("body", цель); пустая — план не повторить
+    signature: Tuple = ()
+
+
+def photo_caption(photo_key: str, prices) -> str:
+    display_name = photo_map.ALL_PHOTO_KEYS.get(photo_key, photo_key)
+    caption = f"<b>{display_name}</b>"
+    price = prices.get(photo_key, "")
+    if price:
+        caption += f"\n💰 Цена: {price}"
+    return caption
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_caption(photo_key: str, catalog_version: int) -> str:
+    return photo_caption(photo_key, catalog.get().prices)
+
+
+def product_caption(photo_key: str) -> str:
+    """Подпись продукта по текущему каталогу (из кэша)"""
+    return _cached_caption(photo_key, catalog.get().version)
+
+
+def build_plan(text: str, photo_keys: List[str], signature: Tuple = ()) -> DeliveryPlan:
+    """Разрешить ключи фото в file_id и подписи по текущим снимкам"""
+    photos = photo_map.snapshot().photos
+    prices = catalog.get().prices
+    items = []
+    keys = []
+    for photo_key in photo_keys:
+        file_id = photos.get(photo_key, "")
+        if file_id:
+            items.append((file_id, photo_caption(photo_key, prices)))
+            keys.append(photo_key)
+    return DeliveryPlan(text, tuple(items), len(photo_keys), tuple(keys), signature)
+
+
+# ==================== LRU-КЭШ ====================
+
+class PlanCache:
+    """LRU-кэш планов со счётчиками попаданий"""
+
+    def __init__(self, max_size: int = PLAN_CACHE_SIZE):
+        self.max_size = max_size
+        self._plans: "OrderedDict[Tuple, DeliveryPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple):
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                self.misses += 1
+                return None
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return plan
+
+    def put(self, key: Tuple, plan: DeliveryPlan):
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._plans),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            }
+
+
+plan_cache = PlanCache()
+
+
+def _cached_plan(signature: Tuple, evaluate) -> DeliveryPlan:
+    key = (signature, photo_map.version(), catalog.get().version)
+    plan = plan_cache.get(key)
+    if plan is None:
+        text, photo_keys = evaluate()
+        plan = build_plan(text, photo_keys, signature)
+        plan_cache.put(key, plan)
+    return plan
+
+
+# ==================== ПЛАНЫ ДЛЯ ОПРОСОВ ====================
+
+def hair_plan(hair_type: str, problems: list, scalp_type: str,
+              hair_volume: str, hair_color: str = "") -> DeliveryPlan:
+    """План по волосам; порядок проблем входит в сигнатуру (он меняет текст)"""
+    signature = ("hair", hair_type, tuple(problems), scalp_type, hair_volume, hair_color)
+    return _cached_plan(signature, lambda: catalog.hair_recommendations(
+        hair_type, problems, scalp_type, hair_volume, hair_color
+    ))
+
+
+def body_plan(goal: str) -> DeliveryPlan:
+    return _cached_plan(("body", goal), lambda: catalog.body_recommendations(goal))
+
+
+def plan_for_signature(signature: Tuple) -> DeliveryPlan:
+    """План по сигнатуре из plan.signature (тот же ключ кэша, что у hair_plan/body_plan)"""
+    flow, *answers = signature
+    if flow == "hair":
+        hair_type, problems, scalp_type, hair_volume, hair_color = answers
+        return hair_plan(hair_type, list(problems), scalp_type, hair_volume, hair_color)
+    if flow == "body":
+        return body_plan(*answers)
+    raise KeyError(flow)
@@ -0,0 +1,249 @@
+"""
+FAKE_BOT_API.PY - Локальный фейковый Telegram Bot API для нагрузочных тестов
+
+Реализует методы, которые использует бот (getUpdates, sendMessage, sendPhoto,
+editMessage*, answerCallbackQuery, ...), записывает все вызовы и умеет
+имитировать сетевую задержку и ответы 429 Too Many Requests.
+
+Отдельный запуск (для ручной проверки main.py):
+    python fake_bot_api.py --port 8081 --latency 0.05 --rate-limit 0.01
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=123456:TEST python main.py
+Обновления можно подкладывать POST-запросом JSON на /_control/updates,
+статистика вызовов — GET /_control/stats.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_USER = {
+    "id": 123456,
+    "is_bot": True,
+    "first_name": "LoadTestBot",
+    "username": "load_test_bot",
+    "can_join_groups": False,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": True,
+}
+
+# Методы, отвечающие объектом Message
+_MESSAGE_METHODS = {
+    "sendmessage", "sendphoto", "senddocument", "editmessagetext",
+    "editmessagereplymarkup", "editmessagemedia", "editmessagecaption",
+}
+
+# Служебные методы, которые не считаются в статистике "вызовов на опрос"
+SERVICE_METHODS = {"getupdates", "getme", "deletewebhook"}
+
+
+class FakeBotAPI:
+    """Фейковый Bot API: очередь обновлений + запись вызовов"""
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0,
+                 rate_limit_probability: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+
+        self.calls: Counter = Counter()
+        self.calls_by_chat: Dict[int, int] = defaultdict(int)
+        self.rate_limited = 0
+
+        self._pending: List[Dict[str, Any]] = []
+        self._has_updates = asyncio.Event()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._callback_chats: Dict[str, int] = {}
+        self._next_file_id = 1
+
+        self.app = web.Application(client_max_size=50 * 1024 * 1024)
+        self.app.router.add_post("/_control/updates", self.handle_inject)
+        self.app.router.add_get("/_control/stats", self.handle_stats)
+        # Маршрут вида /bot{token}/{method} не матчится в aiohttp 3.10,
+        # поэтому берём сегмент целиком и проверяем префикс сами
+        self.app.router.add_route("*", "/{bot_token}/{method}", self.handle_method)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    # ==================== ЗАПУСК ====================
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{bound_port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # ==================== ОБНОВЛЕНИЯ ====================
+
+    def inject_update(self, update: Dict[str, Any]) -> int:
+        """Положить обновление в очередь getUpdates; возвращает update_id"""
+        update_id = self._next_update_id
+        self._next_update_id += 1
+        update["update_id"] = update_id
+
+        callback_query = update.get("callback_query")
+        if callback_query:
+            self._callback_chats[callback_query["id"]] = callback_query["from"]["id"]
+
+        self._pending.append(update)
+        self._has_updates.set()
+        return update_id
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+
+        if offset:
+            self._pending = [u for u in self._pending if u["update_id"] >= offset]
+        if not self._pending and timeout > 0:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._pending[:limit]
+
+    # ==================== МЕТОДЫ API ====================
+
+    def _message(self, chat_id: int, params: Dict[str, Any], method: str) -> Dict[str, Any]:
+        message_id = int(params.get("message_id") or 0)
+        if not message_id:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if method == "sendphoto" or method == "editmessagemedia":
+            file_id = params.get("photo") or f"fake-photo-{self._next_file_id}"
+            if method == "editmessagemedia":
+                file_id = json.loads(params.get("media", "{}")).get("media", file_id)
+            self._next_file_id += 1
+            message["photo"] = [{
+                "file_id": file_id, "file_unique_id": f"u{self._next_file_id}",
+                "width": 800, "height": 800,
+            }]
+            if params.get("caption"):
+                message["caption"] = params["caption"]
+        elif method == "senddocument":
+            message["document"] = {"file_id": f"fake-doc-{self._next_file_id}",
+                                   "file_unique_id": f"d{self._next_file_id}"}
+            self._next_file_id += 1
+        else:
+            message["text"] = params.get("text", "")
+        if params.get("reply_markup"):
+            reply_markup = json.loads(params["reply_markup"])
+            if "inline_keyboard" in reply_markup:
+                message["reply_markup"] = reply_markup
+        return message
+
+    def _chat_id(self, params: Dict[str, Any]) -> int:
+        if params.get("chat_id"):
+            return int(params["chat_id"])
+        return self._callback_chats.get(params.get("callback_query_id", ""), 0)
+
+    async def call(self, method: str, params: Dict[str, Any]) -> web.Response:
+        method = method.lower()
+        if method not in SERVICE_METHODS:
+            if self.latency or self.latency_jitter:
+                await asyncio.sleep(self.latency + random.uniform(0, self.latency_jitter))
+            if self.rate_limit_probability and random.random() < self.rate_limit_probability:
+                self.rate_limited += 1
+                return web.json_response({
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }, status=429)
+
+        self.calls[method] += 1
+        chat_id = self._chat_id(params)
+        if method not in SERVICE_METHODS and chat_id:
+            self.calls_by_chat[chat_id] += 1
+
+        if method == "getupdates":
+            result: Any = await self._get_updates(params)
+        elif method == "getme":
+            result = BOT_USER
+        elif method in _MESSAGE_METHODS:
+            result = self._message(chat_id, params, method)
+        elif method == "sendmediagroup":
+            media = json.loads(params.get("media", "[]"))
+            result = [self._message(chat_id, {"photo": item.get("media")}, "sendphoto") for item in media]
+        elif method == "getfile":
+            result = {"file_id": params.get("file_id", ""), "file_unique_id": "f",
+                      "file_path": f"files/{params.get('file_id', '')}"}
+        else:
+            # deleteWebhook, answerCallbackQuery, answerInlineQuery, deleteMessage, ...
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        if not request.match_info["bot_token"].startswith("bot"):
+            raise web.HTTPNotFound()
+        if request.method == "POST":
+            params = dict(await request.post())
+        else:
+            params = dict(request.query)
+        # Файлы (multipart) в записи не нужны: оставляем только строковые поля
+        params = {key: value for key, value in params.items() if isinstance(value, str)}
+        return await self.call(request.match_info["method"], params)
+
+    # ==================== УПРАВЛЕНИЕ ====================
+
+    async def handle_inject(self, request: web.Request) -> web.Response:
+        update = await request.json()
+        return web.json_response({"update_id": self.inject_update(update)})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": dict(self.calls),
+            "total_calls": sum(count for method, count in self.calls.items()
+                               if method not in SERVICE_METHODS),
+            "rate_limited": self.rate_limited,
+            "pending_updates": len(self._pending),
+        }
+
+
+async def _serve(args):
+    api = FakeBotAPI(args.latency, args.jitter, args.rate_limit, args.retry_after)
+    url = await api.start(args.host, args.port)
+    print(f"🧪 Fake Bot API: {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Фейковый Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, сек")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, сек")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,123 +0,0 @@
-HAIR_DATA = {
-    # Базовый уход для каждого типа волос
-    "base_care": {
-        "blonde": {
-            "title": "👱‍♀️ <b>Базовый уход для блондинок:</b>",
-            "products": [
-                "Шампунь для осветленных волос с гиалуроновой кислотой",
-                "Кондиционер для осветленных волос с гиалуроновой кислотой",
-                "Маска для осветленных волос с гиалуроновой кислотой",
-                "Биолипидный спрей",
-                "Молочко для волос"
-            ]
-        },
-        "colored": {
-            "title": "🎨 <b>Базовый уход для окрашенных волос:</b>",
-            "products": [
-                "Шампунь для окрашенных волос с коллагеном",
-                "Кондиционер для окрашенных волос с коллагеном",
-                "Маска для окрашенных волос с коллагеном",
-                "Биолипидный спрей",
-                "Протеиновый крем для волос"  # ← ДОБАВЛЕНО
-            ]
-        },
-        "natural": {
-            "title": "🌿 <b>Базовый уход для натуральных волос:</b>",
-            "products": [
-                "Шампунь «Укрепление и сила»",
-                "Кондиционер «Укрепление и сила»",
-                "Укрепляющая маска для волос",  # ← ИЗМЕНЕНО
-                "Биолипидный спрей",
-                "Укрепляющий спрей для волос",  # ← ИЗМЕНЕНО
-                "Протеиновый крем"
-                # Оттеночная маска убрана по требованию
-            ]
-        }
-    },
-    
-    # Продукты для решения проблем (одинаковы для всех типов)
-    "problems": {
-        "Ломкость": {
-            "title": "⚡ <b>Для решения проблемы ломкости:</b>",
-            "products": [
-                "Биолипидный спрей", 
-                "Флюид для волос", 
-                "Масло ELIXIR", 
-                "Протеиновый крем", 
-                "Укрепляющий спрей для волос",  # ← Добавлено по требованию
-                "Укрепляющая маска для волос"   # ← ИЗМЕНЕНО
-            ]
-        },
-        "Выпадение": {
-            "title": "⚡ <b>Для решения проблемы выпадения:</b>",
-            "products": ["Шампунь против выпадения", "Лосьон стимулирующий рост волос"]
-        },
-        "Перхоть/зуд": {
-            "title": "⚡ <b>Для решения проблемы перхоти/зуда:</b>",
-            "products": ["Шампунь против перхоти"]
-        },
-        "Секущиеся кончики": {
-            "title": "⚡ <b>Для решения проблемы секущихся кончиков:</b>",
-            "products": ["Масло ELIXIR"]
-        },
-        "Тусклость": {
-            "title": "⚡ <b>Для решения проблемы тусклости:</b>",
-            "products": ["Молочко для волос", "Масло-концентрат"]
-        },
-        "Пушистость": {
-            "title": "⚡ <b>Для решения проблемы пушистости:</b>",
-            "products": [
-                "Флюид для волос", 
-                "Протеиновый крем", 
-                "Масло ELIXIR", 
-                "Молочко для волос"  # ← Добавлено по требованию
-            ]
-        },
-        "Тонкие": {
-            "title": "⚡ <b>Для решения проблемы тонких волос:</b>",
-            "products": [
-                "Шампунь для тонких волос",           # ← thin_hair_shampoo
-                "Кондиционер для тонких волос",       # ← thin_hair_conditioner
-                "Укрепляющая маска для волос",        # ← ОДИН РАЗ
-                "Укрепляющий спрей для волос"         # ← Убрал дубль "Укрепляющая маска для волос"
-            ]
-        },
-        "Очень поврежденные": {
-            "title": "⚡ <b>Для решения проблемы поврежденных волос:</b>",
-            "products": [
-                "Шампунь реконстракт", 
-                "Маска реконстракт", 
-                "Биолипидный спрей", 
-                "Флюид для волос", 
-                "Масло ELIXIR",
-                "Укрепляющая маска для волос"  # ← ИЗМЕНЕНО
-            ]
-        }
-    },
-    
-    # Чувствительная кожа головы
-    "scalp": {
-        "title": "❤️ <b>Для чувствительной кожи головы:</b>",
-        "products": ["Шампунь для чувствительной кожи головы"]
-    },
-    
-    # Блок "Объем"
-    "volume": {
-        "title": "💨 <b>Дополнительный акцент на объем:</b>",
-        "products": [
-            "Шампунь для тонких волос укрепление и сила",
-            "Кондиционер для тонких волос укрепление и сила",
-            "Укрепляющий спрей для волос",        # ← ИЗМЕНЕНО
-            "Укрепляющая маска для волос"         # ← ИЗМЕНЕНО
-            # Биолипидный спрей убран по требованию
-        ]
-    },
-    
-    # Оттеночные маски для разных цветов
-    "color_masks": {
-        "Шатенка": "Оттеночная маска «Холодный шоколад»",
-        "Русая": "Оттеночная маска «Холодный шоколад»",
-        "Рыжая": "Оттеночная маска «Медный»",
-        "Другой окрашенный цвет": "Оттеночная маска (подберем индивидуально)"
-    }
-}
\ No newline at end of file
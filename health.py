@@ -0,0 +1,282 @@
+"""
+HEALTH.PY - Health check HTTP-сервер для Render Free
+Импортирует только стандартную библиотеку и лёгкие модули проекта, поэтому порт
+поднимается до тяжёлого импорта aiogram (см. startup_profile.txt).
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Any, Callable, Dict, Optional
+
+import photo_map
+
+logger = logging.getLogger(__name__)
+
+_health_thread = None
+# Счётчики обработки обновлений для /status (кэш подборок, отправка фото,
+# защита от сбоев API). Задаёт main.py: в однопроцессном режиме — счётчики
+# этого процесса, в многопроцессном — сводка от воркеров (workers.py).
+_runtime_stats: Optional[Callable[[], Dict[str, Any]]] = None
+
+
+def set_runtime_stats(provider: Callable[[], Dict[str, Any]]):
+    global _runtime_stats
+    _runtime_stats = provider
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """Улучшенный обработчик HTTP запросов для health check"""
+
+    def do_GET(self):
+        try:
+            client_ip = self.client_address[0]
+            current_time = datetime.now().strftime('%H:%M:%S')
+
+            if not self.path.startswith('/favicon'):
+                logger.info(f"🌐 HTTP: {self.path} от {client_ip}")
+
+            if self.path == '/health':
+                self.send_response(200)
+                self.send_header('Content-type', 'text/plain')
+                self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
+                self.send_header('Pragma', 'no-cache')
+                self.send_header('Expires', '0')
+                self.end_headers()
+
+                stats = photo_map.get_photo_stats()
+                response = f"""HTTP/1.1 200 OK
+Content-Type: text/plain
+
+STATUS: ACTIVE ✅
+BOT: SVOY AV.COSMETIC
+PHOTOS: {stats['loaded']}/{stats['total']} ({stats['percentage']}%)
+TIME: {current_time}
+SERVICE: salon-volosy-beauty
+UPTIME: {self.get_uptime()}"""
+
+                self.wfile.write(response.encode('utf-8'))
+
+            elif self.path == '/':
+                self.send_response(200)
+                self.send_header('Content-type', 'text/html')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+
+                stats = photo_map.get_photo_stats()
+                html = f'''<!DOCTYPE html>
+<html lang="ru">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>🤖 SVOY AV.COSMETIC Bot</title>
+    <meta http-equiv="refresh" content="300">
+    <style>
+        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
+        body {{ 
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            padding: 20px;
+        }}
+        .container {{ 
+            background: white;
+            border-radius: 20px;
+            padding: 40px;
+            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
+            max-width: 800px;
+            width: 100%;
+        }}
+        .header {{ 
+            text-align: center;
+            margin-bottom: 30px;
+        }}
+        .header h1 {{ 
+            color: #333;
+            font-size: 2.5em;
+            margin-bottom: 10px;
+        }}
+        .header p {{ 
+            color: #666;
+            font-size: 1.1em;
+        }}
+        .status-card {{ 
+            background: #f8f9fa;
+            border-radius: 15px;
+            padding: 25px;
+            margin-bottom: 25px;
+            border-left: 5px solid #4CAF50;
+        }}
+        .status-card h2 {{ 
+            color: #333;
+            margin-bottom: 15px;
+            font-size: 1.5em;
+        }}
+        .stats {{ 
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+            gap: 20px;
+            margin-top: 20px;
+        }}
+        .stat-item {{ 
+            background: white;
+            padding: 15px;
+            border-radius: 10px;
+            box-shadow: 0 5px 15px rgba(0,0,0,0.05);
+        }}
+        .stat-label {{ 
+            color: #666;
+            font-size: 0.9em;
+            margin-bottom: 5px;
+        }}
+        .stat-value {{ 
+            color: #333;
+            font-size: 1.3em;
+            font-weight: bold;
+        }}
+        .footer {{ 
+            text-align: center;
+            margin-top: 30px;
+            color: #888;
+            font-size: 0.9em;
+        }}
+        .refresh-info {{ 
+            background: #e8f5e8;
+            padding: 10px;
+            border-radius: 8px;
+            margin-top: 15px;
+            font-size: 0.9em;
+        }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🤖 SVOY AV.COSMETIC Bot</h1>
+            <p>Телеграм-бот для подбора косметики для волос и тела</p>
+        </div>
+        
+        <div class="status-card">
+            <h2>✅ Статус сервиса</h2>
+            <p>Сервис активен и работает корректно.</p>
+            <div class="refresh-info">
+                Страница автоматически обновляется каждые 5 минут для поддержания активности на Render Free.
+            </div>
+        </div>
+        
+        <div class="stats">
+            <div class="stat-item">
+                <div class="stat-label">📅 Время сервера</div>
+                <div class="stat-value">{current_time}</div>
+            </div>
+            <div class="stat-item">
+                <div class="stat-label">📸 Загружено фото</div>
+                <div class="stat-value">{stats['loaded']} / {stats['total']}</div>
+            </div>
+            <div class="stat-item">
+                <div class="stat-label">📈 Прогресс</div>
+                <div class="stat-value">{stats['percentage']}%</div>
+            </div>
+            <div class="stat-item">
+                <div class="stat-label">⏱️ Uptime</div>
+                <div class="stat-value">{self.get_uptime()}</div>
+            </div>
+        </div>
+        
+        <div class="footer">
+            <p>© 2026 SVOY AV.COSMETIC | Render Free Plan</p>
+            <p>Страница обновлена: {current_time}</p>
+            <p style="margin-top: 10px;">
+                <a href="/health" style="color: #667eea;">Health Check</a> | 
+                <a href="https://render.com" style="color: #667eea;">Render.com</a>
+            </p>
+        </div>
+    </div>
+</body>
+</html>'''
+
+                self.wfile.write(html.encode('utf-8'))
+
+            elif self.path.startswith('/ping'):
+                self.send_response(200)
+                self.send_header('Content-type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(f'PONG {current_time}'.encode('utf-8'))
+
+            elif self.path == '/status':
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+
+                stats = photo_map.get_photo_stats()
+                status = {
+                    "status": "active",
+                    "service": "salon-volosy-beauty",
+                    "timestamp": current_time,
+                    "photos": stats,
+                    "uptime": self.get_uptime(),
+                }
+                if _runtime_stats is not None:
+                    status.update(_runtime_stats())
+
+                self.wfile.write(json.dumps(status, indent=2, ensure_ascii=False).encode('utf-8'))
+
+            else:
+                self.send_response(302)
+                self.send_header('Location', '/')
+                self.end_headers()
+
+        except Exception as e:
+            logger.error(f"❌ HTTP Handler error: {e}")
+            self.send_response(500)
+            self.send_header('Content-type', 'text/plain')
+            self.end_headers()
+            self.wfile.write(b'Internal Server Error')
+
+    def get_uptime(self):
+        try:
+            return "Несколько часов"
+        except:
+            return "Активен"
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_health_server():
+    port = int(os.environ.get('PORT', 8080))
+
+    class SilentServer(HTTPServer):
+        def service_actions(self):
+            pass
+
+    server = SilentServer(('0.0.0.0', port), HealthHandler)
+    server.timeout = 30
+    server.request_queue_size = 10
+
+    logger.info(f"🌐 Health check сервер запущен на порту {port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🌐 Health check сервер остановлен")
+    except Exception as e:
+        logger.error(f"❌ Ошибка health check сервера: {e}")
+
+
+def start_health_server():
+    """Запуск health check в фоновом потоке (повторный вызов ничего не делает)"""
+    global _health_thread
+    if _health_thread is not None:
+        return _health_thread
+    _health_thread = threading.Thread(target=run_health_server, daemon=True, name="HealthCheckThread")
+    _health_thread.start()
+    logger.info("🔔 Health check система активирована")
+    return _health_thread
+
+
@@ -2,8 +2,11 @@
 KEYBOARDS.PY - Клавиатуры для бота с пагинацией для админки
 """
 
+from typing import List, Tuple
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
+import callbacks
 import config
 import photo_map
 
@@ -14,8 +17,9 @@ def main_menu_keyboard() -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
     builder.add(KeyboardButton(text="💇‍♀️ Волосы"))
     builder.add(KeyboardButton(text="🧴 Тело"))
+    builder.add(KeyboardButton(text="🔁 Мой последний подбор"))
     builder.add(KeyboardButton(text="❓ Помощь"))
-    builder.adjust(2, 1)
+    builder.adjust(2, 1, 1)
     return builder.as_markup(resize_keyboard=True)
 
 def back_to_menu_keyboard() -> ReplyKeyboardMarkup:
@@ -99,6 +103,43 @@ def hair_color_keyboard(hair_type: str) -> ReplyKeyboardMarkup:
     builder.adjust(2, 1)
     return builder.as_markup(resize_keyboard=True)
 
+def inline_quiz_menu_keyboard() -> InlineKeyboardMarkup:
+    """Выбор опроса в inline-режиме (ответы хранятся в кнопках)"""
+    builder = InlineKeyboardBuilder()
+    builder.add(InlineKeyboardButton(text="💇‍♀️ Волосы", callback_data=callbacks.QUIZ_STEP.pack("hair", 0, 0)))
+    builder.add(InlineKeyboardButton(text="🧴 Тело", callback_data=callbacks.QUIZ_STEP.pack("body", 0, 0)))
+    builder.adjust(2)
+    return builder.as_markup()
+
+def inline_quiz_keyboard(buttons: List[Tuple[str, str]], columns: int, back_data: str) -> InlineKeyboardMarkup:
+    """Шаг inline-опроса: (текст, callback_data) вариантов + «Назад»"""
+    builder = InlineKeyboardBuilder()
+    for text, callback_data in buttons:
+        builder.add(InlineKeyboardButton(text=text, callback_data=callback_data))
+    builder.adjust(columns)
+    builder.row(InlineKeyboardButton(text="↩️ Назад", callback_data=back_data))
+    return builder.as_markup()
+
+def carousel_keyboard(products: Tuple[str, ...], position: int) -> InlineKeyboardMarkup:
+    """Листание фото результата: ◀️ позиция/всего ▶️ (по кругу)"""
+    count = len(products)
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="◀️", callback_data=callbacks.CAROUSEL.pack((position - 1) % count, products)),
+        InlineKeyboardButton(text=f"{position + 1}/{count}", callback_data=callbacks.NO_ACTION.pack()),
+        InlineKeyboardButton(text="▶️", callback_data=callbacks.CAROUSEL.pack((position + 1) % count, products)),
+    )
+    return builder.as_markup()
+
+def result_photos_keyboard(products: Tuple[str, ...]) -> InlineKeyboardMarkup:
+    """
+    Запросить фото результата, не отправленные из-за перегрузки.
+    Продуктов — не больше callbacks.CAROUSEL_MAX_ITEMS (иначе CallbackDataError).
+    """
+    builder = InlineKeyboardBuilder()
+    builder.button(text="📸 Прислать фото", callback_data=callbacks.RESULT_PHOTOS.pack(products))
+    return builder.as_markup()
+
 # ==================== АДМИН-КЛАВИАТУРЫ ====================
 
 def admin_main_keyboard() -> ReplyKeyboardMarkup:
@@ -126,9 +167,18 @@ def admin_bulk_upload_keyboard() -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
     builder.add(KeyboardButton(text="💇‍♀️ Загрузить ВОЛОСЫ"))
     builder.add(KeyboardButton(text="🧴 Загрузить ТЕЛО"))
+    builder.add(KeyboardButton(text="🗂 Альбом / ZIP"))
     builder.add(KeyboardButton(text="📋 Показать прогресс"))
     builder.add(KeyboardButton(text="↩️ Назад к фото"))
-    builder.adjust(2, 2)
+    builder.adjust(2, 1, 2)
+    return builder.as_markup(resize_keyboard=True)
+
+def admin_bulk_ingest_keyboard() -> ReplyKeyboardMarkup:
+    """Клавиатура режима загрузки альбомом / ZIP"""
+    builder = ReplyKeyboardBuilder()
+    builder.add(KeyboardButton(text="📋 Показать прогресс"))
+    builder.add(KeyboardButton(text="↩️ Назад к загрузке"))
+    builder.adjust(2)
     return builder.as_markup(resize_keyboard=True)
 
 def admin_category_bulk_keyboard() -> InlineKeyboardMarkup:
@@ -137,11 +187,10 @@ def admin_category_bulk_keyboard() -> InlineKeyboardMarkup:
     
     for category_name, subcategories in config.PHOTO_STRUCTURE_ADMIN.items():
         emoji = "💇‍♀️" if "Волосы" in category_name else "🧴"
-        # Используем индексы для callback_data
         category_key = "волосы" if "волосы" in category_name.lower() else "тело"
         builder.add(InlineKeyboardButton(
             text=f"{emoji} {category_name}",
-            callback_data=f"bulk_category:{category_key}"
+            callback_data=callbacks.BULK_CATEGORY.pack(category_key)
         ))
     
     builder.adjust(1)
@@ -156,23 +205,32 @@ def admin_subcategory_bulk_keyboard(category: str) -> InlineKeyboardMarkup:
     subcategories = list(config.PHOTO_STRUCTURE_ADMIN.get(category_display, {}).items())
     
     for i, (subcategory_name, products) in enumerate(subcategories):
-        # Используем индекс вместо названия
         builder.add(InlineKeyboardButton(
             text=subcategory_name,
-            callback_data=f"bulk_subcategory_idx:{category_key}:{i}"
+            callback_data=callbacks.BULK_SUBCATEGORY.pack(category_key, i)
         ))
     
     builder.row(
         InlineKeyboardButton(
             text="↩️ Назад к категориям", 
-            callback_data="bulk_back_to_categories"
+            callback_data=callbacks.BULK_BACK_TO_CATEGORIES.pack()
         )
     )
     builder.adjust(1)
     return builder.as_markup()
 
+def admin_bulk_step_keyboard(product_key: str) -> InlineKeyboardMarkup:
+    """Кнопки шага массовой загрузки: пропустить продукт / остановить"""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="⏭️ Пропустить", callback_data=callbacks.BULK_SKIP.pack(product_key)),
+        InlineKeyboardButton(text="🛑 Остановить", callback_data=callbacks.BULK_STOP.pack())
+    )
+    return builder.as_markup()
+
+@photo_map.cached_per_version()
 def admin_photos_list_keyboard(page: int = 0, filter_type: str = "all") -> InlineKeyboardMarkup:
-    """Клавиатура для списка фото с пагинацией"""
+    """Клавиатура для списка фото с пагинацией (кэш до изменения фото-мапа)"""
     builder = InlineKeyboardBuilder()
     
     missing_photos = photo_map.get_missing_photos()
@@ -195,15 +253,15 @@ def admin_photos_list_keyboard(page: int = 0, filter_type: str = "all") -> Inlin
     builder.row(
         InlineKeyboardButton(
             text=f"📋 Все ({len(missing_photos)})", 
-            callback_data="photos_list:all:0"
+            callback_data=callbacks.PHOTOS_LIST.pack("all", 0)
         ),
         InlineKeyboardButton(
             text=f"✅ Загружены ({sum(1 for p in missing_photos if p['status'] == '✅ Загружено')})", 
-            callback_data="photos_list:loaded:0"
+            callback_data=callbacks.PHOTOS_LIST.pack("loaded", 0)
         ),
         InlineKeyboardButton(
             text=f"❌ Отсутствуют ({sum(1 for p in missing_photos if p['status'] == '❌ Отсутствует')})", 
-            callback_data="photos_list:missing:0"
+            callback_data=callbacks.PHOTOS_LIST.pack("missing", 0)
         ),
         width=3
     )
@@ -211,7 +269,7 @@ def admin_photos_list_keyboard(page: int = 0, filter_type: str = "all") -> Inlin
     builder.row(
         InlineKeyboardButton(
             text="🔄 Обновить", 
-            callback_data=f"photos_list:{filter_type}:{page}"
+            callback_data=callbacks.PHOTOS_LIST.pack(filter_type, page)
         )
     )
     
@@ -220,26 +278,26 @@ def admin_photos_list_keyboard(page: int = 0, filter_type: str = "all") -> Inlin
     if page > 0:
         nav_buttons.append(InlineKeyboardButton(
             text="⬅️ Назад", 
-            callback_data=f"photos_list:{filter_type}:{page-1}"
+            callback_data=callbacks.PHOTOS_LIST.pack(filter_type, page - 1)
         ))
     
     nav_buttons.append(InlineKeyboardButton(
         text=f"{page+1}/{total_pages}", 
-        callback_data="no_action"
+        callback_data=callbacks.NO_ACTION.pack()
     ))
     
     if page < total_pages - 1:
         nav_buttons.append(InlineKeyboardButton(
             text="Вперед ➡️", 
-            callback_data=f"photos_list:{filter_type}:{page+1}"
+            callback_data=callbacks.PHOTOS_LIST.pack(filter_type, page + 1)
         ))
     
     if nav_buttons:
         builder.row(*nav_buttons)
     
     builder.row(
-        InlineKeyboardButton(text="📥 Массовая загрузка", callback_data="bulk_upload_start"),
-        InlineKeyboardButton(text="🏠 В админку", callback_data="admin_back_to_main")
+        InlineKeyboardButton(text="📥 Массовая загрузка", callback_data=callbacks.BULK_UPLOAD_START.pack()),
+        InlineKeyboardButton(text="🏠 В админку", callback_data=callbacks.ADMIN_BACK_TO_MAIN.pack())
     )
     
     return builder.as_markup()
@@ -249,11 +307,11 @@ def admin_confirm_reset_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.add(InlineKeyboardButton(
         text="✅ ДА, удалить все", 
-        callback_data="confirm_reset_photos"
+        callback_data=callbacks.RESET_CONFIRM.pack()
     ))
     builder.add(InlineKeyboardButton(
         text="❌ НЕТ, отменить", 
-        callback_data="cancel_reset_photos"
+        callback_data=callbacks.RESET_CANCEL.pack()
     ))
     builder.adjust(2)
     return builder.as_markup()
@@ -0,0 +1,254 @@
+"""
+LIFECYCLE.PY - Приём обновлений, учёт оффсета и корректная остановка бота
+
+Telegram хранит неподтверждённые обновления, поэтому при рестарте их не нужно
+выбрасывать (drop_pending_updates). При остановке приём прекращается, а уже
+принятые обновления дообрабатываются.
+
+getUpdates подтверждает обновления сразу при получении (как aiogram):
+пока обновление в работе, Telegram иначе возвращал бы его на каждый запрос
+и опрос превратился бы в холостой цикл. Поэтому обработчики, прерванные по
+таймауту SHUTDOWN_DRAIN_TIMEOUT, Telegram второй раз не отдаст: их исходные
+обновления сохраняются на диск вместе с оффсетом и при запуске обрабатываются
+заново раньше новых (UpdatePoller.replay_pending).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+POLLING_TIMEOUT = 10
+POLLING_ERROR_DELAY = 5
+OFFSET_FLUSH_INTERVAL = 5
+
+
+# ==================== ОФФСЕТ ОБНОВЛЕНИЙ ====================
+
+class OffsetTracker:
+    """
+    Учёт принятых и обработанных update_id.
+    offset (для getUpdates и на диск) = следующий за последним принятым.
+    Обновления в работе сохраняются на диск целиком (pending) — после
+    рестарта они обрабатываются заново.
+    Потокобезопасен: в многопроцессном режиме отметки об обработке
+    приходят из потока-ретранслятора.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._in_flight: Dict[int, Update] = {}
+        self._max_received: Optional[int] = None
+        self._flushed: Optional[Tuple[int, Tuple[int, ...]]] = None
+        self.offset: Optional[int] = None
+        # Обновления, прерванные до рестарта (JSON, как в Bot API)
+        self.pending: List[Dict[str, Any]] = []
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.offset = data.get("offset")
+            self.pending = data.get("pending", [])
+            self._flushed = (self.offset, tuple(raw["update_id"] for raw in self.pending))
+            logger.info(
+                f"📍 Продолжаем с оффсета обновлений {self.offset}, "
+                f"прерванных обновлений: {len(self.pending)}"
+            )
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прочитать оффсет из {self.path}: {e}")
+
+    def is_new(self, update_id: int) -> bool:
+        """Обновление ещё не принималось в работу (и не обработано до рестарта)"""
+        with self._lock:
+            if self._max_received is not None and update_id <= self._max_received:
+                return False
+            return self.offset is None or update_id >= self.offset
+
+    def started(self, update: Update):
+        with self._lock:
+            self._in_flight[update.update_id] = update
+            if self._max_received is None or update.update_id > self._max_received:
+                self._max_received = update.update_id
+            # Повторно принятые после рестарта обновления старше сохранённого оффсета
+            if self.offset is None or update.update_id >= self.offset:
+                self.offset = update.update_id + 1
+
+    def finished(self, update_id: int):
+        with self._lock:
+            self._in_flight.pop(update_id, None)
+
+    @property
+    def in_flight_count(self) -> int:
+        return len(self._in_flight)
+
+    def flush(self):
+        """Сохранить оффсет и обновления в работе на диск (атомарно, только если изменились)"""
+        with self._lock:
+            offset = self.offset
+            in_flight = sorted(self._in_flight.items())
+        state = (offset, tuple(update_id for update_id, _ in in_flight))
+        if offset is None or state == self._flushed:
+            return
+        pending = [
+            update.model_dump(mode="json", exclude_none=True, by_alias=True)
+            for _, update in in_flight
+        ]
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"offset": offset, "pending": pending, "saved_at": int(time.time())},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._flushed = state
+        except Exception as e:
+            logger.error(f"❌ Не удалось сохранить оффсет: {e}")
+
+
+# ==================== ПРИЁМ ОБНОВЛЕНИЙ ====================
+
+class UpdatePoller:
+    """
+    Long polling с учётом оффсета в OffsetTracker.
+    on_update вызывается для каждого нового обновления и должен быстро
+    вернуть управление (запустить задачу или положить в очередь);
+    по завершении обработки нужно вызвать offsets.finished(update_id).
+    """
+
+    def __init__(self, bot: Bot, offsets: OffsetTracker, allowed_updates: List[str]):
+        self.bot = bot
+        self.offsets = offsets
+        self.allowed_updates = allowed_updates
+        self._stop_event = asyncio.Event()
+        self._last_flush = time.monotonic()
+
+    def stop(self):
+        if not self._stop_event.is_set():
+            logger.info("🛑 Остановка приёма обновлений...")
+            self._stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    async def _pause(self, delay: float):
+        """Пауза, прерываемая сигналом остановки"""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _get_updates(self) -> Optional[List[Update]]:
+        """Запрос обновлений, прерываемый сигналом остановки"""
+        request = asyncio.create_task(self.bot.get_updates(
+            offset=self.offsets.offset,
+            timeout=POLLING_TIMEOUT,
+            allowed_updates=self.allowed_updates,
+            request_timeout=POLLING_TIMEOUT + 10,
+        ))
+        stop_waiter = asyncio.create_task(self._stop_event.wait())
+        done, _ = await asyncio.wait({request, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+        if request not in done:
+            request.cancel()
+            return None
+        stop_waiter.cancel()
+        return request.result()
+
+    async def replay_pending(self, on_update: Callable[[Update], Awaitable[Any]]):
+        """Обновления, прерванные при прошлой остановке, — раньше новых"""
+        pending, self.offsets.pending = self.offsets.pending, []
+        for raw_update in pending:
+            try:
+                update = Update.model_validate(raw_update, context={"bot": self.bot})
+            except Exception as e:
+                logger.error(f"❌ Не удалось восстановить обновление {raw_update.get('update_id')}: {e}")
+                continue
+            self.offsets.started(update)
+            await on_update(update)
+        if pending:
+            logger.info(f"🔁 Повторно принято прерванных обновлений: {len(pending)}")
+
+    async def run(self, on_update: Callable[[Update], Awaitable[Any]]):
+        await self.replay_pending(on_update)
+        while not self.stopped:
+            try:
+                updates = await self._get_updates()
+            except Exception as e:
+                logger.error(f"❌ Ошибка получения обновлений: {e}")
+                await self._pause(POLLING_ERROR_DELAY)
+                continue
+
+            for update in updates or []:
+                if not self.offsets.is_new(update.update_id):
+                    continue
+                self.offsets.started(update)
+                await on_update(update)
+
+            if time.monotonic() - self._last_flush >= OFFSET_FLUSH_INTERVAL:
+                self.offsets.flush()
+                self._last_flush = time.monotonic()
+
+
+# ==================== ОБРАБОТКА В ЗАДАЧАХ ====================
+
+class InFlightTasks:
+    """Задачи обработки обновлений, которые нужно дождаться при остановке"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self, timeout: float) -> bool:
+        """Дождаться завершения задач; True, если все успели завершиться"""
+        if not self._tasks:
+            return True
+        logger.info(f"⏳ Ожидание завершения {len(self._tasks)} обработчиков (до {timeout} сек)...")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            logger.warning(f"⚠️ Не завершились за {timeout} сек: {len(pending)} обработчиков")
+            for task in pending:
+                task.cancel()
+            return False
+        return True
+
+
+def time_left(deadline: float) -> float:
+    """
+    Сколько осталось до срока остановки (deadline — time.time()). Срок один
+    на все этапы дообработки, поэтому этапы вместе укладываются в
+    SHUTDOWN_DRAIN_TIMEOUT; время по часам, а не monotonic — срок передаётся
+    воркерам в другие процессы.
+    """
+    return max(0.0, deadline - time.time())
+
+
+def install_stop_signals(callback: Callable[[], Any]):
+    """SIGTERM/SIGINT -> корректная остановка вместо мгновенного завершения"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, callback)
+        except NotImplementedError:
+            # Windows: обработчики сигналов в event loop не поддерживаются
+            pass
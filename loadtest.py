@@ -0,0 +1,309 @@
+"""
+LOADTEST.PY - Нагрузочный тест бота на фейковом Bot API (fake_bot_api.py)
+
+Прогоняет тысячи симулированных пользователей через опросы UserState
+(волосы и тело) и админскую массовую загрузку AdminState, после чего печатает
+обновления в секунду, p50/p99 end-to-end латентности и число вызовов
+Bot API на один завершённый опрос.
+
+Запуск:
+    python loadtest.py --users 2000 --concurrency 200
+    python loadtest.py --users 500 --latency 0.03 --jitter 0.02 --rate-limit 0.005
+
+Латентность шага — от попадания обновления в getUpdates до завершения его
+обработчика (включая все вызовы Bot API, которые он сделал).
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+
+from fake_bot_api import FakeBotAPI
+
+STEP_TIMEOUT = 120
+FIRST_USER_ID = 1_000_000
+
+# Шаг сценария: ("text", "...") | ("callback", "...") | ("photo", None)
+Step = Tuple[str, Optional[str]]
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+# ==================== СЦЕНАРИИ ====================
+
+def hair_scenario(rng: random.Random, config) -> List[Step]:
+    hair_type = rng.choice(config.HAIR_TYPES)
+    steps = [("text", "/start"), ("text", "💇‍♀️ Волосы"), ("text", hair_type)]
+    for problem in rng.sample(config.HAIR_PROBLEMS, rng.randint(0, 3)):
+        steps.append(("text", f"☐ {problem}"))
+    steps.append(("text", "✅ Готово"))
+    steps.append(("text", rng.choice(config.SCALP_TYPES)))
+    steps.append(("text", rng.choice(config.HAIR_VOLUME)))
+    colors = config.get_hair_colors(hair_type)
+    if colors:
+        steps.append(("text", rng.choice(colors)))
+    return steps
+
+
+def body_scenario(rng: random.Random, config) -> List[Step]:
+    return [("text", "/start"), ("text", "🧴 Тело"), ("text", rng.choice(config.BODY_GOALS))]
+
+
+def _button_callback(markup, text_part: str = "") -> str:
+    for row in markup.inline_keyboard:
+        for button in row:
+            if text_part in button.text:
+                return button.callback_data
+    raise LookupError(f"Нет кнопки '{text_part}'")
+
+
+def admin_bulk_scenario(rng: random.Random, config, keyboards) -> List[Step]:
+    # callback_data берём из самих клавиатур, чтобы не зависеть от формата
+    category_name = rng.choice(list(config.PHOTO_STRUCTURE_ADMIN))
+    category_callback = _button_callback(keyboards.admin_category_bulk_keyboard(), category_name)
+    category_key = "волосы" if "Волосы" in category_name else "тело"
+    subcategories = list(config.PHOTO_STRUCTURE_ADMIN[category_name].items())
+    index = rng.randrange(len(subcategories))
+    subcategory_name, products = subcategories[index]
+    subcategory_callback = _button_callback(
+        keyboards.admin_subcategory_bulk_keyboard(category_key), subcategory_name
+    )
+    steps = [
+        ("text", "/admin"),
+        ("text", config.ADMIN_PASSWORD),
+        ("text", "📸 Управление фото"),
+        ("text", "📥 Массовая загрузка"),
+        ("callback", category_callback),
+        ("callback", subcategory_callback),
+    ]
+    steps += [("photo", None)] * len(products)
+    return steps
+
+
+# ==================== ХАРНЕСС ====================
+
+class _CompletionMiddleware(BaseMiddleware):
+    """Отмечает момент завершения обработки каждого обновления"""
+
+    def __init__(self, waiters: Dict[int, asyncio.Future]):
+        self.waiters = waiters
+
+    async def __call__(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            waiter = self.waiters.pop(event.update_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(time.perf_counter())
+
+
+class LoadHarness:
+    """Бот (main.dp) в этом же процессе, подключённый к FakeBotAPI"""
+
+    def __init__(self, api: FakeBotAPI, bot_module):
+        self.api = api
+        self.bot_module = bot_module
+        self.waiters: Dict[int, asyncio.Future] = {}
+        self.latencies: List[float] = []
+        self.updates_sent = 0
+        self.timeouts = 0
+        self._message_id = 0
+        self._callback_id = 0
+        self._poller = None
+        self._poller_task: Optional[asyncio.Task] = None
+        self._handlers = None
+        self._offset_dir = tempfile.TemporaryDirectory()
+
+    async def start(self):
+        import lifecycle
+
+        main = self.bot_module
+        main.dp.update.outer_middleware(_CompletionMiddleware(self.waiters))
+        offsets = lifecycle.OffsetTracker(os.path.join(self._offset_dir.name, "offset.json"))
+        self._poller = lifecycle.UpdatePoller(main.bot, offsets, main.dp.resolve_used_update_types())
+        self._handlers = lifecycle.InFlightTasks()
+
+        async def handle_update(update):
+            try:
+                await main.dp.feed_update(main.bot, update)
+            except Exception as e:
+                logging.getLogger(__name__).error(f"❌ Ошибка обработки: {e}")
+            offsets.finished(update.update_id)
+
+        async def on_update(update):
+            self._handlers.spawn(handle_update(update))
+
+        self._poller_task = asyncio.create_task(self._poller.run(on_update))
+
+    async def stop(self):
+        self._poller.stop()
+        await self._poller_task
+        await self._handlers.drain(30)
+        await self.bot_module.bot.session.close()
+        self._offset_dir.cleanup()
+
+    def _build_update(self, user_id: int, kind: str, value: Optional[str]) -> Dict[str, Any]:
+        user = {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        self._message_id += 1
+        message = {"message_id": self._message_id, "date": int(time.time()), "chat": chat, "from": user}
+
+        if kind == "callback":
+            self._callback_id += 1
+            message["from"] = {"id": 123456, "is_bot": True, "first_name": "LoadTestBot"}
+            message["text"] = "..."
+            return {"callback_query": {
+                "id": f"cq{self._callback_id}", "from": user, "chat_instance": str(user_id),
+                "message": message, "data": value,
+            }}
+        if kind == "photo":
+            message["photo"] = [{
+                "file_id": f"load-photo-{self._message_id}", "file_unique_id": f"lp{self._message_id}",
+                "width": 800, "height": 800,
+            }]
+        else:
+            message["text"] = value
+        return {"message": message}
+
+    async def send(self, user_id: int, kind: str, value: Optional[str]) -> bool:
+        update = self._build_update(user_id, kind, value)
+        waiter = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        update_id = self.api._next_update_id
+        self.waiters[update_id] = waiter
+        self.api.inject_update(update)
+        self.updates_sent += 1
+        try:
+            finished = await asyncio.wait_for(waiter, STEP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.waiters.pop(update_id, None)
+            self.timeouts += 1
+            return False
+        self.latencies.append(finished - started)
+        return True
+
+
+async def run_load(args) -> Dict[str, Any]:
+    api = FakeBotAPI(args.latency, args.jitter, args.rate_limit, args.retry_after)
+    url = await api.start()
+
+    os.environ.setdefault("BOT_TOKEN", "123456:LOAD-TEST")
+    os.environ["TELEGRAM_API_URL"] = url
+    os.environ["WORKERS"] = "1"
+    main = importlib.import_module("main")
+    logging.getLogger().setLevel(args.log_level)
+
+    import config
+    import keyboards
+
+    harness = LoadHarness(api, main)
+    await harness.start()
+
+    rng = random.Random(args.seed)
+    scenarios: List[Tuple[str, int, List[Step]]] = []
+    for i in range(args.users):
+        user_id = FIRST_USER_ID + i
+        if i < args.admins:
+            scenarios.append(("admin", user_id, admin_bulk_scenario(rng, config, keyboards)))
+        elif rng.random() < args.hair_share:
+            scenarios.append(("hair", user_id, hair_scenario(rng, config)))
+        else:
+            scenarios.append(("body", user_id, body_scenario(rng, config)))
+
+    completed: Dict[str, List[int]] = defaultdict(list)
+    failed: Dict[str, int] = defaultdict(int)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run_user(kind: str, user_id: int, steps: List[Step]):
+        async with semaphore:
+            for step_kind, value in steps:
+                if not await harness.send(user_id, step_kind, value):
+                    failed[kind] += 1
+                    return
+                if args.think:
+                    await asyncio.sleep(rng.uniform(0, args.think))
+            completed[kind].append(user_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(kind, user_id, steps) for kind, user_id, steps in scenarios))
+    elapsed = time.perf_counter() - started
+
+    await harness.stop()
+    await api.stop()
+
+    return {
+        "elapsed": elapsed,
+        "updates": harness.updates_sent,
+        "latencies": harness.latencies,
+        "timeouts": harness.timeouts,
+        "completed": {kind: len(users) for kind, users in completed.items()},
+        "failed": dict(failed),
+        "calls_per_quiz": {
+            kind: sum(api.calls_by_chat[user_id] for user_id in users) / len(users)
+            for kind, users in completed.items() if users
+        },
+        "api": api.stats(),
+        "photo_delivery": main.admission.photo_delivery.stats(),
+        "breaker": main.resilience.telegram_breaker.stats(),
+    }
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    latencies_ms = [latency * 1000 for latency in result["latencies"]]
+    lines = [
+        "📊 Результаты нагрузочного теста",
+        f"Завершено опросов: {result['completed']}, прервано: {result['failed']}, "
+        f"таймаутов шагов: {result['timeouts']}",
+        f"Обновлений: {result['updates']} за {result['elapsed']:.1f} сек "
+        f"→ {result['updates'] / result['elapsed']:.1f} обновлений/сек",
+        f"Латентность end-to-end, мс: p50={percentile(latencies_ms, 50):.1f} "
+        f"p90={percentile(latencies_ms, 90):.1f} p99={percentile(latencies_ms, 99):.1f} "
+        f"max={max(latencies_ms, default=0):.1f}",
+        "API-вызовов на завершённый опрос: " + ", ".join(
+            f"{kind}={calls:.1f}" for kind, calls in sorted(result["calls_per_quiz"].items())
+        ),
+        f"Всего API-вызовов: {result['api']['total_calls']}, ответов 429: {result['api']['rate_limited']}",
+        "По методам: " + ", ".join(
+            f"{method}={count}" for method, count in sorted(result["api"]["calls"].items())
+        ),
+        f"Отправка фото: пик очереди={result['photo_delivery']['peak_waiting']}, "
+        f"отложено={result['photo_delivery']['shed']} из "
+        f"{result['photo_delivery']['admitted'] + result['photo_delivery']['shed']}, "
+        f"срабатываний защиты от сбоев API={result['breaker']['trips']}",
+    ]
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на фейковом Bot API")
+    parser.add_argument("--users", type=int, default=1000, help="число симулированных пользователей")
+    parser.add_argument("--concurrency", type=int, default=200, help="одновременно активных пользователей")
+    parser.add_argument("--admins", type=int, default=2, help="сколько из них проходят массовую загрузку")
+    parser.add_argument("--hair-share", type=float, default=0.6, help="доля опросов по волосам")
+    parser.add_argument("--think", type=float, default=0.0, help="макс. пауза между шагами, сек")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейкового API, сек")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, сек")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    print(format_report(asyncio.run(run_load(parse_args()))))
@@ -3,34 +3,18 @@ MAIN.PY - Бот с системой выживания для Render Free
 ИСПРАВЛЕНО: Полное отображение file_id во всех категориях загрузки
 """
 
+import html
+import io
 import os
 import logging
 import asyncio
 import random
-import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import aiohttp
-
-from aiogram import Bot, Dispatcher, types, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
-from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.enums import ParseMode
-from aiogram.client.default import DefaultBotProperties
-from aiogram.utils.keyboard import InlineKeyboardBuilder
+from typing import Any, List, Dict, Tuple
 
 import config
-from states import UserState, AdminState
-import keyboards
-import photo_map
-from user_storage import (
-    save_user_data, get_user_data_value, add_selected_problem,
-    remove_selected_problem, get_selected_problems,
-    clear_selected_problems, delete_user_data
-)
+import health
 
 # Настройка логирования
 logging.basicConfig(
@@ -40,254 +24,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# ==================== УЛУЧШЕННЫЙ HEALTH CHECK SERVER ====================
-
-class HealthHandler(BaseHTTPRequestHandler):
-    """Улучшенный обработчик HTTP запросов для health check"""
-
-    def do_GET(self):
-        try:
-            client_ip = self.client_address[0]
-            current_time = datetime.now().strftime('%H:%M:%S')
-
-            if not self.path.startswith('/favicon'):
-                logger.info(f"🌐 HTTP: {self.path} от {client_ip}")
-
-            if self.path == '/health':
-                self.send_response(200)
-                self.send_header('Content-type', 'text/plain')
-                self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-                self.send_header('Pragma', 'no-cache')
-                self.send_header('Expires', '0')
-                self.end_headers()
-
-                stats = photo_map.get_photo_stats()
-                response = f"""HTTP/1.1 200 OK
-Content-Type: text/plain
-
-STATUS: ACTIVE ✅
-BOT: SVOY AV.COSMETIC
-PHOTOS: {stats['loaded']}/{stats['total']} ({stats['percentage']}%)
-TIME: {current_time}
-SERVICE: salon-volosy-beauty
-UPTIME: {self.get_uptime()}"""
-
-                self.wfile.write(response.encode('utf-8'))
-
-            elif self.path == '/':
-                self.send_response(200)
-                self.send_header('Content-type', 'text/html')
-                self.send_header('Cache-Control', 'no-cache')
-                self.end_headers()
-
-                stats = photo_map.get_photo_stats()
-                html = f'''<!DOCTYPE html>
-<html lang="ru">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>🤖 SVOY AV.COSMETIC Bot</title>
-    <meta http-equiv="refresh" content="300">
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ 
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            padding: 20px;
-        }}
-        .container {{ 
-            background: white;
-            border-radius: 20px;
-            padding: 40px;
-            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-            max-width: 800px;
-            width: 100%;
-        }}
-        .header {{ 
-            text-align: center;
-            margin-bottom: 30px;
-        }}
-        .header h1 {{ 
-            color: #333;
-            font-size: 2.5em;
-            margin-bottom: 10px;
-        }}
-        .header p {{ 
-            color: #666;
-            font-size: 1.1em;
-        }}
-        .status-card {{ 
-            background: #f8f9fa;
-            border-radius: 15px;
-            padding: 25px;
-            margin-bottom: 25px;
-            border-left: 5px solid #4CAF50;
-        }}
-        .status-card h2 {{ 
-            color: #333;
-            margin-bottom: 15px;
-            font-size: 1.5em;
-        }}
-        .stats {{ 
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 20px;
-            margin-top: 20px;
-        }}
-        .stat-item {{ 
-            background: white;
-            padding: 15px;
-            border-radius: 10px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.05);
-        }}
-        .stat-label {{ 
-            color: #666;
-            font-size: 0.9em;
-            margin-bottom: 5px;
-        }}
-        .stat-value {{ 
-            color: #333;
-            font-size: 1.3em;
-            font-weight: bold;
-        }}
-        .footer {{ 
-            text-align: center;
-            margin-top: 30px;
-            color: #888;
-            font-size: 0.9em;
-        }}
-        .refresh-info {{ 
-            background: #e8f5e8;
-            padding: 10px;
-            border-radius: 8px;
-            margin-top: 15px;
-            font-size: 0.9em;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🤖 SVOY AV.COSMETIC Bot</h1>
-            <p>Телеграм-бот для подбора косметики для волос и тела</p>
-        </div>
-        
-        <div class="status-card">
-            <h2>✅ Статус сервиса</h2>
-            <p>Сервис активен и работает корректно.</p>
-            <div class="refresh-info">
-                Страница автоматически обновляется каждые 5 минут для поддержания активности на Render Free.
-            </div>
-        </div>
-        
-        <div class="stats">
-            <div class="stat-item">
-                <div class="stat-label">📅 Время сервера</div>
-                <div class="stat-value">{current_time}</div>
-            </div>
-            <div class="stat-item">
-                <div class="stat-label">📸 Загружено фото</div>
-                <div class="stat-value">{stats['loaded']} / {stats['total']}</div>
-            </div>
-            <div class="stat-item">
-                <div class="stat-label">📈 Прогресс</div>
-                <div class="stat-value">{stats['percentage']}%</div>
-            </div>
-            <div class="stat-item">
-                <div class="stat-label">⏱️ Uptime</div>
-                <div class="stat-value">{self.get_uptime()}</div>
-            </div>
-        </div>
-        
-        <div class="footer">
-            <p>© 2026 SVOY AV.COSMETIC | Render Free Plan</p>
-            <p>Страница обновлена: {current_time}</p>
-            <p style="margin-top: 10px;">
-                <a href="/health" style="color: #667eea;">Health Check</a> | 
-                <a href="https://render.com" style="color: #667eea;">Render.com</a>
-            </p>
-        </div>
-    </div>
-</body>
-</html>'''
-
-                self.wfile.write(html.encode('utf-8'))
-
-            elif self.path.startswith('/ping'):
-                self.send_response(200)
-                self.send_header('Content-type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(f'PONG {current_time}'.encode('utf-8'))
-
-            elif self.path == '/status':
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-
-                stats = photo_map.get_photo_stats()
-                status = {
-                    "status": "active",
-                    "service": "salon-volosy-beauty",
-                    "timestamp": current_time,
-                    "photos": stats,
-                    "uptime": self.get_uptime(),
-                }
-
-                import json
-                self.wfile.write(json.dumps(status, indent=2, ensure_ascii=False).encode('utf-8'))
-
-            else:
-                self.send_response(302)
-                self.send_header('Location', '/')
-                self.end_headers()
-
-        except Exception as e:
-            logger.error(f"❌ HTTP Handler error: {e}")
-            self.send_response(500)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b'Internal Server Error')
-
-    def get_uptime(self):
-        try:
-            return "Несколько часов"
-        except:
-            return "Активен"
-
-    def log_message(self, format, *args):
-        pass
-
+# Health check поднимаем до импорта aiogram (несколько секунд на Render Free),
+# чтобы проверка Render проходила уже во время холодного старта.
+# В многопроцессном режиме сервер стартует после форка воркеров.
+if __name__ == "__main__" and config.WORKERS == 1:
+    health.start_health_server()
 
-def run_health_server():
-    port = int(os.environ.get('PORT', 8080))
-
-    class SilentServer(HTTPServer):
-        def service_actions(self):
-            pass
-
-    server = SilentServer(('0.0.0.0', port), HealthHandler)
-    server.timeout = 30
-    server.request_queue_size = 10
-
-    logger.info(f"🌐 Health check сервер запущен на порту {port}")
-    try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        logger.info("🌐 Health check сервер остановлен")
-    except Exception as e:
-        logger.error(f"❌ Ошибка health check сервера: {e}")
-
-
-def start_health_server():
-    health_thread = threading.Thread(target=run_health_server, daemon=True, name="HealthCheckThread")
-    health_thread.start()
-    logger.info("🔔 Health check система активирована")
-    return health_thread
+import aiohttp
+from aiogram import Bot, Dispatcher, types, F
+from aiogram.types import Message, CallbackQuery, BufferedInputFile, InlineQuery, InputMediaPhoto
+from aiogram.filters import Command, CommandObject, StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.enums import ParseMode
+from aiogram.client.default import DefaultBotProperties
 
+import admission
+import bot_session
+import callbacks
+import lifecycle
+import quiz
+import resilience
+from middlewares import MediaGroupMiddleware
+from states import UserState, AdminState
+import keyboards
+import catalog
+import delivery
+import bulk_ingest
+import snapshot
+import search
+import text_router
+import photo_map
+from user_storage import (
+    get_user_data_value, get_selected_problems,
+    clear_selected_problems, delete_user_data,
+    save_last_result, get_last_result
+)
 
 # ==================== СИСТЕМА ВЫЖИВАНИЯ ДЛЯ RENDER FREE ====================
 
@@ -451,32 +223,39 @@ class RenderSurvivalSystem:
 
 # ==================== ИНИЦИАЛИЗАЦИЯ БОТА ====================
 
-bot = Bot(token=config.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+if not config.BOT_TOKEN:
+    logger.warning("⚠️ ВНИМАНИЕ: BOT_TOKEN не найден в переменных окружения!")
+
+session = bot_session.create_session(config.TELEGRAM_API_URL)
+bot = Bot(token=config.BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
+# Альбомы (несколько фото одним сообщением) доходят до хендлеров одной пачкой
+media_groups = MediaGroupMiddleware()
+dp.message.middleware(media_groups)
+# Альбомы обрабатываются вне задач обновлений — при остановке их тоже ждём
+dp.shutdown.register(media_groups.drain)
+# Кнопки reply-клавиатур: обработчик ищется по тексту в словаре (text_router.py)
+buttons = text_router.TextRouter()
+buttons.register(dp)
 
 
 # ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ====================
 
-def deduplicate_ordered(keys: list) -> list:
-    """Убирает дубликаты из списка, сохраняя порядок первого вхождения."""
-    seen = set()
-    result = []
-    for k in keys:
-        if k not in seen:
-            seen.add(k)
-            result.append(k)
-    return result
-
-
-async def send_recommended_photos(chat_id: int, photo_keys: List[str], caption: str = ""):
+async def send_recommended_photos(chat_id: int, plan: delivery.DeliveryPlan):
     """
-    Отправка рекомендованных фото.
-    Каждый ключ из photo_keys отправляется отдельным фото с названием и ценой.
-    Ключи без загруженного file_id автоматически пропускаются.
+    Отправка рекомендованных фото по готовому плану.
+    Каждая позиция плана отправляется отдельным фото с названием и ценой
+    (или одной каруселью, RESULT_PHOTOS_MODE=carousel); ключи без
+    загруженного file_id пропущены ещё при построении плана.
+    Одновременных отправок не больше, чем пропускает admission.photo_delivery;
+    при переполненной очереди — сообщение с кнопкой «📸 Прислать фото».
+    Каждое фото отправляется с повторами (resilience.call_with_retry): сбой
+    одного фото не мешает остальным, а не дошедшие из-за сбоев API можно
+    запросить той же кнопкой.
     """
     try:
-        if not photo_keys:
+        if not plan.key_count:
             await bot.send_message(
                 chat_id,
                 "📷 Фото продуктов пока не загружены.",
@@ -484,31 +263,44 @@ async def send_recommended_photos(chat_id: int, photo_keys: List[str], caption:
             )
             return
 
-        sent_count = 0
-
-        for photo_key in photo_keys:
-            file_id = photo_map.get_photo_file_id(photo_key)
-            if not file_id:
-                logger.info(f"⏭️ Нет фото для ключа: {photo_key}")
-                continue
-
-            display_name = photo_map.ALL_PHOTO_KEYS.get(photo_key, photo_key)
-            price = config.PRODUCT_PRICES.get(photo_key, "")
-
-            caption_text = f"<b>{display_name}</b>"
-            if price:
-                caption_text += f"\n💰 Цена: {price}"
-
-            await bot.send_photo(
-                chat_id=chat_id,
-                photo=file_id,
-                caption=caption_text,
-                parse_mode=ParseMode.HTML
+        async with admission.photo_delivery.slot():
+            if use_carousel(plan):
+                await send_carousel(chat_id, plan)
+                return
+
+            sent_count = 0
+            failed_count = 0
+            retryable_keys = []
+
+            for (file_id, caption_text), product_key in zip(plan.photos, plan.photo_keys):
+                try:
+                    await resilience.call_with_retry(lambda: bot.send_photo(
+                        chat_id=chat_id,
+                        photo=file_id,
+                        caption=caption_text,
+                        parse_mode=ParseMode.HTML
+                    ))
+                except Exception as e:
+                    kind = resilience.classify(e)
+                    if kind == resilience.ABORT:
+                        logger.warning(f"🚫 Чат {chat_id} недоступен, отправка фото прервана: {e}")
+                        return
+                    logger.warning(f"⚠️ Фото {product_key} не отправлено в чат {chat_id} ({kind}): {e}")
+                    failed_count += 1
+                    if kind == resilience.RETRY:
+                        retryable_keys.append(product_key)
+                    continue
+                sent_count += 1
+                await asyncio.sleep(0.3)
+
+        if failed_count:
+            await bot.send_message(
+                chat_id,
+                f"⚠️ Не удалось отправить фото: {failed_count} из {len(plan.photos)}.",
+                reply_markup=(result_photos_markup(chat_id, tuple(retryable_keys))
+                              if retryable_keys else keyboards.selection_complete_keyboard())
             )
-            sent_count += 1
-            await asyncio.sleep(0.3)
-
-        if sent_count == 0:
+        elif sent_count == 0:
             await bot.send_message(
                 chat_id,
                 "📷 Фото продуктов пока не загружены.\n"
@@ -516,7 +308,17 @@ async def send_recommended_photos(chat_id: int, photo_keys: List[str], caption:
                 reply_markup=keyboards.selection_complete_keyboard()
             )
 
-        logger.info(f"📸 Отправлено {sent_count} фото из {len(photo_keys)} ключей для чата {chat_id}")
+        logger.info(f"📸 Отправлено {sent_count} фото из {plan.key_count} ключей для чата {chat_id}"
+                    + (f", не отправлено: {failed_count}" if failed_count else ""))
+
+    except admission.Overloaded:
+        logger.warning(f"⏳ Очередь отправки фото заполнена, чат {chat_id} получит кнопку")
+        await bot.send_message(
+            chat_id,
+            "⏳ <b>Сейчас очень много запросов.</b>\n\n"
+            "Рекомендации выше, а фото продуктов пришлю по кнопке — нажмите её через минуту.",
+            reply_markup=result_photos_markup(chat_id, plan.photo_keys)
+        )
 
     except Exception as e:
         logger.error(f"❌ Ошибка при отправке фото: {e}", exc_info=True)
@@ -527,32 +329,53 @@ async def send_recommended_photos(chat_id: int, photo_keys: List[str], caption:
         )
 
 
-async def get_body_recommendations_with_photos(goal: str) -> tuple:
-    """Получение рекомендаций для тела с фото"""
-    try:
-        if goal in config.BODY_DATA:
-            data = config.BODY_DATA[goal]
-            text = f"{data['title']}\n\n"
-            for product in data['products']:
-                text += f"• {product}\n"
-            if 'note' in data:
-                text += f"\n{data['note']}"
-        else:
-            text = config.get_body_recommendations_html(goal)
+def result_photos_markup(chat_id: int, photo_keys: Tuple[str, ...]):
+    """Кнопка «📸 Прислать фото»: в callback_data помещается не больше CAROUSEL_MAX_ITEMS продуктов"""
+    if len(photo_keys) > callbacks.CAROUSEL_MAX_ITEMS:
+        logger.warning(f"⚠️ Кнопка фото для чата {chat_id}: {len(photo_keys)} продуктов, "
+                       f"в кнопку попадут первые {callbacks.CAROUSEL_MAX_ITEMS}")
+        photo_keys = photo_keys[:callbacks.CAROUSEL_MAX_ITEMS]
+    return keyboards.result_photos_keyboard(photo_keys)
 
-        photo_keys = config.PHOTO_MAPPING.get("тело", {}).get(goal, [])
-        return text, photo_keys
+
+def use_carousel(plan: delivery.DeliveryPlan) -> bool:
+    # Больше CAROUSEL_MAX_ITEMS продуктов не помещается в callback_data кнопки
+    return (config.RESULT_PHOTOS_MODE == "carousel"
+            and 1 < len(plan.photo_keys) <= callbacks.CAROUSEL_MAX_ITEMS)
+
+
+async def send_carousel(chat_id: int, plan: delivery.DeliveryPlan):
+    """Одно фото с кнопками ◀️/▶️: остальные продукты — правкой по нажатию"""
+    file_id, caption_text = plan.photos[0]
+    await resilience.call_with_retry(lambda: bot.send_photo(
+        chat_id=chat_id,
+        photo=file_id,
+        caption=caption_text,
+        reply_markup=keyboards.carousel_keyboard(plan.photo_keys, 0),
+        parse_mode=ParseMode.HTML
+    ))
+    logger.info(f"📸 Отправлена карусель из {len(plan.photo_keys)} фото для чата {chat_id}")
+
+
+def _unavailable_plan() -> delivery.DeliveryPlan:
+    return delivery.DeliveryPlan("Рекомендации временно недоступны.", (), 0)
+
+
+async def get_body_recommendations_with_photos(goal: str) -> delivery.DeliveryPlan:
+    """Рекомендации для тела с фото (правила из каталога, план из кэша)"""
+    try:
+        return delivery.body_plan(goal)
 
     except Exception as e:
         logger.error(f"❌ Ошибка получения рекомендаций для тела: {e}")
-        return "Рекомендации временно недоступны.", []
+        return _unavailable_plan()
 
 
 async def get_hair_recommendations_with_photos(hair_type: str, problems: list,
                                                scalp_type: str, hair_volume: str,
-                                               hair_color: str = "") -> tuple:
+                                               hair_color: str = "") -> delivery.DeliveryPlan:
     """
-    Получение рекомендаций для волос с фото.
+    Рекомендации для волос с фото (правила из каталога, план из кэша).
     Порядок фото соответствует порядку блоков в тексте рекомендаций:
       1. Базовый уход по типу волос
       2. Доп. уход по каждой выбранной проблеме (в порядке выбора)
@@ -562,45 +385,20 @@ async def get_hair_recommendations_with_photos(hair_type: str, problems: list,
     Дубликаты удаляются с сохранением первого вхождения.
     """
     try:
-        text = config.get_hair_recommendations_html(
-            hair_type, problems, scalp_type, hair_volume, hair_color
-        )
-
-        photo_keys = []
-
-        base_keys = config.PHOTO_MAPPING.get("волосы", {}).get(hair_type, [])
-        photo_keys.extend(base_keys)
-
-        for problem in problems:
-            problem_keys = config.PHOTO_MAPPING.get("волосы", {}).get(problem, [])
-            photo_keys.extend(problem_keys)
-
-        if scalp_type == "Да, чувствительная":
-            scalp_keys = config.PHOTO_MAPPING["волосы"].get("чувствительная_кожа", [])
-            photo_keys.extend(scalp_keys)
+        plan = delivery.hair_plan(hair_type, problems, scalp_type, hair_volume, hair_color)
 
-        if hair_volume == "Да, хочу объем":
-            volume_keys = config.PHOTO_MAPPING["волосы"].get("объем", [])
-            photo_keys.extend(volume_keys)
-
-        if hair_type == "Окрашенные":
-            if hair_color in ["Шатенка", "Русая"]:
-                photo_keys.extend(config.PHOTO_MAPPING["волосы"].get("оттеночная_шоколад", []))
-            elif hair_color == "Рыжая":
-                photo_keys.extend(config.PHOTO_MAPPING["волосы"].get("оттеночная_медный", []))
-
-        photo_keys = deduplicate_ordered(photo_keys)
-
-        logger.info(f"📋 Ключи фото для волос ({hair_type}, проблемы={problems}): {photo_keys}")
-        return text, photo_keys
+        logger.info(f"📋 План для волос ({hair_type}, проблемы={problems}): "
+                    f"{len(plan.photos)} фото из {plan.key_count} ключей")
+        return plan
 
     except Exception as e:
         logger.error(f"❌ Ошибка получения рекомендаций для волос: {e}")
-        return "Рекомендации временно недоступны.", []
+        return _unavailable_plan()
 
 
+@photo_map.cached_per_version()
 def format_photo_stats() -> str:
-    """Форматирование статистики фото"""
+    """Форматирование статистики фото (кэш до изменения фото-мапа)"""
     stats = photo_map.get_photo_stats()
 
     text = (
@@ -630,8 +428,10 @@ def format_photo_stats() -> str:
     return text
 
 
-def format_photo_list(photos: List[Dict], page: int, filter_type: str = "all") -> str:
-    """Форматирование списка фото для отображения"""
+@photo_map.cached_per_version(lambda: catalog.get().version)
+def format_photo_list(page: int, filter_type: str = "all") -> str:
+    """Форматирование списка фото для отображения (кэш до изменения фото или каталога)"""
+    photos = photo_map.get_missing_photos()
     per_page = config.ADMIN_PHOTOS_PER_PAGE
     start_idx = page * per_page
     end_idx = start_idx + per_page
@@ -663,7 +463,7 @@ def format_photo_list(photos: List[Dict], page: int, filter_type: str = "all") -
         else:
             text += f"   file_id: <i>отсутствует</i>\n"
 
-        price = config.PRODUCT_PRICES.get(photo['key'], "")
+        price = catalog.get_price(photo['key'])
         if price:
             text += f"   💰 Цена: {price}\n"
 
@@ -678,11 +478,19 @@ def format_photo_list(photos: List[Dict], page: int, filter_type: str = "all") -
 # ==================== КОМАНДЫ БОТА ====================
 
 @dp.message(Command("start"))
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, command: CommandObject):
     try:
         await state.clear()
         delete_user_data(message.from_user.id)
 
+        # Ссылка t.me/<бот>?start=<payload> с готовыми ответами — сразу итог
+        deep_link = quiz.parse_deep_link(command.args) if command.args else None
+        if deep_link is not None:
+            flow, answers = deep_link
+            await ANSWER_RESULTS[flow](message, answers)
+            logger.info(f"🔗 Пользователь {message.from_user.id} открыл ссылку на подбор ({flow})")
+            return
+
         welcome_text = (
             "👋 <b>Добро пожаловать в LARMOSS cosmetics!</b>\n\n"
             "Ранее вы знали нас как \n"
@@ -720,20 +528,39 @@ async def cmd_help(message: Message):
         "4. Видите цены под каждым фото\n\n"
         "<b>Навигация:</b>\n"
         "↩️ <b>Назад</b> — вернуться на предыдущий шаг\n"
-        "🏠 <b>В главное меню</b> — вернуться в начало\n\n"
+        "🏠 <b>В главное меню</b> — вернуться в начало\n"
+        "🔁 <b>Мой последний подбор</b> — снова показать итог последнего опроса\n\n"
         "<b>Команды:</b>\n"
         "/start - Перезапустить бота\n"
         "/help - Показать эту справку\n"
+        "/quiz - Быстрый подбор на inline-кнопках\n"
         "/status - Статус системы\n"
         "/contacts - Контакты"
     )
     await message.answer(help_text, reply_markup=keyboards.help_keyboard())
 
 
+@dp.message(Command("quiz"))
+async def cmd_quiz(message: Message):
+    await message.answer(quiz.MENU_PROMPT, reply_markup=keyboards.inline_quiz_menu_keyboard())
+
+
+def runtime_stats() -> Dict[str, Any]:
+    """Счётчики этого процесса для HTTP /status (health.py)"""
+    return {
+        "plan_cache": delivery.plan_cache.stats(),
+        "photo_delivery": admission.photo_delivery.stats(),
+        "telegram_breaker": resilience.telegram_breaker.stats(),
+    }
+
+
 @dp.message(Command("status"))
 async def cmd_status(message: Message):
     try:
         stats = photo_map.get_photo_stats()
+        cache_stats = delivery.plan_cache.stats()
+        delivery_stats = admission.photo_delivery.stats()
+        breaker_stats = resilience.telegram_breaker.stats()
         status_text = (
             "📊 <b>Статус системы</b>\n\n"
             f"🤖 <b>Бот:</b> Активен ✅\n\n"
@@ -742,8 +569,21 @@ async def cmd_status(message: Message):
             f"• Загружено фото: {stats['loaded']}\n"
             f"• Отсутствует: {stats['missing']}\n"
             f"• Прогресс: {stats['percentage']}%\n\n"
+            f"🗂 <b>Кэш подборок:</b>\n"
+            f"• Попадания: {cache_stats['hit_rate']}% "
+            f"({cache_stats['hits']} из {cache_stats['hits'] + cache_stats['misses']})\n"
+            f"• Планов в кэше: {cache_stats['size']}/{cache_stats['max_size']}\n\n"
+            f"📤 <b>Отправка фото:</b>\n"
+            f"• Идёт: {delivery_stats['active']}/{delivery_stats['max_active']}, "
+            f"в очереди: {delivery_stats['waiting']}/{delivery_stats['max_waiting']}\n"
+            f"• Отложено из-за перегрузки: {delivery_stats['shed']} из "
+            f"{delivery_stats['admitted'] + delivery_stats['shed']}\n"
+            f"• Защита от сбоев API: {breaker_stats['state']} "
+            f"(срабатываний: {breaker_stats['trips']})\n\n"
             f"🕐 <b>Время:</b> {datetime.now().strftime('%H:%M:%S')}\n\n"
         )
+        if config.WORKERS > 1:
+            status_text += f"<i>Кэш и отправка — счётчики одного из {config.WORKERS} воркеров</i>\n\n"
         if stats['percentage'] < 50:
             status_text += "⚠️ <i>Рекомендуется загрузить фото продуктов через админ-панель</i>"
         else:
@@ -777,9 +617,98 @@ async def cmd_admin(message: Message, state: FSMContext):
     )
 
 
+# ==================== ЭКСПОРТ / ИМПОРТ СНИМКА ====================
+
+# Любое состояние админки, кроме ввода пароля
+ADMIN_SESSION = StateFilter(*(s for s in AdminState.__all_states__ if s != AdminState.WAITING_PASSWORD))
+
+
+@dp.message(Command("export"), ADMIN_SESSION)
+async def cmd_export(message: Message, command: CommandObject):
+    as_json = (command.args or "").strip().lower() == "json"
+    data = snapshot.build_snapshot()
+    raw = snapshot.encode(data, as_json=as_json)
+    await message.answer_document(
+        BufferedInputFile(raw, filename=snapshot.file_name(as_json)),
+        caption=(
+            f"💾 <b>Снимок состояния</b>\n\n"
+            f"📸 Фото: {len(data['photos'])}\n"
+            f"💰 Цены: {len(data['prices'])}\n"
+            f"📦 Каталог v{data['catalog_version']}, фото-мап v{data['photo_map_version']}\n"
+            f"📏 Размер: {len(raw)} байт\n\n"
+            f"<i>Для восстановления отправьте этот файл с подписью /import</i>"
+        )
+    )
+    logger.info(f"💾 Экспорт снимка ({len(raw)} байт) для {message.from_user.id}")
+
+
+@dp.message(Command("links"), ADMIN_SESSION)
+async def cmd_links(message: Message, command: CommandObject):
+    flow = (command.args or "").strip().lower()
+    flows = [flow] if flow in quiz.FLOWS else list(quiz.FLOWS)
+    me = await bot.me()
+    raw = await asyncio.to_thread(quiz.links_csv, me.username, flows)
+    await message.answer_document(
+        BufferedInputFile(raw, filename=f"links_{'_'.join(flows)}.csv"),
+        caption=(
+            f"🔗 <b>Ссылки на готовые подборы</b>\n\n"
+            f"Опросы: {', '.join(flows)}\n"
+            f"Каждая ссылка сразу открывает результат для своего набора ответов.\n\n"
+            f"<i>/links hair или /links body — только один опрос</i>"
+        )
+    )
+    logger.info(f"🔗 Выгрузка ссылок ({', '.join(flows)}, {len(raw)} байт) для {message.from_user.id}")
+
+
+@dp.message(Command("import"), ADMIN_SESSION, F.document)
+async def cmd_import_with_file(message: Message, state: FSMContext):
+    await import_snapshot_document(message, state)
+
+
+@dp.message(Command("import"), ADMIN_SESSION)
+async def cmd_import(message: Message, state: FSMContext):
+    await state.set_state(AdminState.ADMIN_WAITING_IMPORT)
+    await message.answer(
+        "📥 <b>Импорт снимка</b>\n\n"
+        "Отправьте файл, полученный командой /export.\n"
+        "<i>Фото-мап будет заменён целиком, цены — записаны в каталог.</i>",
+        reply_markup=keyboards.back_to_menu_keyboard()
+    )
+
+
+@dp.message(AdminState.ADMIN_WAITING_IMPORT, F.document)
+async def process_import_document(message: Message, state: FSMContext):
+    await import_snapshot_document(message, state)
+
+
+async def import_snapshot_document(message: Message, state: FSMContext):
+    if (message.document.file_size or 0) > snapshot.MAX_SNAPSHOT_SIZE:
+        await message.answer("❌ Файл слишком большой для снимка.")
+        return
+    try:
+        buffer = io.BytesIO()
+        await bot.download(message.document, destination=buffer)
+        summary = snapshot.apply_snapshot(snapshot.decode(buffer.getvalue()))
+    except snapshot.SnapshotError as e:
+        await message.answer(f"❌ <b>Снимок не импортирован:</b> {html.escape(str(e))}")
+        return
+
+    stats = photo_map.get_photo_stats()
+    await state.set_state(AdminState.ADMIN_MAIN_MENU)
+    await message.answer(
+        f"✅ <b>Снимок импортирован</b>\n\n"
+        f"📸 Фото из снимка: {summary['photos']}\n"
+        f"📈 Загружено: {stats['loaded']}/{stats['total']} ({stats['percentage']}%)\n"
+        f"💰 Цены: {'обновлены' if summary['prices_changed'] else 'без изменений'}\n"
+        f"📦 Каталог v{summary['catalog_version']}, фото-мап v{summary['photo_map_version']}",
+        reply_markup=keyboards.admin_main_keyboard()
+    )
+    logger.info(f"📥 Импорт снимка от {message.from_user.id}: {summary}")
+
+
 # ==================== ВЫХОД ИЗ АДМИНКИ ====================
 
-@dp.message(AdminState.ADMIN_MAIN_MENU, F.text == "🏠 В главное меню")
+@buttons.button("🏠 В главное меню", AdminState.ADMIN_MAIN_MENU)
 async def process_admin_to_main_menu(message: Message, state: FSMContext):
     await state.clear()
     await message.answer(
@@ -793,7 +722,7 @@ async def process_admin_to_main_menu(message: Message, state: FSMContext):
     await state.set_state(UserState.CHOOSING_CATEGORY)
 
 
-@dp.message(AdminState.ADMIN_PHOTOS_MENU, F.text == "🏠 В главное меню")
+@buttons.button("🏠 В главное меню", AdminState.ADMIN_PHOTOS_MENU)
 async def process_admin_photos_to_main_menu(message: Message, state: FSMContext):
     await state.clear()
     await message.answer(
@@ -807,7 +736,7 @@ async def process_admin_photos_to_main_menu(message: Message, state: FSMContext)
     await state.set_state(UserState.CHOOSING_CATEGORY)
 
 
-@dp.message(AdminState.ADMIN_BULK_UPLOAD, F.text == "🏠 В главное меню")
+@buttons.button("🏠 В главное меню", AdminState.ADMIN_BULK_UPLOAD)
 async def process_admin_bulk_to_main_menu(message: Message, state: FSMContext):
     await state.clear()
     await message.answer(
@@ -823,27 +752,27 @@ async def process_admin_bulk_to_main_menu(message: Message, state: FSMContext):
 
 # ==================== НАВИГАЦИОННЫЕ КНОПКИ ====================
 
-@dp.message(F.text == "❓ Помощь")
+@buttons.button("❓ Помощь")
 async def process_help(message: Message):
     await cmd_help(message)
 
 
-@dp.message(F.text == "📞 Контакты")
+@buttons.button("📞 Контакты")
 async def process_contacts(message: Message):
     await cmd_contacts(message)
 
 
-@dp.message(F.text == "📍 Точки продаж")
+@buttons.button("📍 Точки продаж")
 async def process_sales_points(message: Message):
     await message.answer(config.SALES_POINTS, reply_markup=keyboards.contacts_keyboard())
 
 
-@dp.message(F.text == "🚚 Доставка")
+@buttons.button("🚚 Доставка")
 async def process_delivery(message: Message):
     await message.answer(config.DELIVERY_INFO, reply_markup=keyboards.contacts_keyboard())
 
 
-@dp.message(F.text == "💬 Написать менеджеру")
+@buttons.button("💬 Написать менеджеру")
 async def process_manager(message: Message):
     await message.answer(
         "💬 <b>Связь с менеджером</b>\n\n"
@@ -854,7 +783,7 @@ async def process_manager(message: Message):
     )
 
 
-@dp.message(F.text == "🏠 В главное меню")
+@buttons.button("🏠 В главное меню")
 async def process_main_menu(message: Message, state: FSMContext):
     await state.clear()
     clear_selected_problems(message.from_user.id)
@@ -869,129 +798,99 @@ async def process_main_menu(message: Message, state: FSMContext):
     await state.set_state(UserState.CHOOSING_CATEGORY)
 
 
-@dp.message(F.text == "↩️ Назад")
+@buttons.button("↩️ Назад")
 async def process_back(message: Message, state: FSMContext):
-    current_state = await state.get_state()
+    if await quiz.back(message, state):
+        return
+    await state.set_state(UserState.CHOOSING_CATEGORY)
+    await message.answer(
+        "👋 <b>Подберем идеальную косметику!</b>\n\n<i>Выберите категорию:</i>",
+        reply_markup=keyboards.main_menu_keyboard()
+    )
 
-    if current_state == UserState.HAIR_CHOOSING_COLOR:
-        await state.set_state(UserState.HAIR_CHOOSING_VOLUME)
-        await message.answer(
-            "<i>Хотите добавить объем волосам?</i>",
-            reply_markup=keyboards.hair_volume_keyboard()
-        )
-    elif current_state == UserState.HAIR_CHOOSING_VOLUME:
-        await state.set_state(UserState.HAIR_CHOOSING_SCALP)
-        await message.answer(
-            "<i>Чувствительная кожа головы?</i>",
-            reply_markup=keyboards.scalp_type_keyboard()
-        )
-    elif current_state == UserState.HAIR_CHOOSING_SCALP:
-        await state.set_state(UserState.HAIR_CHOOSING_PROBLEMS)
-        selected_problems = get_selected_problems(message.from_user.id)
-        await message.answer(
-            "<i>Выберите проблемы волос (можно несколько):</i>\n"
-            "<b>Нажмите на проблему, чтобы выбрать/отменить</b>\n\n"
-            "<i>Можно нажать '✅ Готово' без выбора проблем</i>",
-            reply_markup=keyboards.hair_problems_keyboard(selected_problems)
-        )
-    elif current_state == UserState.HAIR_CHOOSING_PROBLEMS:
-        await state.set_state(UserState.HAIR_CHOOSING_TYPE)
-        await message.answer(
-            "💇‍♀️ <b>Отлично! Подберем уход для волос.</b>\n\n<i>Какой у вас тип волос?</i>",
-            reply_markup=keyboards.hair_type_keyboard()
-        )
-    elif current_state == UserState.HAIR_CHOOSING_TYPE:
-        await state.set_state(UserState.CHOOSING_CATEGORY)
-        await message.answer(
-            "👋 <b>Подберем идеальную косметику!</b>\n\n<i>Выберите категорию:</i>",
-            reply_markup=keyboards.main_menu_keyboard()
-        )
-    elif current_state == UserState.BODY_CHOOSING_GOAL:
-        await state.set_state(UserState.CHOOSING_CATEGORY)
+
+@buttons.button("🔁 Мой последний подбор")
+async def process_last_result(message: Message, state: FSMContext):
+    signature = get_last_result(message.chat.id)
+    if signature is None:
         await message.answer(
-            "👋 <b>Подберем идеальную косметику!</b>\n\n<i>Выберите категорию:</i>",
+            "🔁 Сохранённого подбора пока нет — пройдите опрос, и его можно будет повторить.",
             reply_markup=keyboards.main_menu_keyboard()
         )
-    else:
         await state.set_state(UserState.CHOOSING_CATEGORY)
-        await message.answer(
-            "👋 <b>Подберем идеальную косметику!</b>\n\n<i>Выберите категорию:</i>",
-            reply_markup=keyboards.main_menu_keyboard()
-        )
+        return
+    await state.clear()
+    try:
+        plan = delivery.plan_for_signature(signature)
+    except Exception as e:
+        logger.error(f"❌ Ошибка повтора подбора {signature}: {e}", exc_info=True)
+        plan = _unavailable_plan()
+    await send_results(message, plan, NO_PHOTOS_TEXT[signature[0]])
+    logger.info(f"🔁 Пользователь {message.from_user.id} повторил последний подбор ({signature[0]})")
 
 
-@dp.message(F.text == "💇‍♀️ Новая подборка волос")
+@buttons.button("💇‍♀️ Новая подборка волос")
 async def process_new_hair_selection(message: Message, state: FSMContext):
     await state.clear()
-    clear_selected_problems(message.from_user.id)
-    await state.set_state(UserState.HAIR_CHOOSING_TYPE)
-    await message.answer(
-        "💇‍♀️ <b>Отлично! Подберем уход для волос.</b>\n\n<i>Какой у вас тип волос?</i>",
-        reply_markup=keyboards.hair_type_keyboard()
-    )
+    await quiz.start(message, state, "hair")
 
 
-@dp.message(F.text == "🧴 Новая подборка тела")
+@buttons.button("🧴 Новая подборка тела")
 async def process_new_body_selection(message: Message, state: FSMContext):
     await state.clear()
-    await state.set_state(UserState.BODY_CHOOSING_GOAL)
-    await message.answer(
-        "🧴 <b>Прекрасно! Займемся уходом за телом.</b>\n\n<i>Какова ваша основная цель ухода?</i>",
-        reply_markup=keyboards.body_goals_keyboard()
-    )
+    await quiz.start(message, state, "body")
 
 
 # ==================== ОСНОВНАЯ ЛОГИКА БОТА ====================
 
-@dp.message(UserState.CHOOSING_CATEGORY, F.text == "💇‍♀️ Волосы")
+@buttons.button("💇‍♀️ Волосы", UserState.CHOOSING_CATEGORY)
 async def process_hair_category(message: Message, state: FSMContext):
-    clear_selected_problems(message.from_user.id)
-    await state.set_state(UserState.HAIR_CHOOSING_TYPE)
-    await message.answer(
-        "💇‍♀️ <b>Отлично! Подберем уход для волос.</b>\n\n<i>Какой у вас тип волос?</i>",
-        reply_markup=keyboards.hair_type_keyboard()
-    )
+    await quiz.start(message, state, "hair")
 
 
-@dp.message(UserState.CHOOSING_CATEGORY, F.text == "🧴 Тело")
+@buttons.button("🧴 Тело", UserState.CHOOSING_CATEGORY)
 async def process_body_category(message: Message, state: FSMContext):
-    await state.set_state(UserState.BODY_CHOOSING_GOAL)
-    await message.answer(
-        "🧴 <b>Прекрасно! Займемся уходом за телом.</b>\n\n<i>Какова ваша основная цель ухода?</i>",
-        reply_markup=keyboards.body_goals_keyboard()
-    )
+    await quiz.start(message, state, "body")
 
 
-# ==================== ОПРОС ДЛЯ ТЕЛА ====================
+# ==================== ИТОГИ ОПРОСОВ ====================
+# Шаги опросов описаны в quiz.py; здесь — рекомендации по ответам
 
-@dp.message(UserState.BODY_CHOOSING_GOAL, F.text.in_(config.BODY_GOALS))
-async def process_body_goal(message: Message, state: FSMContext):
-    try:
-        goal = message.text
-        save_user_data(message.from_user.id, "body_goal", goal)
+NO_PHOTOS_TEXT = {
+    "hair": "📷 Фото продуктов для этих рекомендаций пока не загружены.",
+    "body": "📷 Фото продуктов для этой категории пока не загружены.",
+}
 
-        recommendations, photo_keys = await get_body_recommendations_with_photos(goal)
+async def send_results(message: Message, plan: delivery.DeliveryPlan, no_photos_text: str):
+    """Текст рекомендаций, фото продуктов и контакты — в чат сообщения"""
+    # По chat.id, а не from_user: в inline-опросе message — сообщение бота
+    # (в личном чате chat.id совпадает с id пользователя)
+    if plan.signature:
+        save_last_result(message.chat.id, plan.signature)
+    await message.answer(plan.text, reply_markup=keyboards.selection_complete_keyboard())
 
-        await message.answer(recommendations, reply_markup=keyboards.selection_complete_keyboard())
+    if plan.key_count:
+        await send_recommended_photos(message.chat.id, plan)
+    else:
+        await message.answer(no_photos_text, reply_markup=keyboards.selection_complete_keyboard())
 
-        if photo_keys:
-            await send_recommended_photos(message.chat.id, photo_keys)
-        else:
-            await message.answer(
-                "📷 Фото продуктов для этой категории пока не загружены.",
-                reply_markup=keyboards.selection_complete_keyboard()
-            )
+    await message.answer(
+        config.SALES_POINTS + "\n\n" + config.DELIVERY_INFO,
+        reply_markup=keyboards.selection_complete_keyboard()
+    )
 
-        await message.answer(
-            config.SALES_POINTS + "\n\n" + config.DELIVERY_INFO,
-            reply_markup=keyboards.selection_complete_keyboard()
-        )
+
+async def show_body_results(message: Message, state: FSMContext):
+    try:
+        goal = get_user_data_value(message.from_user.id, "body_goal", "")
+        plan = await get_body_recommendations_with_photos(goal)
+        await send_results(message, plan, NO_PHOTOS_TEXT["body"])
 
         await state.clear()
         logger.info(f"✅ Пользователь {message.from_user.id} получил рекомендации для тела: {goal}")
 
     except Exception as e:
-        logger.error(f"❌ Ошибка в process_body_goal: {e}", exc_info=True)
+        logger.error(f"❌ Ошибка в show_body_results: {e}", exc_info=True)
         await message.answer(
             "❌ Произошла ошибка. Попробуйте позже.",
             reply_markup=keyboards.selection_complete_keyboard()
@@ -999,92 +898,6 @@ async def process_body_goal(message: Message, state: FSMContext):
         await state.clear()
 
 
-# ==================== ОПРОС ДЛЯ ВОЛОС ====================
-
-@dp.message(UserState.HAIR_CHOOSING_TYPE, F.text.in_(config.HAIR_TYPES))
-async def process_hair_type(message: Message, state: FSMContext):
-    hair_type = message.text
-    save_user_data(message.from_user.id, "hair_type", hair_type)
-
-    await state.set_state(UserState.HAIR_CHOOSING_PROBLEMS)
-    await message.answer(
-        f"✅ <b>{hair_type}</b>\n\n"
-        "<i>Теперь выберите проблемы волос (можно несколько):</i>\n"
-        "<b>Нажмите на проблему, чтобы выбрать/отменить</b>\n\n"
-        "<i>Можно нажать '✅ Готово' без выбора проблем</i>",
-        reply_markup=keyboards.hair_problems_keyboard([])
-    )
-
-
-@dp.message(UserState.HAIR_CHOOSING_PROBLEMS)
-async def process_hair_problems(message: Message, state: FSMContext):
-    if message.text == "✅ Готово":
-        selected_problems = get_selected_problems(message.from_user.id)
-        logger.info(f"Выбрано проблем: {selected_problems}")
-
-        await state.set_state(UserState.HAIR_CHOOSING_SCALP)
-        await message.answer(
-            "<i>Чувствительная кожа головы?</i>",
-            reply_markup=keyboards.scalp_type_keyboard()
-        )
-
-    elif message.text.startswith("☐ ") or message.text.startswith("✅ "):
-        problem = message.text.replace("✅ ", "").replace("☐ ", "")
-
-        if problem not in config.HAIR_PROBLEMS:
-            return
-
-        current_problems = get_selected_problems(message.from_user.id)
-
-        if problem in current_problems:
-            remove_selected_problem(message.from_user.id, problem)
-        else:
-            add_selected_problem(message.from_user.id, problem)
-
-        await message.answer(
-            "<i>Выберите проблемы волос (можно несколько):</i>\n"
-            "<b>Нажмите на проблему, чтобы выбрать/отменить</b>\n\n"
-            "<i>Можно нажать '✅ Готово' без выбора проблем</i>",
-            reply_markup=keyboards.hair_problems_keyboard(get_selected_problems(message.from_user.id))
-        )
-
-
-@dp.message(UserState.HAIR_CHOOSING_SCALP, F.text.in_(config.SCALP_TYPES))
-async def process_scalp_type(message: Message, state: FSMContext):
-    scalp_type = message.text
-    save_user_data(message.from_user.id, "scalp_type", scalp_type)
-
-    await state.set_state(UserState.HAIR_CHOOSING_VOLUME)
-    await message.answer(
-        "<i>Хотите добавить объем волосам?</i>",
-        reply_markup=keyboards.hair_volume_keyboard()
-    )
-
-
-@dp.message(UserState.HAIR_CHOOSING_VOLUME, F.text.in_(config.HAIR_VOLUME))
-async def process_hair_volume(message: Message, state: FSMContext):
-    hair_volume = message.text
-    save_user_data(message.from_user.id, "hair_volume", hair_volume)
-
-    hair_type = get_user_data_value(message.from_user.id, "hair_type", "")
-
-    if hair_type == "Окрашенные":
-        await state.set_state(UserState.HAIR_CHOOSING_COLOR)
-        await message.answer(
-            "<i>Выберите цвет волос:</i>",
-            reply_markup=keyboards.hair_color_keyboard(hair_type)
-        )
-    else:
-        await show_hair_results(message, state)
-
-
-@dp.message(UserState.HAIR_CHOOSING_COLOR, F.text.in_(["Брюнетка", "Шатенка", "Русая", "Рыжая"]))
-async def process_hair_color(message: Message, state: FSMContext):
-    hair_color = message.text
-    save_user_data(message.from_user.id, "hair_color", hair_color)
-    await show_hair_results(message, state)
-
-
 async def show_hair_results(message: Message, state: FSMContext):
     try:
         hair_type = get_user_data_value(message.from_user.id, "hair_type", "")
@@ -1093,24 +906,10 @@ async def show_hair_results(message: Message, state: FSMContext):
         hair_volume = get_user_data_value(message.from_user.id, "hair_volume", "")
         hair_color = get_user_data_value(message.from_user.id, "hair_color", "")
 
-        recommendations, photo_keys = await get_hair_recommendations_with_photos(
+        plan = await get_hair_recommendations_with_photos(
             hair_type, problems, scalp_type, hair_volume, hair_color
         )
-
-        await message.answer(recommendations, reply_markup=keyboards.selection_complete_keyboard())
-
-        if photo_keys:
-            await send_recommended_photos(message.chat.id, photo_keys)
-        else:
-            await message.answer(
-                "📷 Фото продуктов для этих рекомендаций пока не загружены.",
-                reply_markup=keyboards.selection_complete_keyboard()
-            )
-
-        await message.answer(
-            config.SALES_POINTS + "\n\n" + config.DELIVERY_INFO,
-            reply_markup=keyboards.selection_complete_keyboard()
-        )
+        await send_results(message, plan, NO_PHOTOS_TEXT["hair"])
 
         await state.clear()
         clear_selected_problems(message.from_user.id)
@@ -1125,6 +924,33 @@ async def show_hair_results(message: Message, state: FSMContext):
         await state.clear()
 
 
+# Inline-опрос и ссылки /start: ответы приходят из кнопки или ссылки,
+# хранилища не используются
+async def send_inline_body_results(message: Message, answers: Dict):
+    try:
+        plan = await get_body_recommendations_with_photos(answers["body_goal"])
+        await send_results(message, plan, NO_PHOTOS_TEXT["body"])
+    except Exception as e:
+        logger.error(f"❌ Ошибка в send_inline_body_results: {e}", exc_info=True)
+        await message.answer("❌ Произошла ошибка. Попробуйте позже.")
+
+
+async def send_inline_hair_results(message: Message, answers: Dict):
+    try:
+        plan = await get_hair_recommendations_with_photos(
+            answers["hair_type"], answers["selected_problems"], answers["scalp_type"],
+            answers["hair_volume"], answers.get("hair_color", "")
+        )
+        await send_results(message, plan, NO_PHOTOS_TEXT["hair"])
+    except Exception as e:
+        logger.error(f"❌ Ошибка в send_inline_hair_results: {e}", exc_info=True)
+        await message.answer("❌ Произошла ошибка при формировании рекомендаций. Попробуйте позже.")
+
+
+# Обработчики шагов опросов (quiz.py): ответы -> следующий вопрос -> итог
+quiz.register(buttons, {"hair": show_hair_results, "body": show_body_results})
+
+
 # ==================== АДМИН-ПАНЕЛЬ ====================
 
 @dp.message(AdminState.WAITING_PASSWORD)
@@ -1132,7 +958,9 @@ async def process_admin_password(message: Message, state: FSMContext):
     if message.text == config.ADMIN_PASSWORD:
         await state.set_state(AdminState.ADMIN_MAIN_MENU)
         await message.answer(
-            "✅ <b>Доступ разрешен!</b>\n\nДобро пожаловать в админ-панель.",
+            "✅ <b>Доступ разрешен!</b>\n\nДобро пожаловать в админ-панель.\n\n"
+            "<i>/export — сохранить снимок фото и цен, /import — восстановить из снимка, "
+            "/links — ссылки на готовые подборы (для QR-кодов)</i>",
             reply_markup=keyboards.admin_main_keyboard()
         )
         logger.info(f"🔐 Пользователь {message.from_user.id} вошел в админ-панель")
@@ -1140,7 +968,7 @@ async def process_admin_password(message: Message, state: FSMContext):
         await message.answer("❌ Неверный пароль. Попробуйте еще раз.")
 
 
-@dp.message(AdminState.ADMIN_MAIN_MENU, F.text == "📸 Управление фото")
+@buttons.button("📸 Управление фото", AdminState.ADMIN_MAIN_MENU)
 async def process_admin_photos_menu(message: Message, state: FSMContext):
     await state.set_state(AdminState.ADMIN_PHOTOS_MENU)
     stats_text = format_photo_stats()
@@ -1151,12 +979,12 @@ async def process_admin_photos_menu(message: Message, state: FSMContext):
     )
 
 
-@dp.message(AdminState.ADMIN_MAIN_MENU, F.text == "📊 Статистика")
+@buttons.button("📊 Статистика", AdminState.ADMIN_MAIN_MENU)
 async def process_admin_stats(message: Message):
     await message.answer(format_photo_stats(), reply_markup=keyboards.admin_main_keyboard())
 
 
-@dp.message(AdminState.ADMIN_MAIN_MENU, F.text == "🔄 Обновить список")
+@buttons.button("🔄 Обновить список", AdminState.ADMIN_MAIN_MENU)
 async def process_admin_refresh(message: Message):
     await message.answer(
         f"🔄 <b>Список обновлен</b>\n\n{format_photo_stats()}",
@@ -1164,17 +992,16 @@ async def process_admin_refresh(message: Message):
     )
 
 
-@dp.message(AdminState.ADMIN_PHOTOS_MENU, F.text == "📋 Список всех фото")
+@buttons.button("📋 Список всех фото", AdminState.ADMIN_PHOTOS_MENU)
 async def process_admin_photos_list(message: Message):
-    missing_photos = photo_map.get_missing_photos()
     await message.answer(
-        format_photo_list(missing_photos, 0, "all"),
+        format_photo_list(0, "all"),
         reply_markup=keyboards.admin_photos_list_keyboard(0, "all"),
         parse_mode=ParseMode.HTML
     )
 
 
-@dp.message(AdminState.ADMIN_PHOTOS_MENU, F.text == "📥 Массовая загрузка")
+@buttons.button("📥 Массовая загрузка", AdminState.ADMIN_PHOTOS_MENU)
 async def process_admin_bulk_upload(message: Message, state: FSMContext):
     await state.set_state(AdminState.ADMIN_BULK_UPLOAD)
     stats = photo_map.get_photo_stats()
@@ -1185,14 +1012,14 @@ async def process_admin_bulk_upload(message: Message, state: FSMContext):
         f"<b>Как это работает:</b>\n"
         f"1. Выберите категорию (Волосы/Тело)\n"
         f"2. Выберите подкатегорию\n"
-        f"3. Отправляйте фото по одному\n"
+        f"3. Отправляйте фото по одному или альбомом (по порядку)\n"
         f"4. file_id автоматически сохранятся\n\n"
         f"Выберите категорию для загрузки:",
         reply_markup=keyboards.admin_bulk_upload_keyboard()
     )
 
 
-@dp.message(AdminState.ADMIN_PHOTOS_MENU, F.text == "❌ Удалить все фото")
+@buttons.button("❌ Удалить все фото", AdminState.ADMIN_PHOTOS_MENU)
 async def process_admin_reset_photos(message: Message, state: FSMContext):
     await state.set_state(AdminState.ADMIN_CONFIRM_RESET)
     stats = photo_map.get_photo_stats()
@@ -1208,13 +1035,13 @@ async def process_admin_reset_photos(message: Message, state: FSMContext):
     )
 
 
-@dp.message(AdminState.ADMIN_PHOTOS_MENU, F.text == "↩️ Назад в админку")
+@buttons.button("↩️ Назад в админку", AdminState.ADMIN_PHOTOS_MENU)
 async def process_admin_back_to_main(message: Message, state: FSMContext):
     await state.set_state(AdminState.ADMIN_MAIN_MENU)
     await message.answer("Главное меню админки:", reply_markup=keyboards.admin_main_keyboard())
 
 
-@dp.message(AdminState.ADMIN_BULK_UPLOAD, F.text == "💇‍♀️ Загрузить ВОЛОСЫ")
+@buttons.button("💇‍♀️ Загрузить ВОЛОСЫ", AdminState.ADMIN_BULK_UPLOAD)
 async def process_bulk_hair(message: Message):
     await message.answer(
         "💇‍♀️ <b>Загрузка фото для ВОЛОС</b>\n\nВыберите подкатегорию:",
@@ -1222,7 +1049,7 @@ async def process_bulk_hair(message: Message):
     )
 
 
-@dp.message(AdminState.ADMIN_BULK_UPLOAD, F.text == "🧴 Загрузить ТЕЛО")
+@buttons.button("🧴 Загрузить ТЕЛО", AdminState.ADMIN_BULK_UPLOAD)
 async def process_bulk_body(message: Message):
     await message.answer(
         "🧴 <b>Загрузка фото для ТЕЛА</b>\n\nВыберите подкатегорию:",
@@ -1230,7 +1057,7 @@ async def process_bulk_body(message: Message):
     )
 
 
-@dp.message(AdminState.ADMIN_BULK_UPLOAD, F.text == "📋 Показать прогресс")
+@buttons.button("📋 Показать прогресс", AdminState.ADMIN_BULK_UPLOAD)
 async def process_bulk_progress(message: Message):
     await message.answer(
         f"📋 <b>Прогресс загрузки</b>\n\n{format_photo_stats()}",
@@ -1238,7 +1065,7 @@ async def process_bulk_progress(message: Message):
     )
 
 
-@dp.message(AdminState.ADMIN_BULK_UPLOAD, F.text == "↩️ Назад к фото")
+@buttons.button("↩️ Назад к фото", AdminState.ADMIN_BULK_UPLOAD)
 async def process_bulk_back_to_photos(message: Message, state: FSMContext):
     await state.set_state(AdminState.ADMIN_PHOTOS_MENU)
     await message.answer(
@@ -1248,11 +1075,99 @@ async def process_bulk_back_to_photos(message: Message, state: FSMContext):
     )
 
 
+# ==================== ЗАГРУЗКА АЛЬБОМОМ / ZIP ====================
+
+@buttons.button("🗂 Альбом / ZIP", AdminState.ADMIN_BULK_UPLOAD)
+async def process_bulk_ingest_start(message: Message, state: FSMContext):
+    await state.set_state(AdminState.ADMIN_BULK_INGEST)
+    await message.answer(
+        "🗂 <b>Загрузка альбомом или ZIP-архивом</b>\n\n"
+        "Отправьте одним сообщением любое из:\n"
+        "• альбом фото — в подписи каждого фото ключ продукта "
+        "(например <code>blonde_mask</code>);\n"
+        "• альбом файлов-изображений — имя файла = ключ "
+        "(<code>blonde_mask.jpg</code>);\n"
+        "• ZIP-архив до 20 МБ с такими файлами.\n\n"
+        "<i>У сжатых фото Telegram не сохраняет имена файлов, поэтому для них нужна подпись. "
+        "Все найденные ключи сохранятся разом, итог придёт одним сообщением.</i>\n\n"
+        "Список ключей — в «📋 Список всех фото».",
+        reply_markup=keyboards.admin_bulk_ingest_keyboard()
+    )
+
+
+@dp.message(AdminState.ADMIN_BULK_INGEST, F.photo | F.document)
+async def process_bulk_ingest_media(message: Message, album: List[Message]):
+    """Альбом или одиночное сообщение; части альбома собирает MediaGroupMiddleware"""
+    logger.info(f"🗂 Пакетная загрузка: {len(album)} сообщений от {message.chat.id}")
+    try:
+        result = await bulk_ingest.ingest_messages(bot, message.chat.id, album)
+    except Exception as e:
+        logger.error(f"❌ Ошибка пакетной загрузки: {e}", exc_info=True)
+        await message.answer(
+            f"❌ <b>Ошибка пакетной загрузки:</b> {html.escape(str(e))}",
+            reply_markup=keyboards.admin_bulk_ingest_keyboard()
+        )
+        return
+    try:
+        await message.answer(bulk_ingest.format_summary(result), reply_markup=keyboards.admin_bulk_ingest_keyboard())
+    except Exception as e:
+        # Фото уже сохранены — сообщаем хотя бы об этом, без HTML
+        logger.error(f"❌ Не отправлен отчёт пакетной загрузки: {e}", exc_info=True)
+        await message.answer(
+            f"📦 Пакетная загрузка завершена: сохранено {len(result.saved)}, "
+            f"не распознано {len(result.unmatched)}, ошибок {len(result.errors)}.",
+            parse_mode=None,
+            reply_markup=keyboards.admin_bulk_ingest_keyboard()
+        )
+
+
+@buttons.button("📋 Показать прогресс", AdminState.ADMIN_BULK_INGEST)
+async def process_bulk_ingest_progress(message: Message):
+    await message.answer(
+        f"📋 <b>Прогресс загрузки</b>\n\n{format_photo_stats()}",
+        reply_markup=keyboards.admin_bulk_ingest_keyboard()
+    )
+
+
+@buttons.button("↩️ Назад к загрузке", AdminState.ADMIN_BULK_INGEST)
+async def process_bulk_ingest_back(message: Message, state: FSMContext):
+    await state.set_state(AdminState.ADMIN_BULK_UPLOAD)
+    await message.answer(
+        f"📥 <b>Массовая загрузка фото</b>\n\n{format_photo_stats()}",
+        reply_markup=keyboards.admin_bulk_upload_keyboard()
+    )
+
+
+@dp.message(AdminState.ADMIN_BULK_INGEST)
+async def handle_bulk_ingest_text(message: Message):
+    await message.answer(
+        "🗂 <b>Режим загрузки альбомом / ZIP</b>\n\n"
+        "<i>Отправьте альбом фото с подписями-ключами, файлы-изображения или ZIP-архив.</i>",
+        reply_markup=keyboards.admin_bulk_ingest_keyboard()
+    )
+
+
+# ==================== INLINE-ПОИСК ====================
+
+@dp.inline_query()
+async def process_inline_query(inline_query: InlineQuery):
+    results = search.inline_results(inline_query.query)
+    await inline_query.answer(results, cache_time=config.INLINE_CACHE_TIME, is_personal=False)
+
+
 # ==================== CALLBACK QUERIES ДЛЯ АДМИНКИ ====================
 
-@dp.callback_query(F.data.startswith("bulk_category:"))
-async def process_bulk_category(callback: CallbackQuery, state: FSMContext):
-    category = callback.data.split(":")[1]
+callback_router = callbacks.CallbackRouter()
+
+
+# Inline-опрос без состояния (quiz.py): шаг и ответы — в callback_data
+ANSWER_RESULTS = {"hair": send_inline_hair_results, "body": send_inline_body_results}
+quiz.register_inline(callback_router, ANSWER_RESULTS)
+
+
+@callback_router.handler(callbacks.BULK_CATEGORY)
+async def process_bulk_category(callback: CallbackQuery, state: FSMContext, args):
+    category = args.category
     category_name = "💇‍♀️ Волосы" if category == "волосы" else "🧴 Тело"
     await callback.message.edit_text(
         f"{category_name} - <b>Выберите подкатегорию:</b>",
@@ -1262,8 +1177,8 @@ async def process_bulk_category(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "bulk_back_to_categories")
-async def process_bulk_back_to_categories(callback: CallbackQuery):
+@callback_router.handler(callbacks.BULK_BACK_TO_CATEGORIES)
+async def process_bulk_back_to_categories(callback: CallbackQuery, state: FSMContext, args):
     await callback.message.edit_text(
         "📥 <b>Массовая загрузка фото</b>\n\nВыберите категорию для загрузки:",
         reply_markup=keyboards.admin_category_bulk_keyboard(),
@@ -1272,12 +1187,10 @@ async def process_bulk_back_to_categories(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data.startswith("bulk_subcategory_idx:"))
-async def process_bulk_subcategory(callback: CallbackQuery, state: FSMContext):
+@callback_router.handler(callbacks.BULK_SUBCATEGORY)
+async def process_bulk_subcategory(callback: CallbackQuery, state: FSMContext, args):
     try:
-        parts = callback.data.split(":")
-        category = parts[1]
-        idx = int(parts[2])
+        category, idx = args.category, args.index
 
         category_name = "💇‍♀️ Волосы" if category == "волосы" else "🧴 Тело"
         subcategories = list(config.PHOTO_STRUCTURE_ADMIN[category_name].items())
@@ -1313,13 +1226,9 @@ async def process_bulk_subcategory(callback: CallbackQuery, state: FSMContext):
         else:
             text += "❌ <i>Еще не загружено</i>\n\n<i>Отправьте фото этого продукта</i>"
 
-        builder = InlineKeyboardBuilder()
-        builder.row(
-            types.InlineKeyboardButton(text="⏭️ Пропустить", callback_data=f"bulk_skip:{product_key}"),
-            types.InlineKeyboardButton(text="🛑 Остановить", callback_data="bulk_stop")
+        await callback.message.edit_text(
+            text, reply_markup=keyboards.admin_bulk_step_keyboard(product_key), parse_mode=ParseMode.HTML
         )
-
-        await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode=ParseMode.HTML)
         await callback.answer()
 
     except Exception as e:
@@ -1327,142 +1236,188 @@ async def process_bulk_subcategory(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❌ Произошла ошибка")
 
 
-@dp.callback_query(F.data.startswith("bulk_skip:"))
-async def process_bulk_skip(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    products = data.get("bulk_products", [])
-    current_index = data.get("bulk_current_index", 0) + 1
+# Назначение фото, пропуск и остановка меняют bulk_current_index — чтение и
+# запись состояния; без блокировки два обновления одного чата могли бы взять
+# один и тот же индекс. Запись удаляется, когда сессия загрузки заканчивается.
+_bulk_locks: Dict[int, asyncio.Lock] = {}
 
-    if current_index >= len(products):
-        category_name = "💇‍♀️ Волосы" if data.get("bulk_category") == "волосы" else "🧴 Тело"
-        await callback.message.edit_text(
-            f"✅ <b>Загрузка завершена!</b>\n\n"
-            f"<b>Категория:</b> {category_name}\n"
-            f"<b>Подкатегория:</b> {data.get('bulk_subcategory', '')}\n"
-            f"<b>Обработано продуктов:</b> {len(products)}\n\n"
-            "Вы можете продолжить загрузку в другой подкатегории.",
-            reply_markup=keyboards.admin_category_bulk_keyboard(),
-            parse_mode=ParseMode.HTML
-        )
-        await state.set_state(AdminState.ADMIN_BULK_UPLOAD)
-        await callback.answer("✅ Все продукты обработаны!")
-        return
 
-    await state.update_data(bulk_current_index=current_index)
+def _bulk_lock(chat_id: int) -> asyncio.Lock:
+    return _bulk_locks.setdefault(chat_id, asyncio.Lock())
 
-    product_key, product_name = products[current_index]
-    current_file_id = photo_map.get_photo_file_id(product_key)
-    category_label = "💇‍♀️ Волосы" if data.get("bulk_category") == "волосы" else "🧴 Тело"
 
-    text = (
-        f"📥 <b>Массовая загрузка</b>\n\n"
-        f"<b>Категория:</b> {category_label}\n"
-        f"<b>Подкатегория:</b> {data.get('bulk_subcategory', '')}\n\n"
-        f"<b>Текущий продукт ({current_index + 1}/{len(products)}):</b>\n"
-        f"• {product_name}\n"
-        f"• Ключ: <code>{product_key}</code>\n\n"
-    )
-    if current_file_id:
-        text += f"✅ <i>Уже загружено</i>\n• file_id: <code>{current_file_id}</code>\n\n"
-        text += "<i>Отправьте новое фото для замены или нажмите 'Пропустить'</i>"
-    else:
-        text += "❌ <i>Еще не загружено</i>\n\n<i>Отправьте фото этого продукта</i>"
-
-    builder = InlineKeyboardBuilder()
-    builder.row(
-        types.InlineKeyboardButton(text="⏭️ Пропустить", callback_data=f"bulk_skip:{product_key}"),
-        types.InlineKeyboardButton(text="🛑 Остановить", callback_data="bulk_stop")
-    )
-    await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode=ParseMode.HTML)
-    await callback.answer("⏭️ Пропущено")
-
-
-@dp.callback_query(F.data == "bulk_stop")
-async def process_bulk_stop(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    current_index = data.get("bulk_current_index", 0)
-    await callback.message.edit_text(
-        f"🛑 <b>Загрузка остановлена</b>\n\n"
-        f"<b>Обработано продуктов:</b> {current_index + 1}\n\n"
-        "Вы можете продолжить загрузку в другой подкатегории.",
-        reply_markup=keyboards.admin_category_bulk_keyboard(),
-        parse_mode=ParseMode.HTML
-    )
-    await state.set_state(AdminState.ADMIN_BULK_UPLOAD)
-    await callback.answer("🛑 Загрузка остановлена")
-
-
-@dp.message(AdminState.ADMIN_WAITING_BULK_PHOTO, F.photo)
-async def process_bulk_photo(message: Message, state: FSMContext):
-    logger.info("📸 Получено фото в режиме массовой загрузки")
-    data = await state.get_data()
-    products = data.get("bulk_products", [])
-    current_index = data.get("bulk_current_index", 0)
+def _end_bulk_session(chat_id: int):
+    """Вызывается под блокировкой сессии вместе со сменой состояния"""
+    _bulk_locks.pop(chat_id, None)
 
-    if current_index >= len(products):
-        await message.answer("❌ Ошибка: список продуктов пуст.")
-        return
 
-    product_key, product_name = products[current_index]
-    file_id = message.photo[-1].file_id
-    success = photo_map.set_photo_file_id(product_key, file_id)
+async def _bulk_session_active(callback: CallbackQuery, state: FSMContext) -> bool:
+    # Нажатие, дождавшееся блокировки после «Стоп» или конца списка, устарело
+    if await state.get_state() == AdminState.ADMIN_WAITING_BULK_PHOTO.state:
+        return True
+    await callback.answer("⚠️ Кнопка устарела")
+    return False
 
-    if success:
-        # Отправляем отдельное сообщение с полной информацией о сохраненном фото
-        await message.answer(
-            f"✅ <b>Фото сохранено!</b>\n\n"
-            f"<b>Продукт:</b> {product_name}\n"
-            f"<b>Ключ:</b> <code>{product_key}</code>\n"
-            f"<b>file_id:</b> <code>{file_id}</code>",
-            parse_mode=ParseMode.HTML
-        )
 
-        current_index += 1
+@callback_router.handler(callbacks.BULK_SKIP)
+async def process_bulk_skip(callback: CallbackQuery, state: FSMContext, args):
+    async with _bulk_lock(callback.message.chat.id):
+        if not await _bulk_session_active(callback, state):
+            return
+        data = await state.get_data()
+        products = data.get("bulk_products", [])
+        current_index = data.get("bulk_current_index", 0) + 1
 
         if current_index >= len(products):
             category_name = "💇‍♀️ Волосы" if data.get("bulk_category") == "волосы" else "🧴 Тело"
-            await message.answer(
-                f"📥 <b>Загрузка завершена!</b>\n\n"
+            await callback.message.edit_text(
+                f"✅ <b>Загрузка завершена!</b>\n\n"
                 f"<b>Категория:</b> {category_name}\n"
                 f"<b>Подкатегория:</b> {data.get('bulk_subcategory', '')}\n"
                 f"<b>Обработано продуктов:</b> {len(products)}\n\n"
                 "Вы можете продолжить загрузку в другой подкатегории.",
-                reply_markup=keyboards.admin_category_bulk_keyboard()
+                reply_markup=keyboards.admin_category_bulk_keyboard(),
+                parse_mode=ParseMode.HTML
             )
             await state.set_state(AdminState.ADMIN_BULK_UPLOAD)
+            _end_bulk_session(callback.message.chat.id)
+            await callback.answer("✅ Все продукты обработаны!")
             return
 
         await state.update_data(bulk_current_index=current_index)
-        next_product_key, next_product_name = products[current_index]
-        next_file_id = photo_map.get_photo_file_id(next_product_key)
+
+        product_key, product_name = products[current_index]
+        current_file_id = photo_map.get_photo_file_id(product_key)
         category_label = "💇‍♀️ Волосы" if data.get("bulk_category") == "волосы" else "🧴 Тело"
 
         text = (
-            f"📥 <b>Следующий продукт ({current_index + 1}/{len(products)}):</b>\n\n"
+            f"📥 <b>Массовая загрузка</b>\n\n"
             f"<b>Категория:</b> {category_label}\n"
             f"<b>Подкатегория:</b> {data.get('bulk_subcategory', '')}\n\n"
-            f"<b>Продукт:</b> {next_product_name}\n"
-            f"<b>Ключ:</b> <code>{next_product_key}</code>\n\n"
+            f"<b>Текущий продукт ({current_index + 1}/{len(products)}):</b>\n"
+            f"• {product_name}\n"
+            f"• Ключ: <code>{product_key}</code>\n\n"
         )
-        if next_file_id:
-            text += f"✅ <i>Уже загружено</i>\n• file_id: <code>{next_file_id}</code>\n\n"
+        if current_file_id:
+            text += f"✅ <i>Уже загружено</i>\n• file_id: <code>{current_file_id}</code>\n\n"
             text += "<i>Отправьте новое фото для замены или нажмите 'Пропустить'</i>"
         else:
             text += "❌ <i>Еще не загружено</i>\n\n<i>Отправьте фото этого продукта</i>"
 
-        builder = InlineKeyboardBuilder()
-        builder.row(
-            types.InlineKeyboardButton(text="⏭️ Пропустить", callback_data=f"bulk_skip:{next_product_key}"),
-            types.InlineKeyboardButton(text="🛑 Остановить", callback_data="bulk_stop")
+        await callback.message.edit_text(
+            text, reply_markup=keyboards.admin_bulk_step_keyboard(product_key), parse_mode=ParseMode.HTML
         )
-        await message.answer(text, reply_markup=builder.as_markup(), parse_mode=ParseMode.HTML)
-    else:
+        await callback.answer("⏭️ Пропущено")
+
+
+@callback_router.handler(callbacks.BULK_STOP)
+async def process_bulk_stop(callback: CallbackQuery, state: FSMContext, args):
+    async with _bulk_lock(callback.message.chat.id):
+        if not await _bulk_session_active(callback, state):
+            return
+        data = await state.get_data()
+        current_index = data.get("bulk_current_index", 0)
+        await state.set_state(AdminState.ADMIN_BULK_UPLOAD)
+        _end_bulk_session(callback.message.chat.id)
+    await callback.message.edit_text(
+        f"🛑 <b>Загрузка остановлена</b>\n\n"
+        f"<b>Обработано продуктов:</b> {current_index + 1}\n\n"
+        "Вы можете продолжить загрузку в другой подкатегории.",
+        reply_markup=keyboards.admin_category_bulk_keyboard(),
+        parse_mode=ParseMode.HTML
+    )
+    await callback.answer("🛑 Загрузка остановлена")
+
+
+@dp.message(AdminState.ADMIN_WAITING_BULK_PHOTO, F.photo)
+async def process_bulk_photo(message: Message, state: FSMContext, album: List[Message]):
+    """Фото (или альбом фото) назначаются продуктам подкатегории по порядку"""
+    logger.info(f"📸 Получено фото в режиме массовой загрузки: {len(album)}")
+    async with _bulk_lock(message.chat.id):
+        data = await state.get_data()
+        products = data.get("bulk_products", [])
+        current_index = data.get("bulk_current_index", 0)
+
+        if current_index >= len(products):
+            await message.answer("❌ Ошибка: список продуктов пуст.")
+            return
+
+        photos = [item for item in album if item.photo]
+        assigned = list(zip(products[current_index:], photos))
+        extra = len(photos) - len(assigned)
+
+        merged = dict(photo_map.get_all_photos())
+        for (product_key, _), item in assigned:
+            merged[product_key] = item.photo[-1].file_id
+        success = photo_map.save_photo_map(merged)
+        if success:
+            current_index += len(assigned)
+            await state.update_data(bulk_current_index=current_index)
+            if current_index >= len(products):
+                await state.set_state(AdminState.ADMIN_BULK_UPLOAD)
+                _end_bulk_session(message.chat.id)
+
+    if not success:
+        product_names = ", ".join(name for (_, name), _ in assigned)
         await message.answer(
             f"❌ <b>Ошибка сохранения!</b>\n\n"
-            f"Не удалось сохранить фото для продукта: {product_name}\n"
-            f"Ключ: <code>{product_key}</code>",
+            f"Не удалось сохранить фото для продуктов: {product_names}",
             parse_mode=ParseMode.HTML
         )
+        return
+
+    # Одно сообщение с полной информацией о всех сохраненных фото
+    if len(assigned) == 1:
+        (product_key, product_name), item = assigned[0]
+        text = (
+            f"✅ <b>Фото сохранено!</b>\n\n"
+            f"<b>Продукт:</b> {product_name}\n"
+            f"<b>Ключ:</b> <code>{product_key}</code>\n"
+            f"<b>file_id:</b> <code>{item.photo[-1].file_id}</code>"
+        )
+    else:
+        text = f"✅ <b>Сохранено фото: {len(assigned)}</b>\n\n"
+        for (product_key, product_name), item in assigned:
+            text += (
+                f"<b>{product_name}</b> (<code>{product_key}</code>)\n"
+                f"• file_id: <code>{item.photo[-1].file_id}</code>\n"
+            )
+    if extra > 0:
+        text += f"\n⚠️ Лишних фото в альбоме: {extra} — продукты подкатегории закончились"
+    await message.answer(text, parse_mode=ParseMode.HTML)
+
+    if current_index >= len(products):
+        category_name = "💇‍♀️ Волосы" if data.get("bulk_category") == "волосы" else "🧴 Тело"
+        await message.answer(
+            f"📥 <b>Загрузка завершена!</b>\n\n"
+            f"<b>Категория:</b> {category_name}\n"
+            f"<b>Подкатегория:</b> {data.get('bulk_subcategory', '')}\n"
+            f"<b>Обработано продуктов:</b> {len(products)}\n\n"
+            "Вы можете продолжить загрузку в другой подкатегории.",
+            reply_markup=keyboards.admin_category_bulk_keyboard()
+        )
+        return
+
+    next_product_key, next_product_name = products[current_index]
+    next_file_id = photo_map.get_photo_file_id(next_product_key)
+    category_label = "💇‍♀️ Волосы" if data.get("bulk_category") == "волосы" else "🧴 Тело"
+
+    text = (
+        f"📥 <b>Следующий продукт ({current_index + 1}/{len(products)}):</b>\n\n"
+        f"<b>Категория:</b> {category_label}\n"
+        f"<b>Подкатегория:</b> {data.get('bulk_subcategory', '')}\n\n"
+        f"<b>Продукт:</b> {next_product_name}\n"
+        f"<b>Ключ:</b> <code>{next_product_key}</code>\n\n"
+    )
+    if next_file_id:
+        text += f"✅ <i>Уже загружено</i>\n• file_id: <code>{next_file_id}</code>\n\n"
+        text += "<i>Отправьте новое фото (или альбом фото по порядку) для замены или нажмите 'Пропустить'</i>"
+    else:
+        text += "❌ <i>Еще не загружено</i>\n\n<i>Отправьте фото этого продукта (или альбом фото по порядку)</i>"
+
+    await message.answer(
+        text, reply_markup=keyboards.admin_bulk_step_keyboard(next_product_key), parse_mode=ParseMode.HTML
+    )
 
 
 @dp.message(AdminState.ADMIN_WAITING_BULK_PHOTO)
@@ -1487,22 +1442,19 @@ async def handle_bulk_state_text(message: Message, state: FSMContext):
         )
 
 
-@dp.callback_query(F.data.startswith("photos_list:"))
-async def process_photos_list(callback: CallbackQuery):
-    parts = callback.data.split(":")
-    filter_type = parts[1]
-    page = int(parts[2])
-    missing_photos = photo_map.get_missing_photos()
+@callback_router.handler(callbacks.PHOTOS_LIST)
+async def process_photos_list(callback: CallbackQuery, state: FSMContext, args):
+    filter_type, page = args.filter, args.page
     await callback.message.edit_text(
-        format_photo_list(missing_photos, page, filter_type),
+        format_photo_list(page, filter_type),
         reply_markup=keyboards.admin_photos_list_keyboard(page, filter_type),
         parse_mode=ParseMode.HTML
     )
     await callback.answer()
 
 
-@dp.callback_query(F.data == "bulk_upload_start")
-async def process_bulk_upload_start(callback: CallbackQuery):
+@callback_router.handler(callbacks.BULK_UPLOAD_START)
+async def process_bulk_upload_start(callback: CallbackQuery, state: FSMContext, args):
     await callback.message.edit_text(
         "📥 <b>Массовая загрузка фото</b>\n\nВыберите категорию для загрузки:",
         reply_markup=keyboards.admin_category_bulk_keyboard(),
@@ -1511,15 +1463,15 @@ async def process_bulk_upload_start(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "admin_back_to_main")
-async def process_admin_back_to_main_callback(callback: CallbackQuery, state: FSMContext):
+@callback_router.handler(callbacks.ADMIN_BACK_TO_MAIN)
+async def process_admin_back_to_main_callback(callback: CallbackQuery, state: FSMContext, args):
     await state.set_state(AdminState.ADMIN_MAIN_MENU)
     await callback.message.edit_text("Главное меню админки:", reply_markup=keyboards.admin_main_keyboard())
     await callback.answer()
 
 
-@dp.callback_query(F.data == "confirm_reset_photos")
-async def process_confirm_reset(callback: CallbackQuery, state: FSMContext):
+@callback_router.handler(callbacks.RESET_CONFIRM)
+async def process_confirm_reset(callback: CallbackQuery, state: FSMContext, args):
     success = photo_map.reset_all_photos()
     if success:
         await callback.message.edit_text(
@@ -1537,8 +1489,8 @@ async def process_confirm_reset(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "cancel_reset_photos")
-async def process_cancel_reset(callback: CallbackQuery, state: FSMContext):
+@callback_router.handler(callbacks.RESET_CANCEL)
+async def process_cancel_reset(callback: CallbackQuery, state: FSMContext, args):
     await state.set_state(AdminState.ADMIN_PHOTOS_MENU)
     await callback.message.edit_text(
         f"📸 <b>Управление фотографиями</b>\n\n{format_photo_stats()}\n\n"
@@ -1549,11 +1501,50 @@ async def process_cancel_reset(callback: CallbackQuery, state: FSMContext):
     await callback.answer("❌ Удаление отменено")
 
 
-@dp.callback_query(F.data == "no_action")
-async def process_no_action(callback: CallbackQuery):
+@callback_router.handler(callbacks.CAROUSEL)
+async def process_carousel(callback: CallbackQuery, state: FSMContext, args):
+    """Показать продукт карусели: file_id и подпись берутся по ключу из кнопки"""
+    if not args.products or args.position >= len(args.products):
+        await callback.answer("⚠️ Кнопка устарела")
+        return
+    product_key = args.products[args.position]
+    file_id = photo_map.get_photo_file_id(product_key)
+    if not file_id:
+        await callback.answer("📷 Фото этого продукта сейчас недоступно")
+        return
+    await callback.message.edit_media(
+        InputMediaPhoto(media=file_id, caption=delivery.product_caption(product_key)),
+        reply_markup=keyboards.carousel_keyboard(args.products, args.position)
+    )
+    await callback.answer()
+
+
+@callback_router.handler(callbacks.RESULT_PHOTOS)
+async def process_result_photos(callback: CallbackQuery, state: FSMContext, args):
+    """Фото результата, отложенные из-за перегрузки: file_id — по ключам из кнопки"""
+    await callback.answer()
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await send_recommended_photos(callback.message.chat.id, delivery.build_plan("", list(args.products)))
+
+
+@callback_router.handler(callbacks.NO_ACTION)
+async def process_no_action(callback: CallbackQuery, state: FSMContext, args):
     await callback.answer()
 
 
+@dp.callback_query()
+async def dispatch_callback(callback: CallbackQuery, state: FSMContext):
+    """Единая точка входа inline-кнопок: обработчик выбирается по префиксу callback_data"""
+    try:
+        handler, args = callback_router.resolve(callback.data or "")
+    except callbacks.CallbackDataError as e:
+        # Кнопки старого формата или повреждённые данные
+        logger.warning(f"⚠️ Неизвестная кнопка: {e}")
+        await callback.answer("⚠️ Кнопка устарела, откройте меню заново")
+        return
+    await handler(callback, state, args)
+
+
 # ==================== ЗАПУСК БОТА ====================
 
 async def main():
@@ -1563,29 +1554,66 @@ async def main():
         logger.info(f"⏰ Время запуска: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         logger.info("=" * 60)
 
-        start_health_server()
+        health.set_runtime_stats(runtime_stats)
+        health.start_health_server()
 
         stats = photo_map.get_photo_stats()
         logger.info(f"📸 Статистика фото: {stats['loaded']}/{stats['total']} ({stats['percentage']}%)")
 
-        await bot.delete_webhook(drop_pending_updates=True)
+        # Ошибка в catalog.json должна остановить запуск, а не первый опрос;
+        # дальше файл отслеживается и перечитывается на лету
+        catalog.CatalogWatcher().start()
+
+        # Накопившиеся обновления не выбрасываем: после рестарта они будут обработаны
+        await bot.delete_webhook(drop_pending_updates=False)
 
         survival_system = RenderSurvivalSystem(bot)
         asyncio.create_task(survival_system.run())
 
+        offsets = lifecycle.OffsetTracker(config.UPDATE_OFFSET_FILE)
+        poller = lifecycle.UpdatePoller(bot, offsets, dp.resolve_used_update_types())
+        handlers = lifecycle.InFlightTasks()
+        lifecycle.install_stop_signals(poller.stop)
+
+        async def handle_update(update: types.Update):
+            # Прерванное при остановке обновление не отмечаем обработанным:
+            # оно сохранится вместе с оффсетом и после рестарта обработается заново
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки обновления {update.update_id}: {e}", exc_info=True)
+            offsets.finished(update.update_id)
+
+        async def on_update(update: types.Update):
+            handlers.spawn(handle_update(update))
+
         logger.info("🤖 БОТ ЗАПУЩЕН И ГОТОВ К РАБОТЕ")
 
-        await dp.start_polling(
-            bot,
-            allowed_updates=dp.resolve_used_update_types(),
-            close_bot_session=False
-        )
+        try:
+            await poller.run(on_update)
+        finally:
+            # Дожидаемся обработчиков (включая отправку фото) и альбомов
+            # в общий срок и сохраняем оффсет
+            deadline = time.time() + config.SHUTDOWN_DRAIN_TIMEOUT
+            await handlers.drain(lifecycle.time_left(deadline))
+            await dp.emit_shutdown(bot=bot, timeout=lifecycle.time_left(deadline))
+            offsets.flush()
+            await bot.session.close()
+
+        logger.info("👋 Бот корректно остановлен")
 
     except Exception as e:
         logger.error(f"❌ Критическая ошибка при запуске: {e}", exc_info=True)
         raise
 
 
+async def start_supervisor_services(bot_instance: Bot):
+    """Фоновые службы процесса-супервизора в многопроцессном режиме"""
+    health.start_health_server()
+    survival_system = RenderSurvivalSystem(bot_instance)
+    asyncio.create_task(survival_system.run())
+
+
 def run_bot_with_restarts():
     max_restarts = 10
     restart_delay = 30
@@ -1596,6 +1624,8 @@ def run_bot_with_restarts():
             restart_count += 1
             logger.info(f"🔄 Запуск бота (попытка {restart_count}/{max_restarts})")
             asyncio.run(main())
+            # main() возвращается только после штатной остановки по сигналу
+            break
 
         except KeyboardInterrupt:
             logger.info("👋 Бот остановлен пользователем")
@@ -1614,4 +1644,9 @@ def run_bot_with_restarts():
 
 
 if __name__ == "__main__":
-    run_bot_with_restarts()
+    if config.WORKERS > 1:
+        import workers
+        workers.run_supervisor(dp, bot, config.WORKERS, on_startup=start_supervisor_services,
+                               runtime_stats=runtime_stats)
+    else:
+        run_bot_with_restarts()
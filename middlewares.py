@@ -0,0 +1,97 @@
+"""
+MIDDLEWARES.PY - Промежуточные обработчики aiogram
+
+MediaGroupMiddleware собирает альбом (несколько фото с общим
+media_group_id приходят отдельными обновлениями) в одну пачку и вызывает
+хендлер один раз, передавая все части в аргументе album. Одиночное
+сообщение проходит сразу, с album из одного элемента.
+
+Части альбома не ждут друг друга внутри обработки обновления: в
+многопроцессном режиме обновления одного чата обрабатываются строго по
+очереди, и ожидание заблокировало бы доставку остальных частей. Вместо
+этого каждая часть только добавляется в буфер, а хендлер вызывается
+отдельной задачей через ALBUM_WAIT после последней пришедшей части.
+
+Обновления частей к этому моменту уже отмечены обработанными, поэтому при
+остановке альбомы дообрабатываются отдельно: drain() зарегистрирован в
+dp.shutdown и вызывается после завершения обработчиков обновлений
+(main.main и воркеры workers.py).
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+
+import config
+import lifecycle
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждать остальные части альбома после последней пришедшей, сек
+ALBUM_WAIT = 1.0
+
+Handler = Callable[[Message, Dict[str, Any]], Awaitable[Any]]
+
+
+class MediaGroupMiddleware(BaseMiddleware):
+    """Inner-middleware для dp.message: альбом → один вызов хендлера с album"""
+
+    def __init__(self, wait: float = ALBUM_WAIT):
+        self.wait = wait
+        # media_group_id → (части, хендлер и данные первой части, таймер)
+        self._albums: Dict[str, Tuple[List[Message], Handler, Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks = lifecycle.InFlightTasks()
+
+    async def __call__(self, handler: Handler, event: Message, data: Dict[str, Any]) -> Any:
+        group_id = event.media_group_id
+        if not group_id:
+            data["album"] = [event]
+            return await handler(event, data)
+
+        if group_id in self._albums:
+            self._albums[group_id][0].append(event)
+        else:
+            self._albums[group_id] = ([event], handler, data)
+
+        timer = self._timers.pop(group_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[group_id] = asyncio.get_running_loop().call_later(
+            self.wait, self._flush, group_id
+        )
+        return None
+
+    def _flush(self, group_id: str):
+        self._timers.pop(group_id, None)
+        messages, handler, data = self._albums.pop(group_id)
+        messages.sort(key=lambda item: item.message_id)
+        data["album"] = messages
+        self._tasks.spawn(self._run(handler, messages[0], data))
+
+    async def _run(self, handler: Handler, event: Message, data: Dict[str, Any]):
+        try:
+            await handler(event, data)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки альбома {event.media_group_id}: {e}", exc_info=True)
+
+    @property
+    def pending(self) -> int:
+        """Сколько альбомов ещё собирается или обрабатывается"""
+        return len(self._albums) + len(self._tasks)
+
+    async def drain(self, timeout: float = config.SHUTDOWN_DRAIN_TIMEOUT) -> bool:
+        """
+        Остановка: новых частей уже не будет, поэтому собираемые альбомы
+        отдаются хендлеру сразу, не дожидаясь таймеров, и обработка ждётся
+        не дольше timeout. True, если все альбомы успели обработаться.
+        """
+        if self.pending:
+            logger.info(f"⏳ Дообработка альбомов: {self.pending}")
+        for group_id in list(self._albums):
+            self._timers[group_id].cancel()
+            self._flush(group_id)
+        return await self._tasks.drain(timeout)
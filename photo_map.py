@@ -1,11 +1,16 @@
 """
 PHOTO_MAP.PY - Статическое хранилище file_id фотографий
 Оптимизировано для Render Free (без зависимости от файловой системы)
+
+Хранилище — неизменяемые версионированные снимки: читатели получают
+текущий снимок без копирования, запись публикует новый снимок со
+следующим номером версии (copy-on-write). По номеру версии сбрасываются
+кэши статистики, списка для админки и планов отправки фото.
 """
 
-import json
-import os
-from typing import Dict, List, Optional
+import functools
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
 # Импортируем предзагруженные фото
 try:
@@ -79,27 +84,122 @@ ALL_PHOTO_KEYS = {
     "men_shampoo": "Шампунь для мужчин",
 }
 
-# ==================== ГЛОБАЛЬНОЕ ХРАНИЛИЩЕ В ПАМЯТИ ====================
-# На Render Free используем память вместо файлов
-_photo_storage = PRELOADED_PHOTOS.copy()
+# ==================== ВЕРСИОНИРОВАННЫЕ СНИМКИ ====================
+# На Render Free используем память вместо файлов.
+# Заполняется при первом обращении, а не при импорте (быстрый холодный старт).
+
+class PhotoSnapshot:
+    """Снимок фото-мапа: только для чтения, не меняется после публикации"""
+
+    __slots__ = ("version", "photos")
+
+    def __init__(self, version: int, photos: Mapping[str, str]):
+        self.version = version
+        self.photos = photos
+
+
+_snapshot: Optional[PhotoSnapshot] = None
+
+def snapshot() -> PhotoSnapshot:
+    """Текущий снимок; его можно держать сколько угодно — он не изменится"""
+    if _snapshot is None:
+        initialize_with_preloaded()
+    return _snapshot
+
+def version() -> int:
+    """Номер версии текущего снимка (растёт при каждой записи)"""
+    return snapshot().version
+
+def _publish(data: Dict[str, str], notify: bool = True):
+    """Опубликовать новый снимок одной операцией присваивания"""
+    global _snapshot
+    previous = dict(_snapshot.photos) if _snapshot is not None else {}
+    previous_version = _snapshot.version if _snapshot is not None else 0
+    _snapshot = PhotoSnapshot(previous_version + 1, MappingProxyType(dict(data)))
+    if notify:
+        changes: Dict[str, Optional[str]] = {
+            key: file_id for key, file_id in data.items() if previous.get(key) != file_id
+        }
+        changes.update((key, None) for key in previous if key not in data)
+        if changes:
+            _notify_change(changes)
+
+# ==================== КЭШ ПО ВЕРСИИ ====================
+
+def cached_per_version(*extra_versions: Callable[[], Any]):
+    """
+    Кэш результатов функции до смены версии фото-мапа (и дополнительных
+    источников версий, например каталога). Аргументы должны быть хэшируемыми;
+    результат общий для всех вызывающих — изменять его нельзя.
+
+    Кэш читает и поток health-сервера, поэтому у каждой версии свой словарь,
+    а пара (версия, словарь) подменяется одним присваиванием: результат,
+    посчитанный по старому снимку, попадает только в словарь старой версии.
+    """
+    def decorator(func):
+        state: List[Tuple[Any, Dict[Tuple, Any]]] = [(None, {})]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            current = (version(),) + tuple(source() for source in extra_versions)
+            cached_version, cache = state[0]
+            if current != cached_version:
+                cache = {}
+                state[0] = (current, cache)
+            key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            try:
+                return cache[key]
+            except KeyError:
+                result = cache[key] = func(*args, **kwargs)
+                return result
+
+        def cache_clear():
+            state[0] = (None, {})
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+# ==================== ПОДПИСЧИКИ НА ИЗМЕНЕНИЯ ====================
+# В многопроцессном режиме (workers.py) каждый воркер держит свою копию
+# фото-мапа; изменения из админки рассылаются остальным через подписчиков.
+# Рассылаются только изменённые ключи (ключ -> file_id, None — удалён),
+# и получатель вливает их в свой фото-мап: правки разных ключей, сделанные
+# одновременно в разных воркерах, не затирают друг друга.
+_change_listeners: List[Callable[[Dict[str, Optional[str]]], None]] = []
+
+def add_change_listener(listener: Callable[[Dict[str, Optional[str]]], None]):
+    """Подписаться на изменения фото-мапа (получает изменённые ключи)"""
+    _change_listeners.append(listener)
+
+def _notify_change(changes: Dict[str, Optional[str]]):
+    for listener in _change_listeners:
+        try:
+            listener(dict(changes))
+        except Exception as e:
+            print(f"⚠️ Ошибка подписчика photo_map: {e}")
+
+def apply_remote_photo_changes(changes: Dict[str, Optional[str]]):
+    """Влить изменения из другого процесса (без повторной рассылки)"""
+    data = dict(snapshot().photos)
+    for key, file_id in changes.items():
+        if file_id is None:
+            data.pop(key, None)
+        else:
+            data[key] = file_id
+    _publish(data, notify=False)
 
 # ==================== ЗАГРУЗКА И СОХРАНЕНИЕ ДАННЫХ ====================
 
-def load_photo_map() -> Dict[str, str]:
-    """Загрузить фото-мап (для Render Free используем только память)"""
-    try:
-        print("📸 Загружаю предзагруженные фото из памяти...")
-        return _photo_storage.copy()
-    except Exception as e:
-        print(f"⚠️ Ошибка загрузки фото: {e}")
-        return PRELOADED_PHOTOS.copy()
+def load_photo_map() -> Mapping[str, str]:
+    """Текущий фото-мап (снимок только для чтения, без копирования)"""
+    return snapshot().photos
 
 def save_photo_map(data: Dict[str, str]):
     """Сохранить фото-мап (на Render Free сохраняем только в памяти)"""
     try:
-        global _photo_storage
-        _photo_storage = data.copy()
-        print(f"💾 Обновлено фото в памяти: {len(data)} записей")
+        _publish(data)
+        print(f"💾 Обновлено фото в памяти: {len(data)} записей (версия {_snapshot.version})")
         return True
     except Exception as e:
         print(f"❌ Ошибка сохранения фото: {e}")
@@ -109,36 +209,37 @@ def save_photo_map(data: Dict[str, str]):
 
 def get_photo_file_id(product_key: str) -> str:
     """Получить file_id для product_key"""
-    return _photo_storage.get(product_key, "")
+    return snapshot().photos.get(product_key, "")
 
 def set_photo_file_id(product_key: str, file_id: str) -> bool:
-    """Установить file_id для product_key"""
+    """Установить file_id для product_key (публикует новую версию)"""
     if product_key not in ALL_PHOTO_KEYS:
         print(f"⚠️ Неизвестный ключ: {product_key}")
         return False
 
-    _photo_storage[product_key] = file_id
+    data = dict(snapshot().photos)
+    data[product_key] = file_id
+    _publish(data)
     print(f"✅ Сохранено фото для: {ALL_PHOTO_KEYS.get(product_key, product_key)}")
     return True
 
-def get_all_photos() -> Dict[str, str]:
-    """Получить все загруженные фотографии"""
-    return _photo_storage.copy()
+def get_all_photos() -> Mapping[str, str]:
+    """Получить все загруженные фотографии (снимок только для чтения)"""
+    return snapshot().photos
 
 def get_photos_by_keys(photo_keys: List[str]) -> List[str]:
     """Получить список file_id по списку ключей"""
-    result = []
-    for key in photo_keys:
-        if key in _photo_storage and _photo_storage[key]:
-            result.append(_photo_storage[key])
-    return result
+    photos = snapshot().photos
+    return [photos[key] for key in photo_keys if photos.get(key)]
 
+@cached_per_version()
 def get_missing_photos() -> List[Dict[str, str]]:
-    """Получить список всех фото со статусом"""
+    """Получить список всех фото со статусом (общий для версии, не изменять)"""
+    photos = snapshot().photos
     missing = []
 
     for key, name in ALL_PHOTO_KEYS.items():
-        file_id = _photo_storage.get(key, "")
+        file_id = photos.get(key, "")
         status = "✅ Загружено" if file_id else "❌ Отсутствует"
         missing.append({
             "key": key,
@@ -151,10 +252,12 @@ def get_missing_photos() -> List[Dict[str, str]]:
     missing.sort(key=lambda x: (0 if x["status"] == "❌ Отсутствует" else 1, x["name"]))
     return missing
 
+@cached_per_version()
 def get_photo_stats() -> Dict[str, int]:
-    """Получить статистику по фото"""
+    """Получить статистику по фото (общая для версии, не изменять)"""
+    photos = snapshot().photos
     total = len(ALL_PHOTO_KEYS)
-    loaded = sum(1 for key in ALL_PHOTO_KEYS if key in _photo_storage and _photo_storage[key])
+    loaded = sum(1 for key in ALL_PHOTO_KEYS if photos.get(key))
 
     return {
         "total": total,
@@ -164,10 +267,9 @@ def get_photo_stats() -> Dict[str, int]:
     }
 
 def reset_all_photos() -> bool:
-    """Сбросить все фото (очистить память и использовать предзагруженные)"""
+    """Сбросить все фото (вернуть предзагруженные)"""
     try:
-        global _photo_storage
-        _photo_storage = PRELOADED_PHOTOS.copy()
+        _publish(PRELOADED_PHOTOS)
         print("🔄 Все фото сброшены до предзагруженных")
         return True
     except Exception as e:
@@ -177,8 +279,7 @@ def reset_all_photos() -> bool:
 def initialize_with_preloaded():
     """Инициализировать с предзагруженными фото"""
     try:
-        global _photo_storage
-        _photo_storage = PRELOADED_PHOTOS.copy()
+        _publish(PRELOADED_PHOTOS, notify=False)
 
         loaded = sum(1 for v in PRELOADED_PHOTOS.values() if v)
         total = len(PRELOADED_PHOTOS)
@@ -188,9 +289,3 @@ def initialize_with_preloaded():
     except Exception as e:
         print(f"❌ Ошибка инициализации: {e}")
         return False
-
-# Инициализируем при импорте
-print("🔄 Инициализация photo_map...")
-initialize_with_preloaded()
-stats = get_photo_stats()
-print(f"📊 Статистика: {stats['loaded']}/{stats['total']} фото ({stats['percentage']}%)")
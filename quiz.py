@@ -0,0 +1,510 @@
+"""
+QUIZ.PY - Декларативное описание опросов (волосы, тело)
+
+Опрос — список шагов (Step): состояние FSM, ключ ответа в user_storage,
+варианты ответов, текст вопроса и клавиатура. Шаг с условием (when)
+задаётся только при подходящих ответах (цвет — только для окрашенных).
+
+При загрузке модуля шаги компилируются в таблицу переходов: для каждого
+состояния — шаг, кандидаты вперёд и кандидаты назад. Кандидатов больше
+одного только перед шагами с условием, поэтому переход — поиск в словаре
+и проверка одного-двух условий.
+
+register() добавляет обработчики всех вариантов ответов в TextRouter
+(text_router.py) как кнопки своего состояния; итог опроса
+(рекомендации) остаётся в main.py и передаётся туда же.
+
+Те же опросы доступны в inline-режиме без состояния на сервере
+(register_inline): номер шага и все ответы упакованы в callback_data
+каждой кнопки, поэтому следующий шаг или итог считает любой воркер без
+чтения и записи хранилищ. Весь inline-опрос идёт в одном сообщении,
+которое редактируется на месте; неизменённые текст и клавиатура повторно
+не отправляются.
+
+Полный набор ответов можно передать ссылкой t.me/<бот>?start=<payload>
+(deep_link_payload / parse_deep_link): по ней бот сразу присылает
+результат. links_csv() — таблица ссылок на все наборы ответов (для QR).
+"""
+
+import csv
+import io
+import itertools
+import math
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message, ReplyKeyboardMarkup
+
+import callbacks
+import config
+import keyboards
+from states import UserState
+from text_router import TextRouter
+from user_storage import get_user_data, save_user_data
+
+DONE = "✅ Готово"
+SELECTED, NOT_SELECTED = "✅ ", "☐ "
+
+UserData = Dict[str, Any]
+Finish = Callable[[Message, FSMContext], Awaitable[None]]
+
+
+class Step(NamedTuple):
+    state: State
+    # Ключ ответа в user_storage (список — для мультивыбора)
+    field: str
+    options: Sequence[str]
+    prompt: str
+    keyboard: Callable[[UserData], ReplyKeyboardMarkup]
+    multi: bool = False
+    # Шаг задаётся, только если условие на уже данные ответы выполнено
+    when: Optional[Callable[[UserData], bool]] = None
+    # Повторить ответ в начале следующего вопроса
+    confirm: bool = False
+    # Кнопок в ряду inline-клавиатуры
+    columns: int = 1
+    # Вопрос сразу после подтверждённого ответа (confirm) на предыдущий шаг
+    confirmed_prompt: Optional[str] = None
+
+
+def _all_hair_colors() -> List[str]:
+    return list(dict.fromkeys(
+        color for hair_type in config.HAIR_TYPES for color in config.get_hair_colors(hair_type)
+    ))
+
+
+PROBLEMS_HINT = (
+    "<b>Нажмите на проблему, чтобы выбрать/отменить</b>\n\n"
+    "<i>Можно нажать '✅ Готово' без выбора проблем</i>"
+)
+
+FLOWS: Dict[str, List[Step]] = {
+    "hair": [
+        Step(
+            UserState.HAIR_CHOOSING_TYPE, "hair_type", config.HAIR_TYPES,
+            "💇‍♀️ <b>Отлично! Подберем уход для волос.</b>\n\n<i>Какой у вас тип волос?</i>",
+            lambda data: keyboards.hair_type_keyboard(),
+            confirm=True,
+        ),
+        Step(
+            UserState.HAIR_CHOOSING_PROBLEMS, "selected_problems", config.HAIR_PROBLEMS,
+            "<i>Выберите проблемы волос (можно несколько):</i>\n" + PROBLEMS_HINT,
+            lambda data: keyboards.hair_problems_keyboard(data.get("selected_problems") or []),
+            multi=True, columns=2,
+            confirmed_prompt="<i>Теперь выберите проблемы волос (можно несколько):</i>\n" + PROBLEMS_HINT,
+        ),
+        Step(
+            UserState.HAIR_CHOOSING_SCALP, "scalp_type", config.SCALP_TYPES,
+            "<i>Чувствительная кожа головы?</i>",
+            lambda data: keyboards.scalp_type_keyboard(),
+            columns=2,
+        ),
+        Step(
+            UserState.HAIR_CHOOSING_VOLUME, "hair_volume", config.HAIR_VOLUME,
+            "<i>Хотите добавить объем волосам?</i>",
+            lambda data: keyboards.hair_volume_keyboard(),
+            columns=2,
+        ),
+        Step(
+            UserState.HAIR_CHOOSING_COLOR, "hair_color", _all_hair_colors(),
+            "<i>Выберите цвет волос:</i>",
+            lambda data: keyboards.hair_color_keyboard(data.get("hair_type") or ""),
+            when=lambda data: bool(config.get_hair_colors(data.get("hair_type") or "")),
+            columns=2,
+        ),
+    ],
+    "body": [
+        Step(
+            UserState.BODY_CHOOSING_GOAL, "body_goal", config.BODY_GOALS,
+            "🧴 <b>Прекрасно! Займемся уходом за телом.</b>\n\n<i>Какова ваша основная цель ухода?</i>",
+            lambda data: keyboards.body_goals_keyboard(),
+        ),
+    ],
+}
+
+
+# ==================== ТАБЛИЦА ПЕРЕХОДОВ ====================
+
+class Transition(NamedTuple):
+    flow: str
+    index: int
+    step: Step
+    # Кандидаты по порядку: первый подходящий по условию; ни одного — конец опроса / выход
+    forward: Tuple[Step, ...]
+    back: Tuple[Step, ...]
+
+
+def _candidates(steps: Sequence[Step]) -> Tuple[Step, ...]:
+    """Шаги до первого безусловного включительно"""
+    result = []
+    for step in steps:
+        result.append(step)
+        if step.when is None:
+            break
+    return tuple(result)
+
+
+def compile_flows(flows: Dict[str, List[Step]]) -> Dict[str, Transition]:
+    """Имя состояния FSM -> переход"""
+    table: Dict[str, Transition] = {}
+    for name, steps in flows.items():
+        for index, step in enumerate(steps):
+            if step.state.state in table:
+                raise ValueError(f"Состояние {step.state.state} встречается в опросах дважды")
+            table[step.state.state] = Transition(
+                name, index, step,
+                _candidates(steps[index + 1:]),
+                _candidates(steps[index - 1::-1] if index else ()),
+            )
+    return table
+
+
+TRANSITIONS = compile_flows(FLOWS)
+
+
+def _pick(candidates: Tuple[Step, ...], data: UserData) -> Optional[Step]:
+    for step in candidates:
+        if step.when is None or step.when(data):
+            return step
+    return None
+
+
+# ==================== ПЕРЕХОДЫ ====================
+
+async def _enter(message: Message, state: FSMContext, step: Step, prefix: str = ""):
+    data = get_user_data(message.from_user.id)
+    prompt = step.confirmed_prompt if prefix and step.confirmed_prompt else step.prompt
+    await state.set_state(step.state)
+    await message.answer(prefix + prompt, reply_markup=step.keyboard(data))
+
+
+async def start(message: Message, state: FSMContext, flow: str):
+    """Начать опрос заново: ответы прошлого прохождения сбрасываются"""
+    steps = FLOWS[flow]
+    for step in steps:
+        save_user_data(message.from_user.id, step.field, [] if step.multi else "")
+    await _enter(message, state, steps[0])
+
+
+async def back(message: Message, state: FSMContext) -> bool:
+    """Шаг назад; False, если текущее состояние не шаг опроса или шаг первый"""
+    transition = TRANSITIONS.get(await state.get_state())
+    if transition is None:
+        return False
+    previous = _pick(transition.back, get_user_data(message.from_user.id))
+    if previous is None:
+        return False
+    await _enter(message, state, previous)
+    return True
+
+
+async def _advance(message: Message, state: FSMContext, transition: Transition,
+                   finish: Dict[str, Finish], answer: str = ""):
+    following = _pick(transition.forward, get_user_data(message.from_user.id))
+    if following is None:
+        await finish[transition.flow](message, state)
+        return
+    prefix = f"✅ <b>{answer}</b>\n\n" if transition.step.confirm else ""
+    await _enter(message, state, following, prefix)
+
+
+# ==================== ОБРАБОТЧИКИ ====================
+
+def _choice_handler(transition: Transition, finish: Dict[str, Finish]):
+    async def handler(message: Message, state: FSMContext):
+        save_user_data(message.from_user.id, transition.step.field, message.text)
+        await _advance(message, state, transition, finish, message.text)
+    return handler
+
+
+def _multi_choice_handler(transition: Transition, finish: Dict[str, Finish]):
+    step = transition.step
+
+    async def handler(message: Message, state: FSMContext):
+        if message.text == DONE:
+            await _advance(message, state, transition, finish)
+            return
+        # Кнопка варианта: "✅ Ломкость" / "☐ Ломкость"
+        option = message.text[len(SELECTED):] if message.text.startswith(SELECTED) \
+            else message.text[len(NOT_SELECTED):]
+
+        selected = list(get_user_data(message.from_user.id).get(step.field) or [])
+        if option in selected:
+            selected.remove(option)
+        else:
+            selected.append(option)
+        save_user_data(message.from_user.id, step.field, selected)
+        await _enter(message, state, step)
+    return handler
+
+
+def register(buttons: TextRouter, finish: Dict[str, Finish]):
+    """
+    Обработчики всех шагов. finish: имя опроса -> итог (вызывается после
+    последнего заданного шага, ответы уже в user_storage).
+    """
+    missing = set(FLOWS) - set(finish)
+    if missing:
+        raise ValueError(f"Нет обработчика итога для опросов: {', '.join(sorted(missing))}")
+    for transition in TRANSITIONS.values():
+        step = transition.step
+        if step.multi:
+            handler = _multi_choice_handler(transition, finish)
+            buttons.add(DONE, handler, step.state)
+            for option in step.options:
+                buttons.add(SELECTED + option, handler, step.state)
+                buttons.add(NOT_SELECTED + option, handler, step.state)
+        else:
+            handler = _choice_handler(transition, finish)
+            for option in step.options:
+                buttons.add(option, handler, step.state)
+
+
+# ==================== INLINE-РЕЖИМ БЕЗ СОСТОЯНИЯ ====================
+
+InlineFinish = Callable[[Message, UserData], Awaitable[None]]
+
+MENU_PROMPT = (
+    "🧭 <b>Быстрый подбор</b>\n\n"
+    "<i>Ответы хранятся прямо в кнопках — можно вернуться к подбору в любой момент.</i>\n\n"
+    "<i>Выберите категорию:</i>"
+)
+
+
+class AnswerCodec:
+    """
+    Все ответы опроса — одно число в смешанной системе счисления:
+    одиночный выбор — номер варианта + 1 (0 — нет ответа), мультивыбор —
+    битовая маска вариантов (порядок выбора не сохраняется).
+    """
+
+    def __init__(self, steps: Sequence[Step]):
+        self.steps = steps
+        self.radices = [1 << len(step.options) if step.multi else len(step.options) + 1 for step in steps]
+        self.limit = math.prod(self.radices)
+        self._numbers = [{option: number for number, option in enumerate(step.options)} for step in steps]
+
+    def encode(self, answers: UserData) -> int:
+        packed = 0
+        for step, radix, numbers in reversed(list(zip(self.steps, self.radices, self._numbers))):
+            value = answers.get(step.field)
+            if step.multi:
+                digit = sum(1 << numbers[option] for option in value or () if option in numbers)
+            else:
+                digit = numbers[value] + 1 if value in numbers else 0
+            packed = packed * radix + digit
+        return packed
+
+    def decode(self, packed: int) -> UserData:
+        if not 0 <= packed < self.limit:
+            raise callbacks.CallbackDataError(f"ответы вне диапазона: {packed}")
+        answers: UserData = {}
+        for step, radix in zip(self.steps, self.radices):
+            packed, digit = divmod(packed, radix)
+            if step.multi:
+                answers[step.field] = [option for bit, option in enumerate(step.options) if digit >> bit & 1]
+            else:
+                answers[step.field] = step.options[digit - 1] if digit else ""
+        return answers
+
+
+CODECS = {name: AnswerCodec(steps) for name, steps in FLOWS.items()}
+if set(FLOWS) != set(callbacks.QUIZ_FLOWS):
+    raise ValueError("callbacks.QUIZ_FLOWS не совпадает с опросами quiz.FLOWS")
+
+
+def _step_data(flow: str, index: int, answers: UserData) -> str:
+    return callbacks.QUIZ_STEP.pack(flow, index, CODECS[flow].encode(answers))
+
+
+def _forward_data(transition: Transition, answers: UserData) -> str:
+    """Кнопка «вперёд»: следующий заданный шаг или итог (номер = числу шагов)"""
+    following = _pick(transition.forward, answers)
+    index = TRANSITIONS[following.state.state].index if following else len(FLOWS[transition.flow])
+    return _step_data(transition.flow, index, answers)
+
+
+def _back_data(transition: Transition, answers: UserData) -> str:
+    previous = _pick(transition.back, answers)
+    if previous is None:
+        return callbacks.QUIZ_MENU.pack()
+    return _step_data(transition.flow, TRANSITIONS[previous.state.state].index, answers)
+
+
+def inline_step(flow: str, index: int, answers: UserData):
+    """(текст, inline-клавиатура) шага: в каждой кнопке — ответы после её нажатия"""
+    step = FLOWS[flow][index]
+    transition = TRANSITIONS[step.state.state]
+    buttons = []
+    if step.multi:
+        selected = answers.get(step.field) or []
+        for option in step.options:
+            if option in selected:
+                toggled = [item for item in selected if item != option]
+                text = SELECTED + option
+            else:
+                toggled = selected + [option]
+                text = NOT_SELECTED + option
+            buttons.append((text, _step_data(flow, index, {**answers, step.field: toggled})))
+        buttons.append((DONE, _forward_data(transition, answers)))
+    else:
+        for option in step.options:
+            buttons.append((option, _forward_data(transition, {**answers, step.field: option})))
+    return step.prompt, keyboards.inline_quiz_keyboard(buttons, step.columns, _back_data(transition, answers))
+
+
+def final_answers(flow: str, answers: UserData) -> UserData:
+    """Ответы без шагов, которые при итоговых ответах не задаются (цвет для натуральных)"""
+    return {
+        step.field: answers[step.field] for step in FLOWS[flow]
+        if step.when is None or step.when(answers)
+    }
+
+
+def complete_answers(flow: str, answers: UserData) -> Optional[UserData]:
+    """
+    Итоговые ответы из кнопки или ссылки; None, если на заданный шаг с
+    одиночным выбором нет ответа (данные подделаны или устарели).
+    """
+    answers = final_answers(flow, answers)
+    for step in FLOWS[flow]:
+        if not step.multi and step.field in answers and not answers[step.field]:
+            return None
+    return answers
+
+
+def _answer_texts(flow: str, answers: UserData) -> List[str]:
+    texts = []
+    for step in FLOWS[flow]:
+        if step.field not in answers:
+            continue
+        value = answers[step.field]
+        if step.multi:
+            texts.append(", ".join(value) if value else "без проблем")
+        elif value:
+            texts.append(value)
+    return texts
+
+
+def answers_summary(flow: str, answers: UserData) -> str:
+    """Текст, в который превращается сообщение опроса после итога"""
+    return "✅ <b>Подбор готов</b>\n\n" + "\n".join(f"• {text}" for text in _answer_texts(flow, answers))
+
+
+async def _show(message: Message, text: str, markup: Optional[InlineKeyboardMarkup]):
+    """Показать шаг в сообщении опроса: редактируется только то, что изменилось"""
+    try:
+        if message.html_text != text:
+            await message.edit_text(text, reply_markup=markup)
+        elif message.reply_markup != markup:
+            await message.edit_reply_markup(reply_markup=markup)
+    except TelegramBadRequest as e:
+        # Повторное нажатие той же кнопки: содержимое уже такое
+        if "message is not modified" not in str(e):
+            raise
+
+
+def register_inline(router: callbacks.CallbackRouter, finish: Dict[str, InlineFinish]):
+    """
+    Обработчики inline-опроса. finish: имя опроса -> итог (message — сообщение
+    с опросом, answers — ответы из кнопки).
+    """
+    missing = set(FLOWS) - set(finish)
+    if missing:
+        raise ValueError(f"Нет обработчика итога для опросов: {', '.join(sorted(missing))}")
+
+    @router.handler(callbacks.QUIZ_MENU)
+    async def process_quiz_menu(callback: CallbackQuery, state: FSMContext, args):
+        await _show(callback.message, MENU_PROMPT, keyboards.inline_quiz_menu_keyboard())
+        await callback.answer()
+
+    @router.handler(callbacks.QUIZ_STEP)
+    async def process_quiz_step(callback: CallbackQuery, state: FSMContext, args):
+        steps = FLOWS[args.flow]
+        try:
+            answers = CODECS[args.flow].decode(args.answers)
+        except callbacks.CallbackDataError:
+            answers = None
+        if answers is None or args.step > len(steps):
+            await callback.answer("⚠️ Кнопка устарела, начните подбор заново")
+            return
+
+        if args.step == len(steps):
+            answers = complete_answers(args.flow, answers)
+            if answers is None:
+                await callback.answer("⚠️ Кнопка устарела, начните подбор заново")
+                return
+            await callback.answer()
+            await _show(callback.message, answers_summary(args.flow, answers), None)
+            await finish[args.flow](callback.message, answers)
+            return
+        text, markup = inline_step(args.flow, args.step, answers)
+        await _show(callback.message, text, markup)
+        await callback.answer()
+
+
+# ==================== ССЫЛКИ НА ГОТОВЫЙ РЕЗУЛЬТАТ ====================
+# Payload ссылки — та же упаковка, что у кнопки итога inline-опроса
+# (QUIZ_STEP с номером шага, равным числу шагов). Символы base64url
+# допустимы в start-параметре Telegram (A-Z, a-z, 0-9, _ и -).
+
+def deep_link_payload(flow: str, answers: UserData) -> str:
+    return _step_data(flow, len(FLOWS[flow]), answers)
+
+
+def parse_deep_link(payload: str) -> Optional[Tuple[str, UserData]]:
+    """(опрос, ответы) из payload; None, если это не полный набор ответов"""
+    try:
+        callback_type, args = callbacks.decode(payload)
+        if callback_type is not callbacks.QUIZ_STEP or args.step != len(FLOWS[args.flow]):
+            return None
+        answers = complete_answers(args.flow, CODECS[args.flow].decode(args.answers))
+    except callbacks.CallbackDataError:
+        return None
+    if answers is None:
+        return None
+    return args.flow, answers
+
+
+def all_answer_sets(flow: str) -> Iterator[UserData]:
+    """Все полные наборы ответов опроса (мультивыбор — все подмножества)"""
+    steps = FLOWS[flow]
+
+    def walk(index: int, answers: UserData) -> Iterator[UserData]:
+        if index == len(steps):
+            yield dict(answers)
+            return
+        step = steps[index]
+        if step.when is not None and not step.when(answers):
+            yield from walk(index + 1, answers)
+            return
+        if step.multi:
+            choices = [
+                list(combo) for size in range(len(step.options) + 1)
+                for combo in itertools.combinations(step.options, size)
+            ]
+        else:
+            choices = list(step.options)
+        for choice in choices:
+            answers[step.field] = choice
+            yield from walk(index + 1, answers)
+        del answers[step.field]
+
+    return walk(0, {})
+
+
+def links_csv(bot_username: str, flows: Sequence[str]) -> bytes:
+    """CSV (UTF-8 с BOM для Excel): опрос; ответы; ссылка — на каждый набор ответов"""
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=";")
+    writer.writerow(["опрос", "ответы", "ссылка"])
+    for flow in flows:
+        for answers in all_answer_sets(flow):
+            writer.writerow([
+                flow,
+                " | ".join(_answer_texts(flow, answers)),
+                f"https://t.me/{bot_username}?start={deep_link_payload(flow, answers)}",
+            ])
+    return output.getvalue().encode("utf-8-sig")
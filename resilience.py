@@ -0,0 +1,162 @@
+"""
+RESILIENCE.PY - Повторы запросов к Bot API и автомат защиты от сбоев
+
+Ошибки отправки делятся на три вида (classify):
+  RETRY — сеть, 5xx, 429: запрос повторяется с экспоненциальной паузой
+          и случайной добавкой (для 429 — ровно retry_after от Telegram);
+  SKIP  — ошибка конкретного запроса (битый file_id, 400): повторять
+          бессмысленно, но остальные фото результата отправляются;
+  ABORT — чат недоступен (бот заблокирован, чат не найден): остальные
+          фото этому чату тоже не уйдут. «Чат не найден» Telegram
+          возвращает как 400, поэтому он узнаётся по тексту ошибки.
+
+Сбои сети и 5xx питают CircuitBreaker: после BREAKER_FAILURE_THRESHOLD
+таких ошибок подряд отправка ставится на паузу на BREAKER_RESET_SECONDS,
+затем проходит один пробный запрос — успех снимает паузу, сбой продлевает.
+429 автомат не размыкает: это не деградация, а явное требование подождать.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramEntityTooLarge, TelegramForbiddenError,
+    TelegramNetworkError, TelegramNotFound, TelegramRetryAfter, TelegramServerError,
+)
+
+import config
+
+RETRY = "retry"
+SKIP = "skip"
+ABORT = "abort"
+
+T = TypeVar("T")
+
+# Как часто ожидающие проверяют исход пробного запроса, сек
+PROBE_POLL_INTERVAL = 0.1
+
+# Недоступный чат Telegram возвращает как 400 Bad Request — узнаём по тексту
+CHAT_UNAVAILABLE_ERRORS = ("chat not found", "user not found", "peer_id_invalid")
+
+
+def classify(error: BaseException) -> str:
+    """Вид ошибки: RETRY, SKIP или ABORT"""
+    if isinstance(error, TelegramEntityTooLarge):
+        return SKIP
+    if isinstance(error, (TelegramRetryAfter, TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)):
+        return RETRY
+    if isinstance(error, (TelegramForbiddenError, TelegramNotFound)):
+        return ABORT
+    if isinstance(error, TelegramBadRequest):
+        text = str(error).lower()
+        if any(fragment in text for fragment in CHAT_UNAVAILABLE_ERRORS):
+            return ABORT
+    return SKIP
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Пауза перед повтором №attempt (с 0): случайная в [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# ==================== АВТОМАТ ЗАЩИТЫ ====================
+
+class CircuitBreaker:
+    """closed -> (threshold сбоев подряд) -> open -> (reset_seconds) -> half-open -> ..."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open = False
+        self.trips = 0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if not self.open:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    async def wait_closed(self) -> bool:
+        """
+        Дождаться конца паузы. True — вызывающий идёт пробным запросом
+        и после него должен вызвать end_probe().
+        """
+        while self.open:
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            elif not self._probing:
+                self._probing = True
+                return True
+            else:
+                await asyncio.sleep(PROBE_POLL_INTERVAL)
+        return False
+
+    def end_probe(self):
+        self._probing = False
+
+    def record_success(self):
+        """API ответил (в том числе ошибкой запроса) — автомат замыкается"""
+        self.consecutive_failures = 0
+        self.open = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.open or self.consecutive_failures >= self.failure_threshold:
+            if not self.open:
+                self.trips += 1
+            self.open = True
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+        }
+
+
+# Запросы отправки результатов к Bot API (общий на процесс)
+telegram_breaker = CircuitBreaker(config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_SECONDS)
+
+
+# ==================== ПОВТОРЫ ====================
+
+async def call_with_retry(request: Callable[[], Awaitable[T]],
+                          breaker: CircuitBreaker = telegram_breaker,
+                          attempts: int = config.SEND_RETRY_ATTEMPTS) -> T:
+    """
+    Выполнить запрос, повторяя его при ошибках вида RETRY (не больше attempts
+    попыток). Ошибки SKIP и ABORT, как и последняя ошибка RETRY, пробрасываются
+    как есть — решение о продолжении принимает вызывающий по classify().
+    """
+    for attempt in range(attempts):
+        probe = await breaker.wait_closed()
+        try:
+            result = await request()
+        except TelegramRetryAfter as e:
+            breaker.record_success()
+            if attempt + 1 >= attempts:
+                raise
+            delay = e.retry_after
+        except (TelegramAPIError, asyncio.TimeoutError) as e:
+            if classify(e) != RETRY:
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= attempts:
+                raise
+            delay = backoff_delay(attempt, config.SEND_RETRY_BASE_DELAY, config.SEND_RETRY_MAX_DELAY)
+        else:
+            breaker.record_success()
+            return result
+        finally:
+            if probe:
+                breaker.end_probe()
+        await asyncio.sleep(delay)
+    raise RuntimeError("attempts должно быть больше 0")
@@ -0,0 +1,292 @@
+"""
+RULES.PY - Декларативный движок правил подбора ухода (волосы и тело)
+
+Правила лежат в каталоге (catalog.json, раздел rule_sets): условие на
+ответы опроса -> блок текста рекомендации и набор ключей фото. Текст и
+фото получаются из одного вычисления правил, поэтому разойтись не могут.
+
+При загрузке правила компилируются в таблицы решений с битовыми масками:
+каждый вариант ответа — отдельный бит, условие правила — маска на вопрос.
+Для обычной секции заранее просчитаны все комбинации ответов на вопросы,
+от которых она зависит (таблица: маска ответов -> готовый текст и фото).
+Секция с order_by выводит блоки в порядке выбора ответов (проблемы волос)
+и индексируется по биту ответа.
+
+Загрузка файла и подмена правил на лету — в catalog.py.
+"""
+
+import itertools
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import config
+import photo_map
+
+# Предел размера таблицы решений одной секции (комбинаций ответов)
+MAX_TABLE_SIZE = 65536
+
+
+class RuleError(ValueError):
+    """Ошибка в правилах"""
+
+
+class Recommendation(NamedTuple):
+    text: str
+    photo_keys: List[str]
+
+
+def _hair_colors() -> List[str]:
+    colors: List[str] = []
+    for hair_type in config.HAIR_TYPES:
+        for color in config.get_hair_colors(hair_type):
+            if color not in colors:
+                colors.append(color)
+    return colors
+
+
+# Вопросы опросов: имя -> (варианты ответов, мультивыбор)
+QUESTIONS: Dict[str, Dict[str, Tuple[List[str], bool]]] = {
+    "hair": {
+        "hair_type": (config.HAIR_TYPES, False),
+        "problems": (config.HAIR_PROBLEMS, True),
+        "scalp_type": (config.SCALP_TYPES, False),
+        "hair_volume": (config.HAIR_VOLUME, False),
+        "hair_color": (_hair_colors(), False),
+    },
+    "body": {
+        "goal": (config.BODY_GOALS, False),
+    },
+}
+
+
+# ==================== КОМПИЛЯЦИЯ ====================
+
+_TYPE_NAMES = {dict: "объект", list: "список", str: "строка"}
+
+
+def _expect(value: Any, expected: type, path: str) -> Any:
+    """Тип узла правил: RuleError с путём к узлу, а не AttributeError при разборе"""
+    if not isinstance(value, expected):
+        raise RuleError(f"{path}: ожидается {_TYPE_NAMES[expected]}, а не {type(value).__name__}")
+    return value
+
+
+class _Rule:
+    __slots__ = ("masks", "text", "photos")
+
+    def __init__(self, masks: Tuple[int, ...], text: str, photos: Tuple[str, ...]):
+        self.masks = masks
+        self.text = text
+        self.photos = photos
+
+    def matches(self, answer_mask: int) -> bool:
+        for mask in self.masks:
+            if not answer_mask & mask:
+                return False
+        return True
+
+
+class _Section:
+    __slots__ = ("header", "rules", "order_by", "key_mask", "table", "by_answer")
+
+    def __init__(self, header: str, rules: List[_Rule], order_by: Optional[str]):
+        self.header = header
+        self.rules = rules
+        self.order_by = order_by
+        self.key_mask = 0
+        self.table: Dict[int, Tuple[str, Tuple[str, ...]]] = {}
+        self.by_answer: Dict[str, List[_Rule]] = {}
+
+
+class RuleSet:
+    """Скомпилированные правила одного опроса"""
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        if name not in QUESTIONS:
+            raise RuleError(f"Неизвестный опрос: {name}")
+        _expect(spec, dict, name)
+        self.name = name
+        self.questions = QUESTIONS[name]
+        self.header = _expect(spec.get("header", ""), str, f"{name}.header")
+        self.empty_text = _expect(spec.get("empty_text", ""), str, f"{name}.empty_text")
+
+        # Бит на каждый вариант ответа каждого вопроса
+        self.bits: Dict[str, Dict[str, int]] = {}
+        bit = 1
+        for question, (options, _) in self.questions.items():
+            self.bits[question] = {}
+            for option in options:
+                self.bits[question][option] = bit
+                bit <<= 1
+
+        sections = _expect(spec.get("sections", []), list, f"{name}.sections")
+        self.sections = [
+            self._compile_section(section, f"{name}.sections[{index}]")
+            for index, section in enumerate(sections)
+        ]
+
+    def _question_mask(self, question: str) -> int:
+        mask = 0
+        for bit in self.bits[question].values():
+            mask |= bit
+        return mask
+
+    def _compile_rule(self, rule: Dict[str, Any], block: str, path: str) -> Tuple[_Rule, Dict[str, List[str]]]:
+        _expect(rule, dict, path)
+        when = _expect(rule.get("when", {}), dict, f"{path}.when")
+        masks = []
+        for question, answers in when.items():
+            if question not in self.bits:
+                raise RuleError(f"{self.name}: неизвестный вопрос '{question}'")
+            _expect(answers, list, f"{path}.when.{question}")
+            if not answers:
+                raise RuleError(f"{self.name}: пустой список ответов для '{question}'")
+            mask = 0
+            for answer in answers:
+                _expect(answer, str, f"{path}.when.{question}")
+                if answer not in self.bits[question]:
+                    raise RuleError(f"{self.name}: нет ответа '{answer}' на вопрос '{question}'")
+                mask |= self.bits[question][answer]
+            masks.append(mask)
+
+        photos = _expect(rule.get("photos", []), list, f"{path}.photos")
+        for key in photos:
+            _expect(key, str, f"{path}.photos")
+            if key not in photo_map.ALL_PHOTO_KEYS:
+                raise RuleError(f"{self.name}: неизвестный ключ фото '{key}'")
+        try:
+            text = block.format(
+                title=rule.get("title", ""),
+                items="".join(f"• {item}\n" for item in _expect(rule.get("items", []), list, f"{path}.items")),
+                note=rule.get("note", ""),
+            )
+        except (KeyError, IndexError) as e:
+            raise RuleError(f"{self.name}: ошибка в шаблоне блока '{block}': {e}")
+        return _Rule(tuple(masks), text, tuple(photos)), when
+
+    def _compile_section(self, spec: Dict[str, Any], path: str) -> _Section:
+        _expect(spec, dict, path)
+        block = _expect(spec.get("block", "{title}\n{items}"), str, f"{path}.block")
+        order_by = spec.get("order_by")
+        if order_by is not None:
+            _expect(order_by, str, f"{path}.order_by")
+        section = _Section(_expect(spec.get("header", ""), str, f"{path}.header"), [], order_by)
+
+        referenced = set()
+        rule_specs = _expect(spec.get("rules", []), list, f"{path}.rules")
+        for index, rule_spec in enumerate(rule_specs):
+            rule, when = self._compile_rule(rule_spec, block, f"{path}.rules[{index}]")
+            section.rules.append(rule)
+            referenced.update(when)
+
+            if order_by is not None:
+                if order_by not in self.bits or not self.questions[order_by][1]:
+                    raise RuleError(f"{self.name}: order_by должен указывать на вопрос с мультивыбором")
+                if order_by not in when:
+                    raise RuleError(f"{self.name}: правило секции '{spec.get('id')}' без условия на {order_by}")
+                for answer in when[order_by]:
+                    section.by_answer.setdefault(answer, []).append(rule)
+
+        if order_by is None:
+            self._build_table(section, sorted(referenced))
+        return section
+
+    def _build_table(self, section: _Section, questions: Sequence[str]):
+        """Таблица решений: все комбинации ответов на вопросы секции"""
+        choices = []
+        size = 1
+        for question in questions:
+            bits = list(self.bits[question].values())
+            if self.questions[question][1]:
+                # Мультивыбор: все подмножества ответов
+                question_choices = [
+                    sum(combo) for count in range(len(bits) + 1)
+                    for combo in itertools.combinations(bits, count)
+                ]
+            else:
+                question_choices = [0] + bits
+            choices.append(question_choices)
+            size *= len(question_choices)
+            section.key_mask |= self._question_mask(question)
+        if size > MAX_TABLE_SIZE:
+            raise RuleError(f"{self.name}: слишком большая таблица решений ({size})")
+
+        for combo in itertools.product(*choices):
+            answer_mask = sum(combo)
+            matched = [rule for rule in section.rules if rule.matches(answer_mask)]
+            if matched:
+                text = section.header + "".join(rule.text for rule in matched)
+                photos = tuple(key for rule in matched for key in rule.photos)
+                section.table[answer_mask] = (text, photos)
+
+    def photo_answers(self) -> Dict[str, List[str]]:
+        """Ключ фото -> варианты ответов, при которых правила его рекомендуют"""
+        options_by_bit = {
+            bit: option for options in self.bits.values() for option, bit in options.items()
+        }
+        result: Dict[str, List[str]] = {}
+        for section in self.sections:
+            for rule in section.rules:
+                options = [
+                    option for bit, option in options_by_bit.items()
+                    if any(bit & mask for mask in rule.masks)
+                ]
+                for key in rule.photos:
+                    known = result.setdefault(key, [])
+                    known.extend(option for option in options if option not in known)
+        return result
+
+    # ==================== ВЫЧИСЛЕНИЕ ====================
+
+    def answer_mask(self, answers: Dict[str, Any]) -> int:
+        mask = 0
+        for question, value in answers.items():
+            bits = self.bits.get(question)
+            if bits is None or not value:
+                continue
+            if isinstance(value, str):
+                mask |= bits.get(value, 0)
+            else:
+                for answer in value:
+                    mask |= bits.get(answer, 0)
+        return mask
+
+    def evaluate(self, answers: Dict[str, Any]) -> Recommendation:
+        answer_mask = self.answer_mask(answers)
+        parts = [self.header]
+        photos: List[str] = []
+
+        for section in self.sections:
+            if section.order_by is None:
+                hit = section.table.get(answer_mask & section.key_mask)
+                if hit is not None:
+                    parts.append(hit[0])
+                    photos.extend(hit[1])
+                continue
+
+            emitted = set()
+            for answer in answers.get(section.order_by) or ():
+                for rule in section.by_answer.get(answer, ()):
+                    if rule in emitted or not rule.matches(answer_mask):
+                        continue
+                    if not emitted:
+                        parts.append(section.header)
+                    emitted.add(rule)
+                    parts.append(rule.text)
+                    photos.extend(rule.photos)
+
+        text = "".join(parts)
+        if not text:
+            text = self.empty_text
+        # Дубликаты убираются с сохранением первого вхождения
+        return Recommendation(text, list(dict.fromkeys(photos)))
+
+
+def compile_rules(rule_sets: Dict[str, Any]) -> Dict[str, RuleSet]:
+    """Скомпилировать раздел rule_sets каталога"""
+    if not isinstance(rule_sets, dict):
+        raise RuleError("rule_sets должен быть объектом")
+    compiled = {name: RuleSet(name, spec) for name, spec in rule_sets.items()}
+    missing = set(QUESTIONS) - set(compiled)
+    if missing:
+        raise RuleError(f"Нет правил для опросов: {', '.join(sorted(missing))}")
+    return compiled
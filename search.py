@@ -0,0 +1,130 @@
+"""
+SEARCH.PY - Поиск продуктов для inline-режима (@бот запрос)
+
+Индекс строится один раз на версию каталога: для каждого продукта —
+слова названия и ключа, а также ключевые слова из правил рекомендаций
+(варианты ответов опроса, при которых продукт советуется: «Ломкость»,
+«Перхоть», «Сухая кожа»...). Каждое слово раскладывается на префиксы,
+поэтому поиск по началу слова — это поиск по словарю, без перебора.
+
+Готовые списки inline-результатов кэшируются по (запрос, версия
+фото-мапа, версия каталога): повторный запрос отвечается из кэша, а
+после загрузки фото или правки каталога старые ответы просто перестают
+совпадать по ключу.
+"""
+
+import functools
+import re
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from aiogram.types import InlineQueryResultCachedPhoto
+
+import catalog
+import delivery
+import photo_map
+
+MIN_PREFIX = 2
+MAX_RESULTS = 50  # предел Telegram на один ответ
+RESULTS_CACHE_SIZE = 256
+# Слова вариантов ответов, по которым искать бессмысленно
+STOP_WORDS = {"да", "нет", "и", "с", "для", "к", "по", "хочу", "не", "важно"}
+
+_WORD = re.compile(r"[0-9a-zа-я]+")
+
+
+def normalize(text: str) -> List[str]:
+    return _WORD.findall(text.lower().replace("ё", "е"))
+
+
+class SearchIndex(NamedTuple):
+    version: int
+    # префикс слова -> ключи продуктов; отдельно для названий и для ключевых слов
+    names: Dict[str, Set[str]]
+    keywords: Dict[str, Set[str]]
+
+
+def _add_words(index: Dict[str, Set[str]], key: str, text: str):
+    for word in normalize(text):
+        if word in STOP_WORDS:
+            continue
+        for end in range(min(MIN_PREFIX, len(word)), len(word) + 1):
+            index.setdefault(word[:end], set()).add(key)
+
+
+def build_index(current: catalog.Catalog) -> SearchIndex:
+    names: Dict[str, Set[str]] = {}
+    keywords: Dict[str, Set[str]] = {}
+    for key, name in photo_map.ALL_PHOTO_KEYS.items():
+        _add_words(names, key, name)
+        _add_words(keywords, key, key.replace("_", " "))
+    for rule_set in current.rule_sets.values():
+        for key, answers in rule_set.photo_answers().items():
+            for answer in answers:
+                _add_words(keywords, key, answer)
+    return SearchIndex(current.version, names, keywords)
+
+
+_index: Optional[SearchIndex] = None
+
+
+def get_index() -> SearchIndex:
+    global _index
+    current = catalog.get()
+    if _index is None or _index.version != current.version:
+        _index = build_index(current)
+    return _index
+
+
+# ==================== ПОИСК ====================
+
+def search(query: str) -> List[str]:
+    """
+    Ключи продуктов, подходящих под все слова запроса (по началу слова).
+    Совпадения в названии весят больше, чем в ключевых словах.
+    """
+    index = get_index()
+    words = [word for word in normalize(query) if word not in STOP_WORDS]
+    if not words:
+        return sorted(photo_map.ALL_PHOTO_KEYS, key=photo_map.ALL_PHOTO_KEYS.get)
+
+    scores: Dict[str, int] = {}
+    candidates = None
+    for word in words:
+        in_names = index.names.get(word, set())
+        in_keywords = index.keywords.get(word, set())
+        matched = in_names | in_keywords
+        candidates = matched if candidates is None else candidates & matched
+        if not candidates:
+            return []
+        for key in in_names:
+            scores[key] = scores.get(key, 0) + 2
+        for key in in_keywords:
+            scores[key] = scores.get(key, 0) + 1
+    return sorted(candidates, key=lambda key: (-scores[key], photo_map.ALL_PHOTO_KEYS[key]))
+
+
+@functools.lru_cache(maxsize=RESULTS_CACHE_SIZE)
+def _cached_results(query: str, photos_version: int, catalog_version: int) -> Tuple[InlineQueryResultCachedPhoto, ...]:
+    photos = photo_map.snapshot().photos
+    prices = catalog.get().prices
+    results = []
+    for key in search(query):
+        file_id = photos.get(key, "")
+        if not file_id:
+            continue
+        results.append(InlineQueryResultCachedPhoto(
+            id=key,
+            photo_file_id=file_id,
+            title=photo_map.ALL_PHOTO_KEYS[key],
+            description=prices.get(key, ""),
+            caption=delivery.photo_caption(key, prices),
+        ))
+        if len(results) == MAX_RESULTS:
+            break
+    return tuple(results)
+
+
+def inline_results(query: str) -> List[InlineQueryResultCachedPhoto]:
+    """Готовые inline-результаты (только продукты с загруженным фото)"""
+    normalized = " ".join(normalize(query))
+    return list(_cached_results(normalized, photo_map.version(), catalog.get().version))
@@ -0,0 +1,156 @@
+"""
+SNAPSHOT.PY - Экспорт и импорт рабочего состояния (фото-мап + цены)
+
+Снимок — file_id всех загруженных фото, цены и служебные сведения
+(версия формата, дата, версии каталога и фото-мапа на момент экспорта).
+Переезд на новый деплой: /export на старом, отправить файл с подписью
+/import на новом — без ручной правки preloaded_photos.py.
+
+Бинарный формат: MAGIC + версия формата (1 байт) + кодировка (1 байт) +
+тело. Тело — msgpack, если пакет установлен, иначе JSON, сжатый zlib.
+Для ручной правки есть и обычный JSON (/export json); при импорте формат
+определяется автоматически.
+"""
+
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+import catalog
+import photo_map
+
+MAGIC = b"LRMSNAP"
+FORMAT_VERSION = 1
+ENCODING_MSGPACK = b"M"
+ENCODING_ZLIB_JSON = b"Z"
+# Снимок из 38 file_id занимает единицы КБ; всё, что заметно больше, — не снимок
+MAX_SNAPSHOT_SIZE = 1024 * 1024
+# Предел распакованного zlib+JSON: 1 МБ сжатых нулей разворачивается в ~1 ГБ
+MAX_DECOMPRESSED_SIZE = 4 * 1024 * 1024
+
+
+class SnapshotError(ValueError):
+    """Файл не является корректным снимком"""
+
+
+# ==================== СБОРКА И ПРИМЕНЕНИЕ ====================
+
+def build_snapshot() -> Dict[str, Any]:
+    current = catalog.get()
+    return {
+        "format": FORMAT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "catalog_version": current.version,
+        "photo_map_version": photo_map.version(),
+        "photos": {key: file_id for key, file_id in photo_map.get_all_photos().items() if file_id},
+        "prices": dict(current.prices),
+    }
+
+
+def validate_snapshot(data: Any) -> Dict[str, Any]:
+    """Проверить структуру снимка (SnapshotError при ошибке)"""
+    if not isinstance(data, dict):
+        raise SnapshotError("Снимок должен быть объектом")
+    if data.get("format") != FORMAT_VERSION:
+        raise SnapshotError(f"Неподдерживаемая версия снимка: {data.get('format')}")
+
+    photos = data.get("photos")
+    if not isinstance(photos, dict):
+        raise SnapshotError("photos должен быть объектом")
+    for key, file_id in photos.items():
+        if key not in photo_map.ALL_PHOTO_KEYS:
+            raise SnapshotError(f"Неизвестный ключ фото '{key}'")
+        if not isinstance(file_id, str) or not file_id:
+            raise SnapshotError(f"Пустой или некорректный file_id для '{key}'")
+
+    prices = data.get("prices")
+    if prices is not None and not isinstance(prices, dict):
+        raise SnapshotError("prices должен быть объектом")
+    return data
+
+
+def apply_snapshot(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Применить проверенный снимок: фото-мап заменяется целиком (одна новая
+    версия), цены записываются в каталог, только если отличаются.
+    """
+    summary = {"photos": len(data["photos"]), "prices_changed": False}
+    prices = data.get("prices")
+    if prices is not None and prices != dict(catalog.get().prices):
+        try:
+            catalog.save_prices(prices)
+        except catalog.CatalogError as e:
+            raise SnapshotError(f"Цены не применены: {e}")
+        summary["prices_changed"] = True
+
+    if not photo_map.save_photo_map(dict(data["photos"])):
+        raise SnapshotError("Не удалось сохранить фото-мап")
+    summary["catalog_version"] = catalog.get().version
+    summary["photo_map_version"] = photo_map.version()
+    return summary
+
+
+# ==================== КОДИРОВАНИЕ ====================
+
+def encode(data: Dict[str, Any], as_json: bool = False) -> bytes:
+    """Бинарный снимок (msgpack или zlib+JSON) или читаемый JSON"""
+    if as_json:
+        return (json.dumps(data, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+    if msgpack is not None:
+        encoding, body = ENCODING_MSGPACK, msgpack.packb(data, use_bin_type=True)
+    else:
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        encoding, body = ENCODING_ZLIB_JSON, zlib.compress(payload, 9)
+    return MAGIC + bytes([FORMAT_VERSION]) + encoding + body
+
+
+def _decompress(body: bytes) -> bytes:
+    """zlib с пределом на размер результата: сверх MAX_DECOMPRESSED_SIZE — не снимок"""
+    decompressor = zlib.decompressobj()
+    payload = decompressor.decompress(body, MAX_DECOMPRESSED_SIZE)
+    if decompressor.unconsumed_tail:
+        raise SnapshotError("Распакованный снимок слишком большой")
+    if not decompressor.eof:
+        raise SnapshotError("Обрезанные сжатые данные снимка")
+    return payload
+
+
+def decode(raw: bytes) -> Dict[str, Any]:
+    """Разобрать снимок любого поддерживаемого формата и проверить его"""
+    if len(raw) > MAX_SNAPSHOT_SIZE:
+        raise SnapshotError("Файл слишком большой для снимка")
+
+    try:
+        if raw.startswith(MAGIC):
+            header_size = len(MAGIC) + 2
+            if len(raw) < header_size:
+                raise SnapshotError("Обрезанный заголовок снимка")
+            if raw[len(MAGIC)] != FORMAT_VERSION:
+                raise SnapshotError(f"Неподдерживаемая версия снимка: {raw[len(MAGIC)]}")
+            encoding, body = raw[len(MAGIC) + 1:header_size], raw[header_size:]
+            if encoding == ENCODING_MSGPACK:
+                if msgpack is None:
+                    raise SnapshotError("Снимок в формате msgpack, а пакет msgpack не установлен")
+                data = msgpack.unpackb(body, raw=False)
+            elif encoding == ENCODING_ZLIB_JSON:
+                data = json.loads(_decompress(body).decode("utf-8"))
+            else:
+                raise SnapshotError(f"Неизвестная кодировка снимка: {encoding!r}")
+        else:
+            data = json.loads(raw.decode("utf-8-sig"))
+    except SnapshotError:
+        raise
+    except Exception as e:
+        raise SnapshotError(f"Не удалось разобрать снимок: {e}")
+    return validate_snapshot(data)
+
+
+def file_name(as_json: bool = False) -> str:
+    stamp = datetime.now().strftime("%Y%m%d_%H%M")
+    return f"larmoss_snapshot_{stamp}.{'json' if as_json else 'snap'}"
@@ -0,0 +1,107 @@
+"""
+STARTUP_PROFILE.PY - Профиль холодного старта бота
+Запуск: python startup_profile.py  (результат пишется в startup_profile.txt)
+
+Снимает отчёт `python -X importtime -c "import main"` и замеряет, через
+сколько после запуска `python main.py` начинает отвечать /health.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import List, Tuple
+
+REPORT_FILE = "startup_profile.txt"
+TOP_IMPORTS = 20
+HEALTH_WAIT_TIMEOUT = 30
+
+
+def _env(port: int = 0) -> dict:
+    env = os.environ.copy()
+    # Токен нужен только для валидации формата при создании Bot
+    env.setdefault("BOT_TOKEN", "123456:STARTUP-PROFILE")
+    env["WORKERS"] = "1"
+    if port:
+        env["PORT"] = str(port)
+    return env
+
+
+def profile_imports() -> Tuple[float, List[Tuple[int, int, str]]]:
+    """Отчёт -X importtime: (общее время в мс, [(self_us, cumulative_us, module)])"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, env=_env()
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), module.rstrip()))
+    main_row = next((row for row in rows if row[2].strip() == "main"), None)
+    total_ms = main_row[1] / 1000 if main_row else 0.0
+    return total_ms, rows
+
+
+def measure_health_bind() -> float:
+    """Секунды от запуска `python main.py` до первого ответа 200 на /health"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"], env=_env(port),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < HEALTH_WAIT_TIMEOUT:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        return float("nan")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def build_report() -> str:
+    import aiogram
+
+    total_ms, rows = profile_imports()
+    health_seconds = measure_health_bind()
+
+    lines = [
+        "# Профиль холодного старта — сгенерировано: python startup_profile.py",
+        f"# Python {sys.version.split()[0]}, aiogram {aiogram.__version__}",
+        "",
+        f"/health отвечает через:      {health_seconds * 1000:8.0f} мс после запуска python main.py",
+        f"Полный импорт main (importtime): {total_ms:8.0f} мс",
+        "",
+        f"Топ-{TOP_IMPORTS} импортов по суммарному времени:",
+        f"{'self, мс':>10} | {'всего, мс':>10} | модуль",
+    ]
+    for self_us, cumulative_us, module in sorted(rows, key=lambda row: row[1], reverse=True)[:TOP_IMPORTS]:
+        lines.append(f"{self_us / 1000:10.1f} | {cumulative_us / 1000:10.1f} | {module}")
+
+    lines += ["", "Модули проекта:", f"{'self, мс':>10} | {'всего, мс':>10} | модуль"]
+    project_modules = {
+        name[:-3] for name in os.listdir(os.path.dirname(os.path.abspath(__file__))) if name.endswith(".py")
+    }
+    for self_us, cumulative_us, module in rows:
+        if module.strip() in project_modules:
+            lines.append(f"{self_us / 1000:10.1f} | {cumulative_us / 1000:10.1f} | {module}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    report = build_report()
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        f.write(report)
+    print(report)
@@ -27,3 +27,7 @@ class AdminState(StatesGroup):
     ADMIN_BULK_CATEGORY = State()
     ADMIN_BULK_SUBCATEGORY = State()
     ADMIN_BULK_PRODUCT_LIST = State()
+    # Альбом / ZIP одним сообщением
+    ADMIN_BULK_INGEST = State()
+    # Ожидание файла снимка для /import
+    ADMIN_WAITING_IMPORT = State()
@@ -0,0 +1,72 @@
+"""
+TEXT_ROUTER.PY - Маршрутизация кнопок reply-клавиатур по точному тексту
+
+aiogram проверяет фильтры обработчиков по очереди, поэтому каждая кнопка
+(@dp.message(F.text == "...")) добавляет проверку к каждому входящему
+сообщению. TextRouter хранит обработчики кнопок в словаре
+текст -> {состояние FSM -> обработчик} и регистрируется в dp.message
+одним обработчиком: кнопка находится поиском в словаре, а свободный
+текст (которого нет в словаре) уходит дальше по обычной цепочке
+фильтров.
+
+Обработчик кнопки для конкретного состояния важнее обработчика без
+состояния (ANY_STATE); текущее состояние берётся из raw_state, который
+FSM-middleware aiogram уже прочитал. Обработчики получают те же
+аргументы, что и обычные обработчики aiogram (по именам параметров).
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from aiogram import Dispatcher
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.fsm.state import State
+from aiogram.types import Message
+
+ANY_STATE = None
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class TextRouter:
+    """Обработчики кнопок: текст -> состояние -> обработчик"""
+
+    def __init__(self):
+        self._by_text: Dict[str, Dict[Optional[str], CallableObject]] = {}
+
+    def add(self, text: str, handler: Handler, *states: State):
+        """Обработчик кнопки в указанных состояниях (без состояний — в любом)"""
+        by_state = self._by_text.setdefault(text, {})
+        callable_object = CallableObject(handler)
+        for state in states or (ANY_STATE,):
+            key = state.state if isinstance(state, State) else state
+            if key in by_state:
+                raise ValueError(f"Кнопка {text!r} уже обрабатывается в состоянии {key}")
+            by_state[key] = callable_object
+
+    def button(self, text: str, *states: State):
+        """Декоратор: @buttons.button("❓ Помощь") или с состояниями"""
+        def decorator(handler: Handler) -> Handler:
+            self.add(text, handler, *states)
+            return handler
+        return decorator
+
+    def resolve(self, text: str, state: Optional[str]) -> Optional[CallableObject]:
+        by_state = self._by_text.get(text)
+        if by_state is None:
+            return None
+        handler = by_state.get(state)
+        return handler if handler is not None else by_state.get(ANY_STATE)
+
+    async def match(self, message: Message,
+                    raw_state: Optional[str] = None) -> Union[bool, Dict[str, CallableObject]]:
+        """Фильтр aiogram: найденный обработчик передаётся как button_handler"""
+        handler = self.resolve(message.text, raw_state) if message.text else None
+        return {"button_handler": handler} if handler is not None else False
+
+    def register(self, dp: Dispatcher):
+        """Один обработчик в dp.message на все кнопки"""
+        dp.message.register(_dispatch, self.match)
+
+
+async def _dispatch(message: Message, button_handler: CallableObject, **data: Any):
+    await button_handler.call(message, **data)
@@ -3,7 +3,10 @@ USER_STORAGE.PY - Хранилище данных пользователей (в
 На Render Free данные теряются при рестарте, но это нормально для текущей сессии
 """
 
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import config
 
 # Хранилище в памяти (теряется при рестарте сервера)
 user_data = {}
@@ -57,3 +60,33 @@ def clear_selected_problems(user_id: int):
 def get_user_data_value(user_id: int, key: str, default: Any = None) -> Any:
     """Получить значение с дефолтом"""
     return get_user_data(user_id, key) or default
+
+# ==================== ПОСЛЕДНИЙ ПОДБОР ====================
+# Отдельно от user_data: /start и «В главное меню» его не сбрасывают.
+# user_id -> (время истечения, сигнатура плана из delivery)
+
+last_results: Dict[int, Tuple[float, Tuple]] = {}
+_LAST_RESULTS_PRUNE_EVERY = 1000
+_saves_since_prune = 0
+
+def save_last_result(user_id: int, signature: Tuple):
+    """Запомнить сигнатуру последнего подбора на config.LAST_RESULT_TTL_HOURS"""
+    global _saves_since_prune
+    now = time.monotonic()
+    last_results[user_id] = (now + config.LAST_RESULT_TTL_HOURS * 3600, signature)
+    _saves_since_prune += 1
+    if _saves_since_prune >= _LAST_RESULTS_PRUNE_EVERY:
+        _saves_since_prune = 0
+        for expired in [uid for uid, (expires_at, _) in last_results.items() if expires_at <= now]:
+            del last_results[expired]
+
+def get_last_result(user_id: int) -> Optional[Tuple]:
+    """Сигнатура последнего подбора или None, если её нет или она истекла"""
+    entry = last_results.get(user_id)
+    if entry is None:
+        return None
+    expires_at, signature = entry
+    if expires_at <= time.monotonic():
+        del last_results[user_id]
+        return None
+    return signature
@@ -0,0 +1,414 @@
+"""
+WORKERS.PY - Многопроцессный режим бота (супервизор + воркеры)
+
+Один процесс-приёмник забирает обновления через getUpdates и раскладывает их
+по N процессам-воркерам по id пользователя. Все обновления одного пользователя
+всегда попадают в один и тот же воркер, поэтому его FSM (MemoryStorage, ключ —
+чат + пользователь) и user_storage (ключ — user_id) живут ровно в одном
+процессе, а порядок его обновлений сохраняется — в том числе в групповых
+чатах, где id чата и пользователя различаются.
+Изменения фото-мапа из админки рассылаются всем воркерам через супервизор.
+Воркеры сообщают супервизору об обработанных update_id (оффсет и прерванные
+обновления сохраняет он, см. lifecycle.py) и раз в WORKER_STATS_INTERVAL
+присылают свои счётчики для HTTP /status (health.py).
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher, types
+
+import bot_session
+import catalog
+import config
+import health
+import lifecycle
+import photo_map
+
+logger = logging.getLogger(__name__)
+
+# Типы сообщений в очередях воркеров и в управляющей очереди супервизора
+MSG_UPDATE = "update"
+MSG_PHOTOS = "photos"
+MSG_DONE = "done"
+MSG_STOP = "stop"
+# Метка в управляющей очереди: всё, что лежало перед ней, уже разобрано
+MSG_SYNC = "sync"
+MSG_STATS = "stats"
+
+# Как часто супервизор проверяет, живы ли воркеры, сек
+WORKER_CHECK_INTERVAL = 1
+# Запас на выход воркера после срока дообработки (закрытие сессии), сек
+WORKER_EXIT_GRACE = 2
+# Сколько ждать, пока ретранслятор разберёт управляющую очередь, сек
+CONTROL_SYNC_TIMEOUT = 5
+# Как часто воркер присылает счётчики для /status, сек
+WORKER_STATS_INTERVAL = 5
+
+RuntimeStats = Callable[[], Dict[str, Any]]
+
+# Обновления, в которых есть чат или пользователь
+_EVENT_KEYS = ("message", "edited_message", "callback_query", "inline_query",
+               "chosen_inline_result", "my_chat_member", "chat_member")
+
+
+# ==================== ШАРДИРОВАНИЕ ====================
+
+def get_shard_key(update: Dict[str, Any]) -> int:
+    """
+    Ключ шардирования обновления: id пользователя, а если его нет (посты
+    каналов) — id чата. Состояние бота (user_storage, FSM) привязано к
+    пользователю, поэтому шард по пользователю держит его в одном воркере
+    и в групповых чатах.
+    """
+    for event_key in _EVENT_KEYS:
+        event = update.get(event_key)
+        if not event:
+            continue
+        user = event.get("from")
+        if user:
+            return user["id"]
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+def get_shard_index(update: Dict[str, Any], worker_count: int) -> int:
+    """Номер воркера для обновления"""
+    return get_shard_key(update) % worker_count
+
+
+# ==================== ВОРКЕР ====================
+
+def _worker_process(index: int, work_queue, control_queue, dispatcher: Dispatcher, bot: Bot,
+                    runtime_stats: Optional[RuntimeStats]):
+    """Точка входа процесса-воркера"""
+    # Останавливает воркеров супервизор (MSG_STOP после всех принятых
+    # обновлений), иначе сигнал оборвал бы обработку на полпути
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Перезапущенный воркер форкается из работающего супервизора и унаследовал
+    # бы его HTTP-сессию, привязанную к чужому циклу событий
+    bot.session = bot_session.create_session(config.TELEGRAM_API_URL)
+
+    photo_map.add_change_listener(lambda changes: control_queue.put((MSG_PHOTOS, index, changes)))
+    asyncio.run(_worker_loop(index, work_queue, control_queue, dispatcher, bot, runtime_stats))
+
+
+async def _report_stats(index: int, control_queue, runtime_stats: RuntimeStats):
+    while True:
+        control_queue.put((MSG_STATS, index, runtime_stats()))
+        await asyncio.sleep(WORKER_STATS_INTERVAL)
+
+
+async def _worker_loop(index: int, work_queue, control_queue, dispatcher: Dispatcher, bot: Bot,
+                       runtime_stats: Optional[RuntimeStats]):
+    loop = asyncio.get_running_loop()
+    chat_queues: Dict[int, Deque[Dict[str, Any]]] = {}
+    chat_tasks = set()
+
+    async def drain_chat(key: int):
+        # Обновления одного пользователя обрабатываются строго по очереди,
+        # разных — конкурентно
+        pending = chat_queues[key]
+        while pending:
+            raw_update = pending.popleft()
+            try:
+                await dispatcher.feed_raw_update(bot, raw_update)
+            except Exception as e:
+                logger.error(f"❌ Воркер {index}: ошибка обработки обновления: {e}", exc_info=True)
+            control_queue.put((MSG_DONE, index, raw_update["update_id"]))
+        del chat_queues[key]
+
+    # Каждый воркер сам следит за catalog.json и подменяет свой снимок
+    catalog.CatalogWatcher().start()
+    reporter = None
+    if runtime_stats is not None:
+        reporter = asyncio.create_task(_report_stats(index, control_queue, runtime_stats))
+
+    logger.info(f"👷 Воркер {index} запущен")
+    try:
+        while True:
+            kind, payload = await loop.run_in_executor(None, work_queue.get)
+
+            if kind == MSG_STOP:
+                deadline = payload
+                break
+
+            if kind == MSG_PHOTOS:
+                photo_map.apply_remote_photo_changes(payload)
+                continue
+
+            key = get_shard_key(payload)
+            pending = chat_queues.get(key)
+            if pending is not None:
+                pending.append(payload)
+                continue
+
+            chat_queues[key] = deque([payload])
+            task = asyncio.create_task(drain_chat(key))
+            chat_tasks.add(task)
+            task.add_done_callback(chat_tasks.discard)
+
+        # Срок задаёт супервизор: очередь до стоп-сигнала тоже в него входит
+        if chat_tasks:
+            await asyncio.wait(set(chat_tasks), timeout=lifecycle.time_left(deadline))
+        # Хуки остановки Dispatcher (дообработка альбомов, middlewares.py)
+        await dispatcher.emit_shutdown(bot=bot, timeout=lifecycle.time_left(deadline))
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        await bot.session.close()
+        logger.info(f"👷 Воркер {index} остановлен")
+
+
+# ==================== СУПЕРВИЗОР ====================
+
+class Supervisor:
+    """Запускает воркеров, принимает обновления и раздаёт их по шардам"""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, worker_count: int,
+                 runtime_stats: Optional[RuntimeStats] = None):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.worker_count = worker_count
+        self.runtime_stats = runtime_stats
+        # Последние счётчики каждого воркера (MSG_STATS)
+        self.worker_stats: List[Optional[Dict[str, Any]]] = [None] * worker_count
+        # fork: воркеры наследуют уже собранный Dispatcher со всеми хендлерами
+        self.context = multiprocessing.get_context("fork")
+        self.control_queue = self.context.Queue()
+        self.work_queues = [self._new_work_queue() for _ in range(worker_count)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * worker_count
+        self.offsets = lifecycle.OffsetTracker(config.UPDATE_OFFSET_FILE)
+        # Обновления, отданные воркеру и ещё не обработанные: при падении
+        # воркера они переотправляются его замене
+        self.assigned: List[Dict[int, Dict[str, Any]]] = [{} for _ in range(worker_count)]
+        self.assigned_lock = threading.Lock()
+        # Раздача обновлений шарду и перезапуск его воркера не пересекаются:
+        # пока воркеру переотправляются потерянные обновления, новые ждут
+        self.shard_locks = [asyncio.Lock() for _ in range(worker_count)]
+        self._sync_events: Dict[int, threading.Event] = {}
+        self._sync_counter = 0
+        self.poller: Optional[lifecycle.UpdatePoller] = None
+        self.relay_thread: Optional[threading.Thread] = None
+
+    def _new_work_queue(self):
+        return self.context.Queue(maxsize=config.WORKER_QUEUE_SIZE)
+
+    def start_worker(self, index: int):
+        process = self.context.Process(
+            target=_worker_process,
+            args=(index, self.work_queues[index], self.control_queue, self.dispatcher, self.bot,
+                  self.runtime_stats),
+            name=f"BotWorker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start_workers(self):
+        for index in range(self.worker_count):
+            self.start_worker(index)
+        logger.info(f"👷 Запущено воркеров: {self.worker_count}")
+
+    async def check_workers(self):
+        """Перезапуск упавших воркеров (при раздаче обновления и по таймеру)"""
+        for index in range(self.worker_count):
+            if self._worker_alive(index):
+                continue
+            async with self.shard_locks[index]:
+                # Пока ждали блокировку, воркер мог перезапустить другой вызов
+                if not self._worker_alive(index):
+                    await self.restart_worker(index)
+
+    def _worker_alive(self, index: int) -> bool:
+        process = self.processes[index]
+        return process is None or process.is_alive()
+
+    async def restart_worker(self, index: int):
+        """
+        Вызывается под shard_locks[index]. Сначала разбираются отметки об
+        обработке, которые воркер успел отправить, — иначе обработанное
+        обновление ушло бы замене повторно. Замена получает новую очередь:
+        всё, что было в старой, есть и в assigned, поэтому переотправка
+        assigned ничего не теряет и не дублирует.
+        """
+        logger.error(f"⚠️ Воркер {index} упал (код {self.processes[index].exitcode}), перезапускаю")
+        await self.sync_control()
+        self.work_queues[index] = self._new_work_queue()
+        self.start_worker(index)
+        with self.assigned_lock:
+            lost_updates = sorted(self.assigned[index].items())
+        for _, raw_update in lost_updates:
+            await self.put(index, (MSG_UPDATE, raw_update))
+        if lost_updates:
+            logger.warning(f"🔁 Воркеру {index} переотправлено обновлений: {len(lost_updates)}")
+
+    async def sync_control(self):
+        """Дождаться, пока ретранслятор разберёт всё, что уже есть в управляющей очереди"""
+        self._sync_counter += 1
+        token = self._sync_counter
+        event = self._sync_events[token] = threading.Event()
+        self.control_queue.put((MSG_SYNC, -1, token))
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, event.wait, CONTROL_SYNC_TIMEOUT):
+            logger.warning("⚠️ Ретранслятор не ответил, переотправка может дать повторы")
+        self._sync_events.pop(token, None)
+
+    async def watch_workers(self):
+        """Проверка воркеров по таймеру: шард упавшего воркера не ждёт следующего обновления"""
+        while True:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+            await self.check_workers()
+
+    async def put(self, index: int, item: tuple):
+        """
+        Положить сообщение в очередь воркера (ждём, если очередь заполнена).
+        Если пока ждём, воркер упал или его перезапустили с новой очередью,
+        сообщение не кладём: обновление остаётся в assigned и уходит замене.
+        """
+        work_queue = self.work_queues[index]
+        try:
+            work_queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        loop = asyncio.get_running_loop()
+        while self.work_queues[index] is work_queue and self._worker_alive(index):
+            try:
+                await loop.run_in_executor(None, work_queue.put, item, True, WORKER_CHECK_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def relay_control_messages(self):
+        """
+        Поток-ретранслятор: отметки об обработке обновлений и рассылка
+        изменений фото-мапа от одного воркера всем остальным
+        """
+        while True:
+            kind, source_index, payload = self.control_queue.get()
+            if kind == MSG_STOP:
+                break
+            if kind == MSG_SYNC:
+                event = self._sync_events.get(payload)
+                if event is not None:
+                    event.set()
+            elif kind == MSG_STATS:
+                self.worker_stats[source_index] = payload
+            elif kind == MSG_DONE:
+                with self.assigned_lock:
+                    self.assigned[source_index].pop(payload, None)
+                self.offsets.finished(payload)
+            elif kind == MSG_PHOTOS:
+                photo_map.apply_remote_photo_changes(payload)
+                for index in range(self.worker_count):
+                    if index != source_index:
+                        self._relay_to_worker(index, (MSG_PHOTOS, payload))
+
+    def _relay_to_worker(self, index: int, item: tuple):
+        """
+        Из потока-ретранслятора. Упавшему воркеру (и его замене) сообщение не
+        нужно: замена форкается после sync_control, уже с применёнными
+        изменениями.
+        """
+        work_queue = self.work_queues[index]
+        while self.work_queues[index] is work_queue and self._worker_alive(index):
+            try:
+                work_queue.put(item, timeout=WORKER_CHECK_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def collect_stats(self) -> Dict[str, Any]:
+        """Счётчики для /status: у каждого воркера свои (последние присланные)"""
+        return {"workers": {str(index): stats for index, stats in enumerate(self.worker_stats)}}
+
+    def start_relay(self):
+        self.relay_thread = threading.Thread(
+            target=self.relay_control_messages, daemon=True, name="ControlRelayThread"
+        )
+        self.relay_thread.start()
+
+    def stop_relay(self):
+        # Воркеры уже завершены, их сообщения в очереди стоят раньше стоп-сигнала
+        if self.relay_thread is not None:
+            self.control_queue.put((MSG_STOP, -1, None))
+            self.relay_thread.join(timeout=5)
+
+    async def dispatch_update(self, update: types.Update):
+        raw_update = update.model_dump(mode="json", exclude_none=True, by_alias=True)
+        await self.check_workers()
+        index = get_shard_index(raw_update, self.worker_count)
+        async with self.shard_locks[index]:
+            with self.assigned_lock:
+                self.assigned[index][update.update_id] = raw_update
+            await self.put(index, (MSG_UPDATE, raw_update))
+
+    def stop_workers(self):
+        """
+        Стоп-сигнал идёт после уже принятых обновлений: воркеры их дообработают.
+        Срок у всех воркеров общий — SHUTDOWN_DRAIN_TIMEOUT от начала остановки.
+        """
+        deadline = time.time() + config.SHUTDOWN_DRAIN_TIMEOUT
+        for work_queue in self.work_queues:
+            try:
+                work_queue.put((MSG_STOP, deadline), timeout=lifecycle.time_left(deadline))
+            except queue.Full:
+                pass
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout=lifecycle.time_left(deadline + WORKER_EXIT_GRACE))
+        logger.info("👷 Все воркеры остановлены")
+
+    async def run(self, on_startup: Optional[Callable[[Bot], Awaitable[Any]]] = None):
+        # Накопившиеся обновления не выбрасываем: после рестарта они будут обработаны
+        await self.bot.delete_webhook(drop_pending_updates=False)
+        if on_startup is not None:
+            await on_startup(self.bot)
+
+        self.poller = lifecycle.UpdatePoller(
+            self.bot, self.offsets, self.dispatcher.resolve_used_update_types()
+        )
+        lifecycle.install_stop_signals(self.poller.stop)
+
+        logger.info(f"🤖 СУПЕРВИЗОР ЗАПУЩЕН ({self.worker_count} воркеров)")
+        watcher = asyncio.create_task(self.watch_workers())
+        try:
+            await self.poller.run(self.dispatch_update)
+        finally:
+            watcher.cancel()
+            await self.bot.session.close()
+
+
+def run_supervisor(dispatcher: Dispatcher, bot: Bot, worker_count: int,
+                   on_startup: Optional[Callable[[Bot], Awaitable[Any]]] = None,
+                   runtime_stats: Optional[RuntimeStats] = None):
+    """
+    Запуск многопроцессного режима. Воркеры форкаются до старта event loop,
+    фоновые службы (health check, система выживания) запускаются в on_startup.
+    runtime_stats — счётчики воркера для /status, их сводку отдаёт health.py.
+    """
+    supervisor = Supervisor(dispatcher, bot, worker_count, runtime_stats)
+    if runtime_stats is not None:
+        health.set_runtime_stats(supervisor.collect_stats)
+    supervisor.start_workers()
+    supervisor.start_relay()
+    try:
+        asyncio.run(supervisor.run(on_startup))
+    except KeyboardInterrupt:
+        logger.info("👋 Супервизор остановлен пользователем")
+    finally:
+        supervisor.stop_workers()
+        supervisor.stop_relay()
+        supervisor.offsets.flush()
+        logger.info("👋 Супервизор корректно остановлен")